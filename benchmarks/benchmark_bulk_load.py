@@ -0,0 +1,91 @@
+import argparse
+import csv
+import os
+import sys
+import time
+
+from datetime import date, timedelta
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(benchmarks_dir, os.pardir, "src", "pipeline", "common"))
+sys.path.append(os.path.join(benchmarks_dir, os.pardir, "src", "pipeline", "current_weather_data"))
+
+from db_connection_pool import get_db_connection
+from load_weather_data import bulk_upsert_current_weather, task_load_weather_data_if_necessary
+from weather_records import CurrentWeather, current_weather_columns
+
+sample_csv_path = os.path.join(benchmarks_dir, os.pardir, "database", "sample_csv_data", "current_weather.csv")
+benchmark_start_date = date(2199, 1, 1)
+
+
+def read_sample_rows():
+    with open(sample_csv_path, encoding="utf-8-sig", newline="") as csv_file:
+        return [{column: row[column] for column in current_weather_columns} for row in csv.DictReader(csv_file)]
+
+def generate_benchmark_rows(sample_rows: list, number_of_rows: int):
+    # Replays the sample readings far in the future, one sample period after another, so that every row is a new key.
+    sample_dates = [date.fromisoformat(sample_row['date']) for sample_row in sample_rows]
+    first_sample_date = min(sample_dates)
+    sample_period_days = (max(sample_dates) - first_sample_date).days + 1
+
+    rows = []
+    replay = 0
+    while len(rows) < number_of_rows:
+        for sample_row, sample_date in zip(sample_rows[:number_of_rows - len(rows)], sample_dates):
+            row = dict(sample_row)
+            row['date'] = (benchmark_start_date + timedelta(days=replay * sample_period_days)
+                           + (sample_date - first_sample_date)).isoformat()
+            rows.append(row)
+        replay += 1
+    return rows
+
+def delete_benchmark_rows():
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM current_weather WHERE date >= %(date)s", {"date": benchmark_start_date})
+            cursor.execute("DELETE FROM daily_weather_running_aggregates WHERE date >= %(date)s",
+                           {"date": benchmark_start_date})
+
+def benchmark_row_at_a_time(rows: list):
+    start = time.perf_counter()
+    for row in rows:
+        task_load_weather_data_if_necessary.fn(CurrentWeather(**row), row['city_id'])
+    return time.perf_counter() - start
+
+def benchmark_bulk(rows: list):
+    weather_rows = [[row[column] for column in current_weather_columns] for row in rows]
+    start = time.perf_counter()
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            load_result = bulk_upsert_current_weather(cursor, weather_rows)
+    return time.perf_counter() - start, load_result
+
+def main():
+    parser = argparse.ArgumentParser(description="Row-at-a-time upserts vs COPY-based bulk upsert into current_weather. "
+                                                 "Run it against a throwaway database seeded with the sample CSVs.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--row-at-a-time-limit", type=int, default=5000,
+                        help="Skip the row-at-a-time path for larger inputs because it takes too long")
+    args = parser.parse_args()
+
+    sample_rows = read_sample_rows()
+    print(f"{'rows':>8} {'row-at-a-time (rows/s)':>24} {'bulk (rows/s)':>15} {'inserted':>10} {'already present':>16}")
+    try:
+        for number_of_rows in args.rows:
+            rows = generate_benchmark_rows(sample_rows, number_of_rows)
+
+            row_at_a_time_rate = "skipped"
+            if number_of_rows <= args.row_at_a_time_limit:
+                delete_benchmark_rows()
+                row_at_a_time_rate = f"{number_of_rows / benchmark_row_at_a_time(rows):.0f}"
+
+            delete_benchmark_rows()
+            bulk_seconds, load_result = benchmark_bulk(rows)
+            print(f"{number_of_rows:>8} {row_at_a_time_rate:>24} {number_of_rows / bulk_seconds:>15.0f} "
+                  f"{load_result['inserted']:>10} {load_result['already_present']:>16}")
+    finally:
+        delete_benchmark_rows()
+
+
+if __name__ == "__main__":
+    main()
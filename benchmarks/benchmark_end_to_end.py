@@ -0,0 +1,282 @@
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import psycopg2
+
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT, parse_dsn
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+repository_dir = os.path.join(benchmarks_dir, os.pardir)
+for pipeline_dir in ["common", "current_weather_data", "daily_weather_analysis", "maintenance"]:
+    sys.path.append(os.path.join(repository_dir, "src", "pipeline", pipeline_dir))
+
+from stub_weather_api import StubWeatherApiServer
+
+initialize_db_path = os.path.join(repository_dir, "database", "init", "initialize_db.sql")
+sample_csv_dir = os.path.join(repository_dir, "database", "sample_csv_data")
+sample_tables = ["city", "current_weather", "daily_weather_analyses"]
+stages = ["extract", "transform", "load", "aggregate", "plot"]
+
+
+class DisposablePostgres:
+    """PostgreSQL cluster created with initdb in a temporary directory and removed again on stop.
+
+    The server only listens on a Unix socket in the same directory, so it never clashes with another server.
+    """
+
+    def __init__(self, pg_bin_dir: str = None):
+        initdb = shutil.which("initdb", path=pg_bin_dir)
+        self.pg_ctl = shutil.which("pg_ctl", path=pg_bin_dir)
+        if initdb is None or self.pg_ctl is None:
+            raise RuntimeError("initdb and pg_ctl were not found, pass --pg-bin-dir or --dsn")
+        self.base_dir = tempfile.mkdtemp(prefix="weather-benchmark-pg-")
+        self.data_dir = os.path.join(self.base_dir, "data")
+        with socket.socket() as free_socket:
+            free_socket.bind(("127.0.0.1", 0))
+            self.port = free_socket.getsockname()[1]
+        subprocess.run([initdb, "-D", self.data_dir, "-U", "postgres", "--auth=trust", "--no-sync"], check=True,
+                       stdout=subprocess.DEVNULL)
+
+    def start(self):
+        options = f"-p {self.port} -k {self.base_dir} -c listen_addresses=''"
+        subprocess.run([self.pg_ctl, "-D", self.data_dir, "-o", options, "-l", os.path.join(self.base_dir, "log"),
+                        "-w", "start"], check=True, stdout=subprocess.DEVNULL)
+        return {"host": self.base_dir, "port": str(self.port), "user": "postgres", "password": "",
+                "dbname": "postgres"}
+
+    def stop(self):
+        subprocess.run([self.pg_ctl, "-D", self.data_dir, "-m", "immediate", "stop"], stdout=subprocess.DEVNULL)
+        shutil.rmtree(self.base_dir, ignore_errors=True)
+
+
+def create_database(server_params: dict, dbname: str):
+    conn = psycopg2.connect(**server_params)
+    conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP DATABASE IF EXISTS {dbname}")
+        cursor.execute(f"CREATE DATABASE {dbname}")
+    conn.close()
+
+def drop_database(server_params: dict, dbname: str):
+    conn = psycopg2.connect(**server_params)
+    conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP DATABASE IF EXISTS {dbname} WITH (FORCE)")
+    conn.close()
+
+def seed_database(database_params: dict):
+    conn = psycopg2.connect(**database_params)
+    with conn, conn.cursor() as cursor:
+        with open(initialize_db_path, encoding="utf-8") as sql_file:
+            cursor.execute(sql_file.read())
+        for table in sample_tables:
+            with open(os.path.join(sample_csv_dir, f"{table}.csv"), encoding="utf-8-sig", newline="") as csv_file:
+                cursor.copy_expert(f"COPY {table} FROM STDIN WITH (FORMAT csv, HEADER true)", csv_file)
+        cursor.execute("SELECT version()")
+        server_version = cursor.fetchone()[0]
+    conn.close()
+    return server_version
+
+def configure_environment(database_params: dict, stub_base_url: str, work_dir: str):
+    # The pipeline modules read their settings when they are imported, so this has to run before the first import.
+    os.environ.update({
+        "DB_HOST": database_params.get("host", ""),
+        "DB_NAME": database_params["dbname"],
+        "DB_USER": database_params.get("user", ""),
+        "DB_PASSWORD": database_params.get("password", ""),
+        "PGPORT": database_params.get("port", "5432"),
+        "WEATHER_API_BASE_URL": stub_base_url,
+        "WEATHER_API_KEY": "benchmark",
+        "PARQUET_EXPORT_DIR": os.path.join(work_dir, "parquet"),
+        "CACHE_DB_PATH": "",
+        "PREFECT_LOGGING_LEVEL": "WARNING",
+    })
+
+def prepare_seeded_database():
+    from manage_partitions import create_partitions
+    from rebuild_running_aggregates import rebuild_running_aggregates
+    from resync_sequences import resync_sequences, tables_with_serial_ids
+
+    resync_sequences(tables_with_serial_ids)
+    create_partitions(months_ahead=1)
+    rebuild_running_aggregates()
+
+def delete_benchmark_readings(city_names: list):
+    from db_connection_pool import get_db_connection
+
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT id FROM city WHERE name = ANY(%(names)s)", {"names": city_names})
+            city_ids = [row[0] for row in cursor.fetchall()]
+            for table in ["current_weather", "daily_weather_running_aggregates", "daily_weather_analyses"]:
+                cursor.execute(f"DELETE FROM {table} WHERE city_id = ANY(%(city_ids)s)", {"city_ids": city_ids})
+
+def run_pipeline_stages(city_names: list, selected_stages: list, bulk_request_size: int = 0):
+    from extract_weather_data import (task_generate_urls, task_extract_current_weather_data_batch,
+                                      task_extract_current_weather_data_bulk)
+    from extract_weather_historical_data import (task_extract_cities_with_weather_records,
+                                                 task_extract_astro_data_batch, task_extract_weather_record)
+    from load_weather_data import task_load_weather_data_batch, task_export_current_weather_to_parquet
+    from load_weather_historical_data import (task_load_daily_weather_analyses_aggregated,
+                                              task_export_daily_weather_analyses_to_parquet)
+    from plot_frame import prepare_plot_frame
+    from plot_rendering import render_daily_plots
+    from prefect.logging import disable_run_logger
+    from transform_weather_data import task_transform_weather_data_batch
+    from transform_weather_historical_data import task_transform_astro_data_batch, task_transform_to_pd_df
+
+    timings = {}
+    with disable_run_logger(), contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        if bulk_request_size > 0:
+            weather_data_list = task_extract_current_weather_data_bulk.fn(city_names, bulk_request_size)
+        else:
+            weather_data_list = task_extract_current_weather_data_batch.fn(task_generate_urls.fn(city_names))
+        timings["extract"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        city_data_list, weather_data_to_insert_list = task_transform_weather_data_batch.fn(weather_data_list)
+        timings["transform"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        weather_data_ids = task_load_weather_data_batch.fn(city_data_list, weather_data_to_insert_list)
+        task_export_current_weather_to_parquet.fn(weather_data_ids)
+        timings["load"] = time.perf_counter() - start
+
+        analysis_date = weather_data_to_insert_list[0].date
+        start = time.perf_counter()
+        cities_with_weather_records = task_extract_cities_with_weather_records.fn(analysis_date, city_names)
+        astro_by_city_id = task_extract_astro_data_batch.fn(cities_with_weather_records, analysis_date)
+        astro_by_city_id = task_transform_astro_data_batch.fn(astro_by_city_id)
+        daily_weather_analysis_ids = task_load_daily_weather_analyses_aggregated.fn(analysis_date, astro_by_city_id)
+        task_export_daily_weather_analyses_to_parquet.fn(daily_weather_analysis_ids)
+        timings["aggregate"] = time.perf_counter() - start
+
+        if "plot" in selected_stages:
+            countries = {city_data.name: city_data.country for city_data in city_data_list}
+            start = time.perf_counter()
+            for city_id, city, _ in cities_with_weather_records:
+                weather_data_df = task_transform_to_pd_df.fn(task_extract_weather_record.fn(city_id, analysis_date))
+                render_daily_plots(prepare_plot_frame(weather_data_df), city, countries[city])
+            timings["plot"] = time.perf_counter() - start
+    return {stage: seconds for stage, seconds in timings.items() if stage in selected_stages}
+
+def summarize_timings(stage_timings: list, number_of_cities: int):
+    seconds = np.array(stage_timings)
+    return {
+        "first_seconds": round(float(seconds[0]), 6),
+        "mean_seconds": round(float(seconds.mean()), 6),
+        "p50_seconds": round(float(np.percentile(seconds, 50)), 6),
+        "p99_seconds": round(float(np.percentile(seconds, 99)), 6),
+        "cities_per_second": round(number_of_cities / float(np.percentile(seconds, 50)), 2),
+    }
+
+def benchmark_city_count(number_of_cities: int, repeats: int, selected_stages: list, work_dir: str,
+                         bulk_request_size: int = 0):
+    city_names = [f"BenchmarkCity{index:04d}" for index in range(number_of_cities)]
+    timings_by_stage = {stage: [] for stage in selected_stages}
+    for _ in range(repeats):
+        delete_benchmark_readings(city_names)
+        # Without the previous plots, the plot cache does not turn the plot stage into lookups.
+        shutil.rmtree(os.path.join(work_dir, "plots"), ignore_errors=True)
+        for stage, seconds in run_pipeline_stages(city_names, selected_stages, bulk_request_size).items():
+            timings_by_stage[stage].append(seconds)
+
+    return {stage: summarize_timings(stage_timings, number_of_cities)
+            for stage, stage_timings in timings_by_stage.items()}
+
+def get_git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=repository_dir, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the pipeline stages against the stub "
+                                                 "weather API and a throwaway PostgreSQL database seeded with the "
+                                                 "sample CSVs. The results are written as JSON.")
+    parser.add_argument("--cities", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--repeats", type=int, default=5, help="Pipeline runs per number of cities")
+    parser.add_argument("--stages", nargs="+", choices=stages, default=stages,
+                        help="Stages to report. The other stages up to aggregate still run because each one feeds "
+                             "the next, plot only runs when it is selected")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Simulated latency of the stub weather API")
+    parser.add_argument("--bulk-request-size", type=int, default=0,
+                        help="Extract with bulk requests of this many cities (default: one request per city)")
+    parser.add_argument("--dsn", help="Create the throwaway database on this server instead of starting a new one, "
+                                      "e.g. 'host=localhost port=5432 user=postgres password=postgres'")
+    parser.add_argument("--pg-bin-dir", help="Directory with initdb and pg_ctl (default: the PATH)")
+    parser.add_argument("--output", default="-", help="JSON output file (default: stdout)")
+    args = parser.parse_args()
+    if args.repeats < 1:
+        parser.error("--repeats must be at least 1")
+
+    work_dir = tempfile.mkdtemp(prefix="weather-benchmark-")
+    stub_server = StubWeatherApiServer(latency_seconds=args.latency_ms / 1000)
+    stub_server.start_in_background()
+    postgres = None
+    if args.dsn:
+        server_params = parse_dsn(args.dsn)
+        server_params.setdefault("dbname", "postgres")
+    else:
+        postgres = DisposablePostgres(args.pg_bin_dir)
+        server_params = postgres.start()
+    database_params = dict(server_params, dbname=f"weather_benchmark_{os.getpid()}")
+
+    try:
+        create_database(server_params, database_params["dbname"])
+        server_version = seed_database(database_params)
+        configure_environment(database_params, stub_server.base_url, work_dir)
+        prepare_seeded_database()
+        # The plots are written relative to the working directory, also by the rendering processes.
+        os.chdir(work_dir)
+
+        results = []
+        for number_of_cities in args.cities:
+            stage_results = benchmark_city_count(number_of_cities, args.repeats, args.stages, work_dir,
+                                                 args.bulk_request_size)
+            results.append({"cities": number_of_cities, "stages": stage_results})
+            print(f"{number_of_cities:>5} cities: " + ", ".join(f"{stage} p50 {stage_result['p50_seconds']:.3f}s "
+                                                                f"p99 {stage_result['p99_seconds']:.3f}s"
+                                                                for stage, stage_result in stage_results.items()),
+                  file=sys.stderr)
+    finally:
+        os.chdir(repository_dir)
+        drop_database(server_params, database_params["dbname"])
+        if postgres is not None:
+            postgres.stop()
+        stub_server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "benchmark": "end_to_end",
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "git_revision": get_git_revision(),
+        "python_version": platform.python_version(),
+        "postgres_version": server_version,
+        "parameters": {"cities": args.cities, "repeats": args.repeats, "stages": args.stages,
+                       "latency_ms": args.latency_ms, "bulk_request_size": args.bulk_request_size},
+        "results": results,
+    }
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(report, output_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import httpx
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src", "pipeline", "common"))
+
+from stub_weather_api import StubWeatherApiServer
+from weather_api_client import WeatherApiClient
+
+
+def generate_urls(base_url: str, number_of_cities: int):
+    return [f"{base_url}/v1/current.json?key=benchmark&q=City-{index}" for index in range(number_of_cities)]
+
+def benchmark_serial_one_shot(urls: list):
+    start = time.perf_counter()
+    for url in urls:
+        response = httpx.get(url)
+        response.raise_for_status()
+        response.json()
+    return time.perf_counter() - start
+
+def benchmark_bulk_requests(base_url: str, number_of_cities: int, bulk_request_size: int, max_in_flight: int):
+    url = f"{base_url}/v1/current.json?key=benchmark&q=bulk"
+    json_bodies = [{"locations": [{"q": f"City-{index}", "custom_id": str(index)}
+                                  for index in range(start, min(start + bulk_request_size, number_of_cities))]}
+                   for start in range(0, number_of_cities, bulk_request_size)]
+    client = WeatherApiClient(max_in_flight=max_in_flight)
+    try:
+        start = time.perf_counter()
+        results = client.post_all_json(url, json_bodies)
+        elapsed = time.perf_counter() - start
+    finally:
+        client.close()
+
+    failures = [result for result in results if isinstance(result, Exception)]
+    if failures:
+        raise failures[0]
+    return elapsed
+
+def benchmark_shared_async_client(urls: list, max_in_flight: int):
+    client = WeatherApiClient(max_in_flight=max_in_flight)
+    try:
+        start = time.perf_counter()
+        results = client.get_all_json(urls)
+        elapsed = time.perf_counter() - start
+    finally:
+        client.close()
+
+    failures = [result for result in results if isinstance(result, Exception)]
+    if failures:
+        raise failures[0]
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial one-shot requests vs the shared async weather API client")
+    parser.add_argument("--cities", type=int, nargs="+", default=[1, 10, 50, 100])
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--max-in-flight", type=int, default=50)
+    parser.add_argument("--bulk-request-size", type=int, default=50)
+    args = parser.parse_args()
+
+    server = StubWeatherApiServer(latency_seconds=args.latency_ms / 1000)
+    server.start_in_background()
+    try:
+        print(f"{'cities':>8} {'serial (s)':>12} {'async (s)':>12} {'speed-up':>10} {'bulk (s)':>10} {'requests':>9}")
+        for number_of_cities in args.cities:
+            urls = generate_urls(server.base_url, number_of_cities)
+            serial_seconds = benchmark_serial_one_shot(urls)
+            async_seconds = benchmark_shared_async_client(urls, args.max_in_flight)
+            bulk_seconds = benchmark_bulk_requests(server.base_url, number_of_cities, args.bulk_request_size,
+                                                   args.max_in_flight)
+            print(f"{number_of_cities:>8} {serial_seconds:>12.3f} {async_seconds:>12.3f} "
+                  f"{serial_seconds / async_seconds:>9.1f}x {bulk_seconds:>10.3f} "
+                  f"{-(-number_of_cities // args.bulk_request_size):>9}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+
+from datetime import date, timedelta
+from datetime import time as dt_time
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(benchmarks_dir, os.pardir, "src", "pipeline", "common"))
+sys.path.append(os.path.join(benchmarks_dir, os.pardir, "src", "pipeline", "current_weather_data"))
+
+from db_connection_pool import get_db_connection
+from load_weather_data import task_load_weather_data_if_necessary
+from weather_records import CurrentWeather
+
+benchmark_city = {"name": "Benchmark City", "region": "Benchmark Region", "country": "Benchmark Country",
+                  "time_zone": "UTC", "latitude": 0.0, "longitude": 0.0}
+growth_start_date = date(2199, 1, 1)
+measurement_start_date = date(2399, 1, 1)
+
+
+def create_benchmark_city():
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO city (name, region, country, time_zone, latitude, longitude)
+                VALUES (%(name)s, %(region)s, %(country)s, %(time_zone)s, %(latitude)s, %(longitude)s)
+                ON CONFLICT ON CONSTRAINT city_unique_constraint
+                DO UPDATE SET name=EXCLUDED.name
+                RETURNING id
+                """, benchmark_city
+            )
+            return cursor.fetchone()[0]
+
+def count_rows():
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM current_weather")
+            return cursor.fetchone()[0]
+
+def grow_table(city_id: int, number_of_rows: int):
+    # One synthetic reading every 15 minutes, so 96 rows per day.
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO current_weather (city_id, date, time, temp_c, feels_like_c, weather_condition_code,
+                                             weather_condition_text, weather_condition_icon, wind_speed_kph,
+                                             wind_speed_mps, wind_dir, pressure_mb, precip_mm, humidity_perc,
+                                             cloud_perc, uv_index)
+                SELECT %(city_id)s, %(start_date)s::date + (n / 96)::int,
+                       TIME '00:00' + (n %% 96) * INTERVAL '15 minutes', 10 + n %% 20, 9 + n %% 20, 1003, 'Partly cloudy',
+                       '//cdn.weatherapi.com/weather/64x64/day/116.png', n %% 40, (n %% 40) / 3.6, 'NNE',
+                       1013, 0, 70, 25, 1
+                FROM generate_series(
+                    (SELECT COUNT(*) FROM current_weather WHERE city_id = %(city_id)s AND date < %(end_date)s),
+                    (SELECT COUNT(*) FROM current_weather WHERE city_id = %(city_id)s AND date < %(end_date)s)
+                    + %(number_of_rows)s - 1) AS n
+                ON CONFLICT ON CONSTRAINT weather_unique_constraint DO NOTHING
+                """, {"city_id": city_id, "start_date": growth_start_date, "end_date": measurement_start_date,
+                      "number_of_rows": number_of_rows}
+            )
+
+def resync_current_weather_sequence():
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT setval('current_weather_id_seq', (SELECT MAX(id) FROM current_weather))")
+
+def measure_upserts(city_id: int, samples: int, first_sample: int, with_sequence_resync: bool):
+    latencies = []
+    for sample in range(first_sample, first_sample + samples):
+        weather_data_to_insert = CurrentWeather(
+            date=measurement_start_date + timedelta(days=sample // 96),
+            time=dt_time(sample % 96 // 4, sample % 4 * 15), temp_c=10.0, feels_like_c=9.0,
+            weather_condition_code=1003, weather_condition_text="Partly cloudy",
+            weather_condition_icon="//cdn.weatherapi.com/weather/64x64/day/116.png", wind_speed_kph=10.0,
+            wind_speed_mps=10.0 / 3.6, wind_dir="NNE", pressure_mb=1013.0, precip_mm=0.0, humidity_perc=70,
+            cloud_perc=25, uv_index=1.0)
+        start = time.perf_counter()
+        task_load_weather_data_if_necessary.fn(weather_data_to_insert, city_id)
+        if with_sequence_resync:
+            resync_current_weather_sequence()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def percentile(values: list, fraction: float):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def delete_benchmark_rows(city_id: int):
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM current_weather WHERE city_id = %(city_id)s", {"city_id": city_id})
+            cursor.execute("DELETE FROM daily_weather_running_aggregates WHERE city_id = %(city_id)s",
+                           {"city_id": city_id})
+            cursor.execute("DELETE FROM city WHERE id = %(city_id)s", {"city_id": city_id})
+
+def main():
+    parser = argparse.ArgumentParser(description="Single-row upsert latency into current_weather as the table grows, "
+                                                 "with and without the per-insert sequence resync. Run it against a "
+                                                 "throwaway database.")
+    parser.add_argument("--table-sizes", type=int, nargs="+", default=[10000, 100000, 1000000, 3000000])
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--keep-rows", action="store_true", help="Do not delete the synthetic rows at the end")
+    args = parser.parse_args()
+
+    city_id = create_benchmark_city()
+    first_sample = 0
+    print(f"{'table rows':>12} {'p50 (ms)':>10} {'p99 (ms)':>10} {'p50 + resync (ms)':>19} {'p99 + resync (ms)':>19}")
+    try:
+        for table_size in args.table_sizes:
+            missing_rows = table_size - count_rows()
+            if missing_rows > 0:
+                grow_table(city_id, missing_rows)
+
+            latencies = measure_upserts(city_id, args.samples, first_sample, with_sequence_resync=False)
+            first_sample += args.samples
+            legacy_latencies = measure_upserts(city_id, args.samples, first_sample, with_sequence_resync=True)
+            first_sample += args.samples
+
+            print(f"{count_rows():>12} {statistics.median(latencies):>10.2f} {percentile(latencies, 0.99):>10.2f} "
+                  f"{statistics.median(legacy_latencies):>19.2f} {percentile(legacy_latencies, 0.99):>19.2f}")
+    finally:
+        if not args.keep_rows:
+            delete_benchmark_rows(city_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import argparse
+import os
+import pickle
+import random
+import sys
+import time
+import tracemalloc
+
+from datetime import date
+from datetime import time as dt_time
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(benchmarks_dir, os.pardir, "src", "pipeline", "common"))
+sys.path.append(os.path.join(benchmarks_dir, os.pardir, "src", "pipeline", "daily_weather_analysis"))
+
+import pandas as pd
+
+from compass import compass_degrees, compass_dirs
+from plot_frame import prepare_plot_frame
+from weather_records import CurrentWeather, current_weather_columns
+
+analysis_date = date(2199, 1, 1)
+# The per-row lookup table of task_plot_wind_rose.
+direction_to_angle = dict(zip(compass_dirs.tolist(), compass_degrees.tolist()))
+
+
+def generate_weather_data_df(city_id: int, readings_per_day: int):
+    random.seed(city_id)
+    weather_data_list = []
+    minutes_between_readings = 24 * 60 // readings_per_day
+    for reading in random.sample(range(readings_per_day), readings_per_day):
+        minutes = reading * minutes_between_readings
+        wind_speed_kph = round(random.uniform(0, 40), 1)
+        weather_data_list.append(CurrentWeather(
+            id=city_id * readings_per_day + reading, city_id=city_id, date=analysis_date,
+            time=dt_time(minutes // 60, minutes % 60), temp_c=round(random.uniform(-5, 30), 1),
+            feels_like_c=round(random.uniform(-8, 30), 1), weather_condition_code=1003,
+            weather_condition_text="Partly cloudy",
+            weather_condition_icon="//cdn.weatherapi.com/weather/64x64/day/116.png",
+            wind_speed_kph=wind_speed_kph, wind_speed_mps=wind_speed_kph / 3.6,
+            wind_dir=str(random.choice(compass_dirs)),
+            pressure_mb=1013.0, precip_mm=round(random.uniform(0, 2), 2), humidity_perc=random.randint(30, 100),
+            cloud_perc=random.randint(0, 100), uv_index=1.0))
+    return pd.DataFrame([(weather_data.id,) + weather_data.to_db_row() for weather_data in weather_data_list],
+                        columns=['id'] + current_weather_columns)
+
+def prepare_per_chart(weather_data_df: pd.DataFrame):
+    # The preparation of the five plot tasks before the plot frame.
+    prepared = []
+    for _ in range(3):
+        df = weather_data_df.copy()
+        df['time'] = pd.to_datetime(df['time'], format='%H:%M:%S')
+        df = df.sort_values(by='time')
+        prepared.append((df, df['time'].dt.strftime('%H:%M'),
+                         df['wind_speed_kph'].apply(lambda x: float('{:,.2f}'.format(x)))))
+    prepared.append(weather_data_df.copy())
+    df = weather_data_df.copy()
+    prepared.append((df, [direction_to_angle[direction] for direction in df['wind_dir']]))
+    return prepared, [weather_data_df] * 5
+
+def prepare_once(weather_data_df: pd.DataFrame):
+    plot_frame = prepare_plot_frame(weather_data_df)
+    return plot_frame, [plot_frame] * 5
+
+def measure(prepare, weather_data_dfs: list):
+    tracemalloc.start()
+    start = time.perf_counter()
+    prepared = [prepare(weather_data_df) for weather_data_df in weather_data_dfs]
+    seconds = time.perf_counter() - start
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    pickled_bytes = sum(len(pickle.dumps(chart_input)) for _, chart_inputs in prepared for chart_input in chart_inputs)
+    return seconds, peak_bytes, pickled_bytes
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-chart copies and time parsing vs one prepared plot frame per "
+                                                 "city and day, without the rendering itself")
+    parser.add_argument("--cities", type=int, default=100)
+    parser.add_argument("--readings-per-day", type=int, default=96)
+    args = parser.parse_args()
+
+    weather_data_dfs = [generate_weather_data_df(city_id, args.readings_per_day) for city_id in range(args.cities)]
+    prepare_once(weather_data_dfs[0])
+    prepare_per_chart(weather_data_dfs[0])
+
+    print(f"{args.cities} cities, {args.readings_per_day} readings per city")
+    print(f"{'preparation':>16} {'time (ms)':>10} {'peak memory (MiB)':>18} {'sent to pool (MiB)':>19}")
+    for name, prepare in [("per chart", prepare_per_chart), ("prepared once", prepare_once)]:
+        seconds, peak_bytes, pickled_bytes = measure(prepare, weather_data_dfs)
+        print(f"{name:>16} {seconds * 1000:>10.1f} {peak_bytes / 2 ** 20:>18.2f} {pickled_bytes / 2 ** 20:>19.2f}")
+
+
+if __name__ == "__main__":
+    main()
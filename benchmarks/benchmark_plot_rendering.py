@@ -0,0 +1,244 @@
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from datetime import date
+from datetime import time as dt_time
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(benchmarks_dir, os.pardir, "src", "pipeline", "common"))
+sys.path.append(os.path.join(benchmarks_dir, os.pardir, "src", "pipeline", "daily_weather_analysis"))
+
+import matplotlib
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import pandas as pd
+
+from plot_frame import prepare_plot_frame
+from plot_rendering import get_plot_rendering_pool, render_daily_plots, select_daily_plot_renderers
+from prefect import task
+from windrose import WindroseAxes
+from compass import compass_dirs
+
+plot_date = date(2199, 1, 1)
+
+
+# The pyplot plot tasks the pipeline used before the Figure/Agg renderers, kept here as the baseline.
+@task(retries=2, retry_delay_seconds=10, timeout_seconds=60, log_prints=True)
+def task_generate_temp_changes_plot(weather_data_df: pd.DataFrame, city: str, country: str):
+    plot_date = weather_data_df['date'].iloc[0]
+    weather_data_df['time'] = pd.to_datetime(weather_data_df['time'], format='%H:%M:%S')
+
+    df = weather_data_df.sort_values(by='time')
+
+    output_dir = f"./plots/{plot_date}"
+    os.makedirs(output_dir, exist_ok=True)
+
+    plt.figure(figsize=(12, 6))
+    plt.plot(df['time'].dt.strftime('%H:%M'), df['temp_c'], marker='o', label='Temperature (°C)',
+             color='goldenrod', linewidth=2)
+
+    plt.xlabel('Time of Day', fontsize=12, fontweight='bold')
+    plt.ylabel('Temperature (°C)', fontsize=12, fontweight='bold')
+    plt.title(f"Temperature Changes Throughout the Day for {city}, {country}\n(Date: {plot_date})",
+              fontsize=14, fontweight='bold')
+    plt.grid(color='gray', linestyle='--', linewidth=0.5, alpha=0.7)
+    plt.xticks(rotation=45, fontsize=10)
+    plt.yticks(fontsize=10)
+    plt.legend(fontsize=10)
+
+    for i, (label, temp) in enumerate(zip(df['time'].dt.strftime('%H:%M'), df['temp_c'])):
+        plt.annotate(f'{temp}°C', xy=(label, temp), xytext=(0, 5), textcoords='offset points',
+                     ha='center', fontsize=10, color='black')
+
+    output_file = os.path.join(output_dir, f"temperature_changes_{city.replace(' ', '_')}_"
+                                           f"{country.replace(' ', '_')}.png")
+    plt.tight_layout()
+    plt.savefig(output_file, dpi=300)
+    plt.close()
+
+@task(retries=2, retry_delay_seconds=10, timeout_seconds=60, log_prints=True)
+def task_generate_wind_speed_changes_plot(weather_data_df: pd.DataFrame, city: str, country: str):
+    plot_date = weather_data_df['date'].iloc[0]
+    weather_data_df['time'] = pd.to_datetime(weather_data_df['time'], format='%H:%M:%S')
+
+    df = weather_data_df.sort_values(by='time')
+
+    output_dir = f"./plots/{plot_date}"
+    os.makedirs(output_dir, exist_ok=True)
+
+    plt.figure(figsize=(12, 6))
+    plt.plot(df['time'].dt.strftime('%H:%M'), df['wind_speed_kph'].apply(lambda x: float('{:,.2f}'.format(x))),
+             marker='o', label='Wind Speed (km/h)', color='darkblue', linewidth=2)
+
+    plt.xlabel('Time of Day', fontsize=12, fontweight='bold')
+    plt.ylabel('Wind Speed (km/h)', fontsize=12, fontweight='bold')
+    plt.title(f"Wind Speed Changes Throughout the Day for {city}, {country}\n(Date: {plot_date})",
+              fontsize=14, fontweight='bold')
+    plt.grid(color='gray', linestyle='--', linewidth=0.5, alpha=0.7)
+    plt.xticks(rotation=45, fontsize=10)
+    plt.yticks(fontsize=10)
+    plt.legend(fontsize=10)
+
+    output_file = os.path.join(output_dir, f"wind_speed_changes_{city.replace(' ', '_')}_"
+                                           f"{country.replace(' ', '_')}.png")
+    plt.tight_layout()
+    plt.savefig(output_file, dpi=300)
+    plt.close()
+
+@task(retries=2, retry_delay_seconds=10, timeout_seconds=60, log_prints=True)
+def task_generate_precipitation_changes_plot(weather_data_df: pd.DataFrame, city: str, country: str):
+    plot_date = weather_data_df['date'].iloc[0]
+    weather_data_df['time'] = pd.to_datetime(weather_data_df['time'], format='%H:%M:%S')
+
+    df = weather_data_df.sort_values(by='time')
+
+    output_dir = f"./plots/{plot_date}"
+    os.makedirs(output_dir, exist_ok=True)
+
+    plt.figure(figsize=(12, 6))
+    plt.bar(df['time'].dt.strftime('%H:%M'), df['precip_mm'], color='skyblue')
+
+    plt.xlabel('Time of Day', fontsize=12, fontweight='bold')
+    plt.ylabel('Precipitation (mm)', fontsize=12, fontweight='bold')
+    plt.title(f"Precipitation Changes Throughout the Day for {city}, {country}\n(Date: {plot_date})",
+              fontsize=14, fontweight='bold')
+    plt.xticks(rotation=45, fontsize=10)
+    plt.yticks(fontsize=10)
+
+    output_file = os.path.join(output_dir, f"precipitation_changes_{city.replace(' ', '_')}_"
+                                           f"{country.replace(' ', '_')}.png")
+    plt.tight_layout()
+    plt.savefig(output_file, dpi=300)
+    plt.close()
+
+@task(retries=2, retry_delay_seconds=10, timeout_seconds=60, log_prints=True)
+def task_plot_temperature_distribution(weather_data_df: pd.DataFrame, city: str, country: str):
+    plot_date = weather_data_df['date'].iloc[0]
+
+    output_dir = f"./plots/{plot_date}"
+    os.makedirs(output_dir, exist_ok=True)
+
+    plt.figure(figsize=(8, 6))
+    plt.boxplot(weather_data_df['temp_c'])
+    plt.ylabel('Temperature (°C)', fontsize=12, fontweight='bold')
+    plt.title(f"Daily Temperature Distribution for {city}, {country}\n(Date: {plot_date})",
+              fontsize=14, fontweight='bold')
+
+    output_file = os.path.join(output_dir, f"temperature_distribution_{city.replace(' ', '_')}_"
+                                           f"{country.replace(' ', '_')}.png")
+    plt.savefig(output_file, dpi=300)
+    plt.close()
+
+@task(retries=2, retry_delay_seconds=10, timeout_seconds=60, log_prints=True)
+def task_plot_wind_rose(weather_data_df: pd.DataFrame, city: str, country: str):
+    plot_date = weather_data_df['date'].iloc[0]
+    output_dir = f"./plots/{plot_date}"
+    os.makedirs(output_dir, exist_ok=True)
+
+    direction_to_angle = {
+        "N": 0,
+        "NNE": 22.5,
+        "NE": 45,
+        "ENE": 67.5,
+        "E": 90,
+        "ESE": 112.5,
+        "SE": 135,
+        "SSE": 157.5,
+        "S": 180,
+        "SSW": 202.5,
+        "SW": 225,
+        "WSW": 247.5,
+        "W": 270,
+        "WNW": 292.5,
+        "NW": 315,
+        "NNW": 337.5
+    }
+
+    directions = weather_data_df['wind_dir']
+    angles = [direction_to_angle[direct] for direct in directions]
+
+    ax = WindroseAxes.from_ax()
+    ax.bar(angles, weather_data_df['wind_speed_mps'], normed=True, opening=0.8, edgecolor='white')
+    ax.set_title(f"Daily Wind Rose for {city}, {country}\n(Date: {plot_date})", fontsize=14, fontweight="bold")
+    ax.set_legend(title = 'Wind Speed (m/s)')
+
+    output_file = os.path.join(output_dir, f"wind_rose_{city.replace(' ', '_')}_"
+                                           f"{country.replace(' ', '_')}.png")
+    plt.savefig(output_file, dpi=300)
+    plt.close()
+
+
+def generate_weather_data_df(city: str):
+    random.seed(city)
+    rows = []
+    for hour in range(24):
+        wind_speed_kph = round(random.uniform(0, 40), 1)
+        rows.append({"date": plot_date, "time": dt_time(hour, 0), "temp_c": round(random.uniform(-5, 30), 1),
+                     "wind_speed_kph": wind_speed_kph, "wind_speed_mps": wind_speed_kph / 3.6,
+                     "wind_dir": str(random.choice(compass_dirs)), "precip_mm": round(random.uniform(0, 2), 2)})
+    return pd.DataFrame(rows)
+
+def render_with_pyplot_tasks(weather_data_dfs: dict):
+    for city, weather_data_df in weather_data_dfs.items():
+        task_generate_temp_changes_plot.fn(weather_data_df.copy(), city, "Benchmark Country")
+        task_generate_wind_speed_changes_plot.fn(weather_data_df.copy(), city, "Benchmark Country")
+        if weather_data_df['precip_mm'].sum() > 0:
+            task_generate_precipitation_changes_plot.fn(weather_data_df.copy(), city, "Benchmark Country")
+        task_plot_temperature_distribution.fn(weather_data_df.copy(), city, "Benchmark Country")
+        task_plot_wind_rose.fn(weather_data_df.copy(), city, "Benchmark Country")
+
+def render_with_figure_api_in_process(weather_data_dfs: dict):
+    for city, weather_data_df in weather_data_dfs.items():
+        plot_frame = prepare_plot_frame(weather_data_df)
+        for _, renderer in select_daily_plot_renderers(plot_frame):
+            renderer(plot_frame, city, "Benchmark Country")
+
+def render_with_process_pool_per_city(weather_data_dfs: dict):
+    for city, weather_data_df in weather_data_dfs.items():
+        render_daily_plots(prepare_plot_frame(weather_data_df), city, "Benchmark Country")
+
+def render_with_process_pool_all_cities(weather_data_dfs: dict):
+    pool = get_plot_rendering_pool()
+    plot_frames = {city: prepare_plot_frame(weather_data_df) for city, weather_data_df in weather_data_dfs.items()}
+    futures = [pool.submit(renderer, plot_frame, city, "Benchmark Country")
+               for city, plot_frame in plot_frames.items()
+               for _, renderer in select_daily_plot_renderers(plot_frame)]
+    for future in futures:
+        future.result()
+
+def time_call(function, *args):
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Sequential pyplot plot tasks vs the Figure/Agg renderers, in "
+                                                 "process and on the plot rendering process pool, and a rerun "
+                                                 "served from the plot cache")
+    parser.add_argument("--cities", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="plot-rendering-benchmark-"))
+    warm_up_dfs = {"Warm-up City": generate_weather_data_df("Warm-up City")}
+    render_with_process_pool_all_cities(warm_up_dfs)
+
+    print(f"{'cities':>8} {'pyplot tasks (s)':>18} {'figure API (s)':>16} {'pool all cities (s)':>21} "
+          f"{'pool per city (s)':>19} {'cached rerun (s)':>18}")
+    for number_of_cities in args.cities:
+        # New city names for every run, so that the plot cache never holds the charts of a previous run.
+        weather_data_dfs = {f"City-{number_of_cities}-{index}": generate_weather_data_df(f"City-{index}")
+                            for index in range(number_of_cities)}
+        print(f"{number_of_cities:>8} {time_call(render_with_pyplot_tasks, weather_data_dfs):>18.2f} "
+              f"{time_call(render_with_figure_api_in_process, weather_data_dfs):>16.2f} "
+              f"{time_call(render_with_process_pool_all_cities, weather_data_dfs):>21.2f} "
+              f"{time_call(render_with_process_pool_per_city, weather_data_dfs):>19.2f} "
+              f"{time_call(render_with_process_pool_per_city, weather_data_dfs):>18.2f}")
+
+
+if __name__ == "__main__":
+    main()
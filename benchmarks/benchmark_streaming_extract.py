@@ -0,0 +1,104 @@
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+from datetime import date, timedelta
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(benchmarks_dir, os.pardir, "src", "pipeline", "common"))
+sys.path.append(os.path.join(benchmarks_dir, os.pardir, "src", "pipeline", "daily_weather_analysis"))
+
+import pandas as pd
+
+from db_connection_pool import get_db_connection
+from extract_weather_historical_data import stream_weather_record_chunks
+from transform_weather_historical_data import DailyWeatherAggregator
+from weather_records import CurrentWeather, current_weather_columns
+
+benchmark_start_date = date(2199, 1, 1)
+readings_per_day = 96
+
+
+def insert_benchmark_rows(number_of_days: int):
+    # Every city gets a reading every 15 minutes, far in the future so that the sample data is not touched.
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO current_weather (city_id, date, time, temp_c, feels_like_c, weather_condition_code,
+                weather_condition_text, weather_condition_icon, wind_speed_kph, wind_speed_mps, wind_dir, pressure_mb,
+                precip_mm, humidity_perc, cloud_perc, uv_index)
+                SELECT c.id, %(start_date)s::DATE + day, TIME '00:00' + reading * INTERVAL '15 minutes',
+                random() * 30, random() * 30, 1003, 'Partly cloudy', '//cdn.weatherapi.com/weather/64x64/day/116.png',
+                random() * 40, random() * 40 / 3.6, 'NNE', 1013, random() * 2, (random() * 70)::INT + 30,
+                (random() * 100)::INT, 1
+                FROM city c, generate_series(0, %(days)s - 1) AS day, generate_series(0, %(readings)s - 1) AS reading
+                """, {"start_date": benchmark_start_date, "days": number_of_days, "readings": readings_per_day}
+            )
+            return cursor.rowcount
+
+def delete_benchmark_rows():
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("DELETE FROM current_weather WHERE date >= %(date)s", {"date": benchmark_start_date})
+
+def aggregate_fetchall(start_date: date, end_date: date):
+    # What task_extract_weather_record and task_transform_to_pd_df do, over the whole range at once.
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"""
+                SELECT id, {", ".join(current_weather_columns)}
+                FROM current_weather
+                WHERE date BETWEEN %(start_date)s AND %(end_date)s
+                """, {"start_date": start_date, "end_date": end_date}
+            )
+            weather_data_list = [CurrentWeather.from_db_row(row) for row in cursor.fetchall()]
+    weather_data_df = pd.DataFrame([(weather_data.id,) + weather_data.to_db_row() for weather_data in weather_data_list],
+                                   columns=['id'] + current_weather_columns)
+    return len(weather_data_df.groupby(['city_id', 'date'])['temp_c'].max())
+
+def aggregate_streaming(start_date: date, end_date: date, chunk_size: int):
+    aggregator = DailyWeatherAggregator()
+    for chunk in stream_weather_record_chunks(start_date, end_date, chunk_size=chunk_size):
+        aggregator.add(chunk)
+    return len(aggregator.results())
+
+def measure(function, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    number_of_days = function(*args)
+    seconds = time.perf_counter() - start
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak_bytes, number_of_days
+
+def main():
+    parser = argparse.ArgumentParser(description="fetchall into CurrentWeather records and a DataFrame vs a named "
+                                                 "cursor streaming column chunks into the incremental aggregator")
+    parser.add_argument("--days", type=int, nargs="+", default=[7, 30, 90])
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    print(f"{'days':>6} {'rows':>9} {'fetchall (s)':>13} {'fetchall peak (MiB)':>20} {'streaming (s)':>14} "
+          f"{'streaming peak (MiB)':>21}")
+    for number_of_days in args.days:
+        delete_benchmark_rows()
+        try:
+            number_of_rows = insert_benchmark_rows(number_of_days)
+            end_date = benchmark_start_date + timedelta(days=number_of_days - 1)
+            fetchall_seconds, fetchall_peak, fetchall_days = measure(aggregate_fetchall, benchmark_start_date,
+                                                                     end_date)
+            streaming_seconds, streaming_peak, streaming_days = measure(aggregate_streaming, benchmark_start_date,
+                                                                        end_date, args.chunk_size)
+            assert fetchall_days == streaming_days
+        finally:
+            delete_benchmark_rows()
+        print(f"{number_of_days:>6} {number_of_rows:>9} {fetchall_seconds:>13.2f} {fetchall_peak / 2 ** 20:>20.1f} "
+              f"{streaming_seconds:>14.2f} {streaming_peak / 2 ** 20:>21.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import argparse
+import os
+import sys
+import time
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(benchmarks_dir, os.pardir, "src", "pipeline", "common"))
+sys.path.append(os.path.join(benchmarks_dir, os.pardir, "src", "pipeline", "current_weather_data"))
+
+from prefect import flow, task
+from stub_weather_api import generate_current_payload
+from transform_weather_data import task_transform_weather_data_batch
+from weather_payload_transform import transform_weather_payloads
+
+
+# The task-per-field transform the pipeline used before the batched stage, kept here as the baseline.
+@task(retries=2, retry_delay_seconds=2, timeout_seconds=6)
+def task_fill_direct_city_fields(weather_data: dict, city_data_to_insert: dict):
+    city_data_to_insert['name'] = weather_data['location']['name']
+    city_data_to_insert['region'] = weather_data['location']['region']
+    city_data_to_insert['country'] = weather_data['location']['country']
+    city_data_to_insert['time_zone'] = weather_data['location']['tz_id']
+    city_data_to_insert['latitude'] = weather_data['location']['lat']
+    city_data_to_insert['longitude'] = weather_data['location']['lon']
+
+@task(retries=2, retry_delay_seconds=2, timeout_seconds=6)
+def task_fill_direct_weather_fields(weather_data: dict, weather_data_to_insert: dict):
+    weather_data_to_insert['temp_c'] = weather_data['current']['temp_c']
+    weather_data_to_insert['feels_like_c'] = weather_data['current']['feelslike_c']
+    weather_data_to_insert['weather_condition_code'] = weather_data['current']['condition']['code']
+    weather_data_to_insert['weather_condition_text'] = weather_data['current']['condition']['text']
+    weather_data_to_insert['weather_condition_icon'] = weather_data['current']['condition']['icon']
+    weather_data_to_insert['wind_speed_kph'] = weather_data['current']['wind_kph']
+    weather_data_to_insert['pressure_mb'] = weather_data['current']['pressure_mb']
+    weather_data_to_insert['precip_mm'] = weather_data['current']['precip_mm']
+    weather_data_to_insert['humidity_perc'] = weather_data['current']['humidity']
+    weather_data_to_insert['cloud_perc'] = weather_data['current']['cloud']
+    weather_data_to_insert['uv_index'] = weather_data['current']['uv']
+
+@task(retries=2, retry_delay_seconds=2, timeout_seconds=6)
+def task_transform_date_time_fields(weather_data: dict, weather_data_to_insert: dict):
+    weather_data_to_insert['date'], weather_data_to_insert['time'] = weather_data['current']['last_updated'].split()
+
+@task(retries=2, retry_delay_seconds=2, timeout_seconds=6)
+def task_transform_wind_speed_mps(weather_data: dict, weather_data_to_insert: dict):
+    weather_data_to_insert['wind_speed_mps'] = weather_data['current']['wind_kph'] / 3.6
+
+@task(retries=2, retry_delay_seconds=2, timeout_seconds=6)
+def degree_to_compass_dir(wind_degrees: int):
+    dir_position = int((wind_degrees / 22.5) + 0.5)
+    dirs_list = ["N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE", "S", "SSW", "SW", "WSW", "W", "WNW", "NW", "NNW"]
+    return dirs_list[(dir_position % 16)]
+
+@task(retries=2, retry_delay_seconds=2, timeout_seconds=6)
+def task_transform_wind_dir(weather_data: dict, weather_data_to_insert: dict):
+    weather_data_to_insert['wind_dir'] = degree_to_compass_dir(weather_data['current']['wind_degree'])
+
+@flow
+def flow_transform_task_per_field(weather_data_list: list):
+    transformed = []
+    for weather_data in weather_data_list:
+        city_data_to_insert = {}
+        task_fill_direct_city_fields(weather_data, city_data_to_insert)
+
+        weather_data_to_insert = {}
+        task_fill_direct_weather_fields(weather_data, weather_data_to_insert)
+        task_transform_date_time_fields(weather_data, weather_data_to_insert)
+        task_transform_wind_speed_mps(weather_data, weather_data_to_insert)
+        task_transform_wind_dir(weather_data, weather_data_to_insert)
+        transformed.append((city_data_to_insert, weather_data_to_insert))
+    return transformed
+
+@flow
+def flow_transform_batch(weather_data_list: list):
+    return task_transform_weather_data_batch(weather_data_list)
+
+def time_call(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Task-per-field transform vs the single batched transform stage")
+    parser.add_argument("--cities", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--pure-cities", type=int, default=100000,
+                        help="Number of payloads for the pure-Python/NumPy transform without Prefect")
+    args = parser.parse_args()
+
+    warm_up_data_list = [generate_current_payload("Warm-up City")]
+    flow_transform_task_per_field(warm_up_data_list)
+    flow_transform_batch(warm_up_data_list)
+
+    print(f"{'cities':>8} {'task per field (s)':>20} {'batched task (s)':>18} {'speed-up':>10}")
+    for number_of_cities in args.cities:
+        weather_data_list = [generate_current_payload(f"City-{index}") for index in range(number_of_cities)]
+        task_per_field_seconds, task_per_field_result = time_call(flow_transform_task_per_field, weather_data_list)
+        batch_seconds, (city_data_list, weather_data_to_insert_list) = time_call(flow_transform_batch,
+                                                                                 weather_data_list)
+        assert [weather_data['wind_dir'] for _, weather_data in task_per_field_result] == \
+               [weather_data.wind_dir for weather_data in weather_data_to_insert_list]
+        print(f"{number_of_cities:>8} {task_per_field_seconds:>20.3f} {batch_seconds:>18.3f} "
+              f"{task_per_field_seconds / batch_seconds:>9.1f}x")
+
+    weather_data_list = [generate_current_payload(f"City-{index}") for index in range(args.pure_cities)]
+    pure_seconds, _ = time_call(transform_weather_payloads, weather_data_list)
+    print(f"Pure transform of {args.pure_cities} payloads: {pure_seconds:.3f} s "
+          f"({args.pure_cities / pure_seconds:,.0f} payloads/s)")
+
+
+if __name__ == "__main__":
+    main()
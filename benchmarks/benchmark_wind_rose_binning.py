@@ -0,0 +1,60 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(benchmarks_dir, os.pardir, "src", "pipeline", "common"))
+
+from compass import (compass_degrees, compass_dirs, compass_dirs_to_codes, default_speed_bins, degree_to_compass_dir,
+                     degrees_to_compass_codes, degrees_to_compass_dirs, wind_rose_frequency_table, wind_rose_histogram)
+from windrose.windrose import histogram
+
+# The per-row lookup table of task_plot_wind_rose.
+direction_to_angle = dict(zip(compass_dirs.tolist(), compass_degrees.tolist()))
+
+
+def per_row_wind_rose_table(wind_dirs: list, wind_speeds, speed_bins):
+    angles = np.array([direction_to_angle[wind_dir] for wind_dir in wind_dirs])
+    return histogram(angles, wind_speeds, speed_bins, len(compass_dirs), len(wind_speeds), normed=True)[2]
+
+def vectorized_wind_rose_table(wind_dir_codes, wind_speeds, speed_bins):
+    return wind_rose_frequency_table(wind_rose_histogram(wind_dir_codes, wind_speeds, speed_bins))
+
+def time_call(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-row compass conversions and windrose binning vs the vectorized "
+                                                 "compass module working on direction codes")
+    parser.add_argument("--readings", type=int, nargs="+", default=[96, 96 * 7, 96 * 28, 96 * 28 * 100])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'readings':>10} {'per-row dirs (ms)':>18} {'vectorized dirs (ms)':>21} {'per-row rose (ms)':>18} "
+          f"{'vectorized rose (ms)':>21}")
+    for number_of_readings in args.readings:
+        wind_degrees = rng.uniform(0, 360, number_of_readings)
+        wind_speeds = rng.gamma(2, 2, number_of_readings)
+        speed_bins = default_speed_bins(wind_speeds)
+
+        per_row_dirs_seconds, per_row_dirs = time_call(
+            lambda: [degree_to_compass_dir(wind_degree) for wind_degree in wind_degrees.tolist()])
+        vectorized_dirs_seconds, vectorized_dirs = time_call(degrees_to_compass_dirs, wind_degrees)
+        assert per_row_dirs == vectorized_dirs.tolist()
+        assert (compass_dirs_to_codes(vectorized_dirs) == degrees_to_compass_codes(wind_degrees)).all()
+
+        per_row_rose_seconds, per_row_table = time_call(per_row_wind_rose_table, per_row_dirs, wind_speeds, speed_bins)
+        wind_dir_codes = compass_dirs_to_codes(per_row_dirs)
+        vectorized_rose_seconds, vectorized_table = time_call(vectorized_wind_rose_table, wind_dir_codes, wind_speeds,
+                                                              speed_bins)
+        assert np.allclose(per_row_table, vectorized_table)
+        print(f"{number_of_readings:>10} {per_row_dirs_seconds * 1000:>18.2f} {vectorized_dirs_seconds * 1000:>21.2f} "
+              f"{per_row_rose_seconds * 1000:>18.2f} {vectorized_rose_seconds * 1000:>21.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import argparse
+import hashlib
+import json
+import threading
+import time
+
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+compass_dirs = ["N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE", "S", "SSW", "SW", "WSW", "W", "WNW", "NW", "NNW"]
+
+
+def city_seed(city: str):
+    return int(hashlib.sha256(city.encode("utf-8")).hexdigest()[:8], 16)
+
+def generate_location(city: str):
+    seed = city_seed(city)
+    return {
+        "name": city,
+        "region": f"{city} Region",
+        "country": f"{city} Country",
+        "lat": round((seed % 18000) / 100 - 90, 4),
+        "lon": round((seed // 18000 % 36000) / 100 - 180, 4),
+        "tz_id": "Europe/Sofia",
+        "localtime_epoch": int(time.time()),
+        "localtime": datetime.now().strftime("%Y-%m-%d %H:%M")
+    }
+
+def generate_current(city: str, last_updated: datetime):
+    seed = city_seed(city) + last_updated.hour
+    wind_degree = seed % 360
+    wind_kph = round(seed % 400 / 10, 1)
+    return {
+        "last_updated_epoch": int(last_updated.timestamp()),
+        "last_updated": last_updated.strftime("%Y-%m-%d %H:%M"),
+        "temp_c": round(seed % 500 / 10 - 15, 1),
+        "is_day": int(6 <= last_updated.hour < 18),
+        "condition": {"text": "Partly cloudy", "icon": "//cdn.weatherapi.com/weather/64x64/day/116.png",
+                      "code": 1003},
+        "wind_mph": round(wind_kph / 1.609, 1),
+        "wind_kph": wind_kph,
+        "wind_degree": wind_degree,
+        "wind_dir": compass_dirs[int(wind_degree / 22.5 + 0.5) % 16],
+        "pressure_mb": 1000 + seed % 40,
+        "pressure_in": 29.9,
+        "precip_mm": round(seed % 7 / 10, 2),
+        "precip_in": 0.0,
+        "humidity": seed % 100,
+        "cloud": seed % 101,
+        "feelslike_c": round(seed % 500 / 10 - 17, 1),
+        "feelslike_f": 32.0,
+        "vis_km": 10.0,
+        "vis_miles": 6.0,
+        "uv": round(seed % 110 / 10, 1),
+        "gust_mph": 10.0,
+        "gust_kph": 16.1
+    }
+
+def generate_current_payload(city: str):
+    last_updated = datetime.now().replace(minute=datetime.now().minute // 15 * 15, second=0, microsecond=0)
+    return {"location": generate_location(city), "current": generate_current(city, last_updated)}
+
+def generate_history_payload(city: str, date: str):
+    return {
+        "location": generate_location(city),
+        "forecast": {
+            "forecastday": [
+                {
+                    "date": date,
+                    "astro": {"sunrise": "07:52 AM", "sunset": "05:11 PM", "moonrise": "11:02 AM",
+                              "moonset": "01:24 AM", "moon_phase": "Waxing Gibbous", "moon_illumination": 71},
+                    "hour": [generate_current(city, datetime.fromisoformat(date) + timedelta(hours=hour))
+                             for hour in range(24)]
+                }
+            ]
+        }
+    }
+
+
+class StubWeatherApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_throttled(self):
+        self.send_response(429)
+        self.send_header("Retry-After", "1")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        time.sleep(self.server.latency_seconds)
+        if not self.server.take_request_slot():
+            self.send_throttled()
+            return
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        city = query.get("q")
+        if not city:
+            self.send_json(400, {"error": {"code": 1003, "message": "Parameter q is missing."}})
+        elif url.path == "/v1/current.json":
+            self.send_json(200, generate_current_payload(city))
+        elif url.path == "/v1/history.json":
+            self.send_json(200, generate_history_payload(city, query.get("dt", datetime.now().date().isoformat())))
+        else:
+            self.send_json(404, {"error": {"code": 1005, "message": "API request url is invalid."}})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.server.latency_seconds)
+        if not self.server.take_request_slot():
+            self.send_throttled()
+            return
+        url = urlsplit(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        if url.path != "/v1/current.json" or query.get("q") != "bulk":
+            self.send_json(404, {"error": {"code": 1005, "message": "API request url is invalid."}})
+            return
+        try:
+            locations = json.loads(body)["locations"]
+        except (ValueError, KeyError, TypeError):
+            self.send_json(400, {"error": {"code": 2009, "message": "Invalid bulk request body."}})
+            return
+        if len(locations) > self.server.max_bulk_locations:
+            self.send_json(400, {"error": {"code": 2009, "message": f"A bulk request can have at most "
+                                                                     f"{self.server.max_bulk_locations} locations."}})
+            return
+
+        bulk = []
+        for location in locations:
+            city = location.get("q")
+            if not city or city in self.server.unknown_bulk_locations:
+                bulk.append({"query": {"custom_id": location.get("custom_id"), "q": city,
+                                       "error": {"code": 1006, "message": "No matching location found."}}})
+            else:
+                bulk.append({"query": {"custom_id": location.get("custom_id"), "q": city,
+                                       **generate_current_payload(city)}})
+        self.send_json(200, {"bulk": bulk})
+
+
+class StubWeatherApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_seconds: float = 0.05,
+                 max_requests_per_second: int = 0, max_bulk_locations: int = 50, unknown_bulk_locations: tuple = ()):
+        super().__init__((host, port), StubWeatherApiHandler)
+        self.latency_seconds = latency_seconds
+        self.max_requests_per_second = max_requests_per_second
+        self.max_bulk_locations = max_bulk_locations
+        # Locations that fail inside a bulk response but not as single requests, to exercise the fallback.
+        self.unknown_bulk_locations = set(unknown_bulk_locations)
+        self.requests_by_second = {}
+        self.throttled_requests = 0
+        self.requests_lock = threading.Lock()
+
+    def take_request_slot(self):
+        # Answers 429 once more than max_requests_per_second requests arrive within the same wall clock second.
+        if not self.max_requests_per_second:
+            return True
+        second = int(time.time())
+        with self.requests_lock:
+            self.requests_by_second = {second: self.requests_by_second.get(second, 0) + 1}
+            if self.requests_by_second[second] > self.max_requests_per_second:
+                self.throttled_requests += 1
+                return False
+            return True
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start_in_background(self):
+        thread = threading.Thread(target=self.serve_forever, name="stub-weather-api", daemon=True)
+        thread.start()
+        return thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for api.weatherapi.com")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50, help="Simulated server-side latency per request")
+    parser.add_argument("--max-requests-per-second", type=int, default=0,
+                        help="Answer 429 with Retry-After above this many requests per second, 0 for no limit")
+    parser.add_argument("--max-bulk-locations", type=int, default=50,
+                        help="Answer 400 to bulk requests with more locations than this")
+    parser.add_argument("--unknown-bulk-locations", nargs="*", default=[],
+                        help="Locations answered with an error inside bulk responses, to exercise the fallback")
+    args = parser.parse_args()
+
+    server = StubWeatherApiServer(args.host, args.port, args.latency_ms / 1000, args.max_requests_per_second,
+                                  args.max_bulk_locations, args.unknown_bulk_locations)
+    print(f"Serving stub weather API on {server.base_url} (set WEATHER_API_BASE_URL to use it)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
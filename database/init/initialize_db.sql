@@ -9,7 +9,7 @@ CREATE TABLE city (
 );
 
 CREATE TABLE current_weather(
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     city_id INT REFERENCES city(id),
     date DATE NOT NULL,
     time TIME NOT NULL,
@@ -25,8 +25,11 @@ CREATE TABLE current_weather(
     precip_mm FLOAT NOT NULL,
     humidity_perc INT NOT NULL,
     cloud_perc INT NOT NULL,
-    uv_index FLOAT NOT NULL
-);
+    uv_index FLOAT NOT NULL,
+    PRIMARY KEY (id, date)
+) PARTITION BY RANGE (date);
+
+CREATE TABLE current_weather_default PARTITION OF current_weather DEFAULT;
 
 CREATE TABLE daily_weather_analyses(
     id SERIAL PRIMARY KEY,
@@ -48,6 +51,20 @@ CREATE TABLE daily_weather_analyses(
     moon_phase VARCHAR(50) NOT NULL
 );
 
+CREATE TABLE daily_weather_running_aggregates(
+    city_id INT REFERENCES city(id),
+    date DATE NOT NULL,
+    readings_count INT NOT NULL,
+    max_temp_c FLOAT NOT NULL,
+    min_temp_c FLOAT NOT NULL,
+    sum_temp_c FLOAT NOT NULL,
+    max_wind_speed_kph FLOAT NOT NULL,
+    sum_wind_speed_kph FLOAT NOT NULL,
+    total_precip_mm FLOAT NOT NULL,
+    sum_humidity_perc BIGINT NOT NULL,
+    PRIMARY KEY (city_id, date)
+);
+
 ALTER TABLE city
 ADD CONSTRAINT city_unique_constraint
 UNIQUE(name, region, country, time_zone, latitude, longitude);
@@ -58,4 +75,39 @@ UNIQUE(city_id, date, time);
 
 ALTER TABLE daily_weather_analyses
 ADD CONSTRAINT daily_weather_unique_constraint
-UNIQUE(city_id, date);
\ No newline at end of file
+UNIQUE(city_id, date);
+
+CREATE INDEX current_weather_city_date_idx
+ON current_weather (city_id, date)
+INCLUDE (temp_c, wind_speed_kph, precip_mm, humidity_perc);
+
+CREATE INDEX city_natural_key_idx
+ON city (name, region, country)
+INCLUDE (id);
+
+CREATE FUNCTION create_current_weather_partition(partition_month DATE)
+RETURNS TEXT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    range_start DATE := date_trunc('month', partition_month)::DATE;
+    range_end DATE := (date_trunc('month', partition_month) + INTERVAL '1 month')::DATE;
+    partition_name TEXT := 'current_weather_' || to_char(partition_month, 'YYYY_MM');
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+
+    LOCK TABLE current_weather_default IN SHARE ROW EXCLUSIVE MODE;
+    EXECUTE format('CREATE TABLE %I (LIKE current_weather INCLUDING DEFAULTS)', partition_name);
+    EXECUTE format('WITH moved_rows AS (DELETE FROM current_weather_default WHERE date >= %L AND date < %L '
+                   'RETURNING *) INSERT INTO %I SELECT * FROM moved_rows', range_start, range_end, partition_name);
+    EXECUTE format('ALTER TABLE current_weather ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                   partition_name, range_start, range_end);
+    RETURN partition_name;
+END;
+$$;
+
+SELECT create_current_weather_partition(partition_month::DATE)
+FROM generate_series(date_trunc('month', CURRENT_DATE), date_trunc('month', CURRENT_DATE) + INTERVAL '3 months',
+                     INTERVAL '1 month') AS partition_month;
@@ -0,0 +1,96 @@
+-- Range-partitions current_weather by month and adds covering indexes for the (city_id, date) read path and the city
+-- natural key lookup. Every step is skipped when it is already applied, so the migration can be run more than once and
+-- against databases created with the current initialize_db.sql.
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION create_current_weather_partition(partition_month DATE)
+RETURNS TEXT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    range_start DATE := date_trunc('month', partition_month)::DATE;
+    range_end DATE := (date_trunc('month', partition_month) + INTERVAL '1 month')::DATE;
+    partition_name TEXT := 'current_weather_' || to_char(partition_month, 'YYYY_MM');
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+
+    -- Readings of the month that were stored before its partition existed are in the default partition. They are
+    -- moved into the new partition, otherwise it could not be attached.
+    LOCK TABLE current_weather_default IN SHARE ROW EXCLUSIVE MODE;
+    EXECUTE format('CREATE TABLE %I (LIKE current_weather INCLUDING DEFAULTS)', partition_name);
+    EXECUTE format('WITH moved_rows AS (DELETE FROM current_weather_default WHERE date >= %L AND date < %L '
+                   'RETURNING *) INSERT INTO %I SELECT * FROM moved_rows', range_start, range_end, partition_name);
+    EXECUTE format('ALTER TABLE current_weather ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                   partition_name, range_start, range_end);
+    RETURN partition_name;
+END;
+$$;
+
+DO $$
+DECLARE
+    partition_month DATE;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'current_weather'::REGCLASS) = 'p' THEN
+        RETURN;
+    END IF;
+
+    ALTER TABLE current_weather RENAME TO current_weather_unpartitioned;
+    ALTER INDEX current_weather_pkey RENAME TO current_weather_unpartitioned_pkey;
+    ALTER INDEX weather_unique_constraint RENAME TO weather_unique_constraint_unpartitioned;
+    ALTER TABLE current_weather_unpartitioned
+    RENAME CONSTRAINT current_weather_city_id_fkey TO current_weather_unpartitioned_city_id_fkey;
+
+    -- The primary key of a partitioned table has to contain the partition key.
+    CREATE TABLE current_weather(
+        id INT NOT NULL DEFAULT nextval('current_weather_id_seq'),
+        city_id INT REFERENCES city(id),
+        date DATE NOT NULL,
+        time TIME NOT NULL,
+        temp_c FLOAT NOT NULL,
+        feels_like_c FLOAT NOT NULL,
+        weather_condition_code INT NOT NULL,
+        weather_condition_text VARCHAR(50) NOT NULL,
+        weather_condition_icon VARCHAR(100) NOT NULL,
+        wind_speed_kph FLOAT NOT NULL,
+        wind_speed_mps FLOAT NOT NULL,
+        wind_dir VARCHAR(3) NOT NULL,
+        pressure_mb FLOAT NOT NULL,
+        precip_mm FLOAT NOT NULL,
+        humidity_perc INT NOT NULL,
+        cloud_perc INT NOT NULL,
+        uv_index FLOAT NOT NULL,
+        PRIMARY KEY (id, date)
+    ) PARTITION BY RANGE (date);
+    ALTER SEQUENCE current_weather_id_seq OWNED BY current_weather.id;
+
+    ALTER TABLE current_weather
+    ADD CONSTRAINT weather_unique_constraint
+    UNIQUE(city_id, date, time);
+
+    CREATE TABLE current_weather_default PARTITION OF current_weather DEFAULT;
+
+    FOR partition_month IN
+        SELECT generate_series(date_trunc('month', LEAST(MIN(date), CURRENT_DATE)),
+                               date_trunc('month', CURRENT_DATE) + INTERVAL '3 months', INTERVAL '1 month')::DATE
+        FROM current_weather_unpartitioned
+    LOOP
+        PERFORM create_current_weather_partition(partition_month);
+    END LOOP;
+
+    INSERT INTO current_weather SELECT * FROM current_weather_unpartitioned;
+    DROP TABLE current_weather_unpartitioned;
+END;
+$$;
+
+CREATE INDEX IF NOT EXISTS current_weather_city_date_idx
+ON current_weather (city_id, date)
+INCLUDE (temp_c, wind_speed_kph, precip_mm, humidity_perc);
+
+CREATE INDEX IF NOT EXISTS city_natural_key_idx
+ON city (name, region, country)
+INCLUDE (id);
+
+COMMIT;
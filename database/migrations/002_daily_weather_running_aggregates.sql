@@ -0,0 +1,40 @@
+-- Adds the running per (city, date) aggregates that the ingest maintains for every inserted reading, and fills them
+-- from the readings that are already stored. Safe to run more than once.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS daily_weather_running_aggregates(
+    city_id INT REFERENCES city(id),
+    date DATE NOT NULL,
+    readings_count INT NOT NULL,
+    max_temp_c FLOAT NOT NULL,
+    min_temp_c FLOAT NOT NULL,
+    sum_temp_c FLOAT NOT NULL,
+    max_wind_speed_kph FLOAT NOT NULL,
+    sum_wind_speed_kph FLOAT NOT NULL,
+    total_precip_mm FLOAT NOT NULL,
+    sum_humidity_perc BIGINT NOT NULL,
+    PRIMARY KEY (city_id, date)
+);
+
+LOCK TABLE daily_weather_running_aggregates IN EXCLUSIVE MODE;
+
+INSERT INTO daily_weather_running_aggregates (
+    city_id,
+    date,
+    readings_count,
+    max_temp_c,
+    min_temp_c,
+    sum_temp_c,
+    max_wind_speed_kph,
+    sum_wind_speed_kph,
+    total_precip_mm,
+    sum_humidity_perc
+)
+SELECT city_id, date, COUNT(*), MAX(temp_c), MIN(temp_c), SUM(temp_c), MAX(wind_speed_kph), SUM(wind_speed_kph),
+SUM(precip_mm), SUM(humidity_perc)
+FROM current_weather
+GROUP BY city_id, date
+ON CONFLICT (city_id, date) DO NOTHING;
+
+COMMIT;
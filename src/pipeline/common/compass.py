@@ -0,0 +1,44 @@
+import numpy as np
+
+compass_dirs = np.array(["N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE",
+                         "S", "SSW", "SW", "WSW", "W", "WNW", "NW", "NNW"])
+compass_degrees = np.arange(len(compass_dirs)) * 22.5
+
+compass_dir_codes = {compass_dir: code for code, compass_dir in enumerate(compass_dirs.tolist())}
+
+
+def degrees_to_compass_codes(degrees):
+    return ((np.asarray(degrees, dtype=np.float64) / 22.5 + 0.5).astype(np.int64) % 16).astype(np.int8)
+
+def degrees_to_compass_dirs(degrees):
+    return compass_dirs[degrees_to_compass_codes(degrees)]
+
+def degree_to_compass_dir(degree: float):
+    return str(compass_dirs[int(degree / 22.5 + 0.5) % 16])
+
+def compass_dirs_to_codes(dirs):
+    try:
+        return np.fromiter((compass_dir_codes[compass_dir] for compass_dir in dirs), dtype=np.int8, count=len(dirs))
+    except KeyError as e:
+        raise ValueError(f"Unknown compass direction: {e.args[0]}") from e
+
+def compass_codes_to_degrees(codes):
+    return compass_degrees[np.asarray(codes, dtype=np.int64)]
+
+def default_speed_bins(speeds, number_of_bins: int = 6):
+    return np.linspace(np.min(speeds), np.max(speeds), number_of_bins)
+
+def wind_rose_histogram(compass_codes, speeds, speed_bins):
+    speed_codes = np.searchsorted(np.asarray(speed_bins, dtype=np.float64), np.asarray(speeds, dtype=np.float64),
+                                  side='right') - 1
+    if (speed_codes < 0).any():
+        raise ValueError("The first speed bin must be less than or equal to the lowest speed")
+    cells = speed_codes * len(compass_dirs) + np.asarray(compass_codes, dtype=np.int64)
+    return np.bincount(cells, minlength=len(speed_bins) * len(compass_dirs)).reshape(len(speed_bins),
+                                                                                    len(compass_dirs))
+
+def wind_rose_frequency_table(histogram):
+    total = histogram.sum()
+    if total == 0:
+        return np.zeros(histogram.shape, dtype=np.float64)
+    return histogram * 100 / total
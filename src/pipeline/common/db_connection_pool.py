@@ -0,0 +1,118 @@
+import atexit
+import os
+import psycopg2
+import threading
+import time
+
+from contextlib import contextmanager
+from instrumentation import increment, observe, timer
+from pipeline_config import load_environment
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+
+load_environment()
+
+db_user = os.getenv("DB_USER")
+db_password = os.getenv("DB_PASSWORD")
+db_name = os.getenv("DB_NAME")
+db_host = os.getenv("DB_HOST")
+
+db_pool_min_size = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+db_pool_max_size = int(os.getenv("DB_POOL_MAX_SIZE", "5"))
+db_pool_acquire_timeout_seconds = float(os.getenv("DB_POOL_ACQUIRE_TIMEOUT_SECONDS", "30"))
+db_pool_health_check_after_seconds = float(os.getenv("DB_POOL_HEALTH_CHECK_AFTER_SECONDS", "30"))
+
+
+class DatabaseConnectionPool:
+    def __init__(self, min_size: int = db_pool_min_size, max_size: int = db_pool_max_size,
+                 acquire_timeout_seconds: float = db_pool_acquire_timeout_seconds,
+                 health_check_after_seconds: float = db_pool_health_check_after_seconds, **connect_kwargs):
+        if not connect_kwargs:
+            connect_kwargs = {"user": db_user, "password": db_password, "host": db_host, "dbname": db_name}
+        self.acquire_timeout_seconds = acquire_timeout_seconds
+        self.health_check_after_seconds = health_check_after_seconds
+        self._pool = ThreadedConnectionPool(min_size, max_size, keepalives=1, keepalives_idle=30, **connect_kwargs)
+        self._available = threading.BoundedSemaphore(max_size)
+        self._last_released = {}
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        last_released = self._last_released.get(id(conn))
+        if last_released is not None and time.monotonic() - last_released < self.health_check_after_seconds:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def acquire(self):
+        if not self._available.acquire(timeout=self.acquire_timeout_seconds):
+            raise PoolError(f"No database connection became available within {self.acquire_timeout_seconds} seconds")
+        try:
+            conn = self._pool.getconn()
+            if not self._is_healthy(conn):
+                self._discard(conn)
+                conn = self._pool.getconn()
+            return conn
+        except Exception:
+            self._available.release()
+            raise
+
+    def _discard(self, conn):
+        increment("db_connections_discarded_total")
+        self._last_released.pop(id(conn), None)
+        self._pool.putconn(conn, close=True)
+
+    def release(self, conn):
+        try:
+            if conn.closed:
+                self._discard(conn)
+            else:
+                self._last_released[id(conn)] = time.monotonic()
+                self._pool.putconn(conn)
+        finally:
+            self._available.release()
+
+    @contextmanager
+    def connection(self):
+        with timer("db_connection_acquire_seconds"):
+            conn = self.acquire()
+        start = time.perf_counter()
+        try:
+            yield conn
+            conn.commit()
+            increment("db_transactions_total", outcome="committed")
+        except Exception:
+            increment("db_transactions_total", outcome="rolled_back")
+            if not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    pass
+            raise
+        finally:
+            observe("db_transaction_seconds", time.perf_counter() - start)
+            self.release(conn)
+
+    def close(self):
+        if not self._pool.closed:
+            self._pool.closeall()
+
+
+db_connection_pool = None
+db_connection_pool_lock = threading.Lock()
+
+
+def get_db_connection_pool():
+    global db_connection_pool
+    with db_connection_pool_lock:
+        if db_connection_pool is None:
+            db_connection_pool = DatabaseConnectionPool()
+            atexit.register(db_connection_pool.close)
+        return db_connection_pool
+
+def get_db_connection():
+    return get_db_connection_pool().connection()
@@ -0,0 +1,114 @@
+import argparse
+import csv
+import math
+import os
+
+from dataclasses import dataclass
+from pipeline_config import load_environment
+from time_utils import get_time_zone
+from zoneinfo import ZoneInfoNotFoundError
+
+load_environment()
+
+default_city_registry_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, os.pardir,
+                                          "config", "cities.csv")
+city_registry_path = os.getenv("CITY_REGISTRY_PATH", default_city_registry_path)
+city_registry_sources = ["csv", "database"]
+city_registry_source = os.getenv("CITY_REGISTRY_SOURCE", "csv")
+max_cities_per_deployment = int(os.getenv("MAX_CITIES_PER_DEPLOYMENT", "50"))
+
+# The nightly analyses run after the last hourly shard and finalize the previous day.
+hourly_first_minute = 5
+hourly_window_minutes = 50
+daily_hour = 0
+daily_first_minute = 15
+daily_window_minutes = 30
+
+
+@dataclass(frozen=True)
+class RegisteredCity:
+    name: str
+    time_zone: str
+    query: str
+
+
+def load_city_registry(path: str = city_registry_path):
+    cities = {}
+    with open(path, newline="", encoding="utf-8") as registry_file:
+        for line_number, row in enumerate(csv.DictReader(registry_file), start=2):
+            name, time_zone = (row.get("name") or "").strip(), (row.get("time_zone") or "").strip()
+            if not name:
+                continue
+            try:
+                get_time_zone(time_zone)
+            except (ValueError, ZoneInfoNotFoundError):
+                raise ValueError(f"{path}:{line_number}: unknown time zone {time_zone!r} for {name}") from None
+            query = (row.get("query") or "").strip() or name
+            cities.setdefault((name, time_zone), RegisteredCity(name, time_zone, query))
+    return list(cities.values())
+
+def load_city_registry_from_database():
+    from db_connection_pool import get_db_connection
+
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT name, time_zone, latitude, longitude FROM city ORDER BY name, time_zone, id")
+            return [RegisteredCity(name, time_zone, f"{latitude},{longitude}")
+                    for name, time_zone, latitude, longitude in cursor.fetchall()]
+
+def get_registered_cities(source: str = city_registry_source, path: str = city_registry_path):
+    if source == "database":
+        return load_city_registry_from_database()
+    return load_city_registry(path)
+
+def split_evenly(items: list, number_of_parts: int):
+    return [items[index * len(items) // number_of_parts:(index + 1) * len(items) // number_of_parts]
+            for index in range(number_of_parts)]
+
+def spread_minutes(count: int, first_minute: int, window_minutes: int):
+    return [first_minute + index * window_minutes // count for index in range(count)]
+
+def format_time_zone_slug(time_zone: str):
+    return time_zone.lower().replace("/", "-").replace("_", "-")
+
+def plan_hourly_deployments(cities: list, max_cities: int = max_cities_per_deployment):
+    queries = sorted({city.query for city in cities})
+    if not queries:
+        return []
+    shard_count = math.ceil(len(queries) / max(1, max_cities))
+    minutes = spread_minutes(shard_count, hourly_first_minute, hourly_window_minutes)
+    return [{"name": f"weather-data-batch-hourly-shard-{index + 1}-of-{shard_count}-flow-deployment",
+             "cron": f"{minute} * * * *", "parameters": {"cities": shard}}
+            for index, (minute, shard) in enumerate(zip(minutes, split_evenly(queries, shard_count)))]
+
+def plan_daily_deployments(cities: list):
+    cities_by_time_zone = {}
+    for city in cities:
+        cities_by_time_zone.setdefault(city.time_zone, set()).add(city.name)
+    time_zones = sorted(cities_by_time_zone)
+    minutes = spread_minutes(len(time_zones), daily_first_minute, daily_window_minutes)
+    return [{"name": f"weather-analysis-{format_time_zone_slug(time_zone)}-daily-flow-deployment",
+             "cron": f"{minute} {daily_hour} * * *", "time_zone": time_zone,
+             "parameters": {"time_zone": time_zone, "cities": sorted(cities_by_time_zone[time_zone]),
+                            "previous_day": True}}
+            for time_zone, minute in zip(time_zones, minutes)]
+
+def select_worker_deployments(deployments: list, worker_index: int, worker_count: int):
+    return deployments[worker_index::worker_count]
+
+def add_registry_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--city-registry-source", choices=city_registry_sources, default=city_registry_source,
+                        help="Read the cities from the registry CSV file or from the city table")
+    parser.add_argument("--city-registry-path", default=city_registry_path,
+                        help="CSV file with the name, time_zone and optional query of every city")
+    parser.add_argument("--max-cities-per-deployment", type=int, default=max_cities_per_deployment,
+                        help="Number of cities above which the hourly extraction is split into more deployments")
+    parser.add_argument("--worker-index", type=int, default=0,
+                        help="Index of this process among the --worker-count processes that share the deployments")
+    parser.add_argument("--worker-count", type=int, default=1)
+
+def validate_registry_arguments(parser: argparse.ArgumentParser, args: argparse.Namespace):
+    if args.max_cities_per_deployment < 1:
+        parser.error("--max-cities-per-deployment must be at least 1")
+    if args.worker_count < 1 or not 0 <= args.worker_index < args.worker_count:
+        parser.error("--worker-index must be between 0 and --worker-count - 1")
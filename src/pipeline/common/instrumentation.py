@@ -0,0 +1,248 @@
+import atexit
+import cProfile
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pipeline_config import load_environment
+from ttl_cache import get_cache_stats
+
+load_environment()
+
+metrics_dir = os.getenv("METRICS_DIR")
+metrics_log_path = os.getenv("METRICS_LOG_PATH")
+metrics_port = int(os.getenv("METRICS_PORT", "0"))
+profile_flow_runs = os.getenv("PROFILE_FLOW_RUNS", "false").lower() in ("1", "true", "yes")
+profile_output_dir = os.getenv("PROFILE_OUTPUT_DIR", "./profiles")
+
+metric_prefix = "weather_pipeline_"
+default_buckets = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+
+def escape_label_value(value: str):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_series(name: str, labels: tuple):
+    if not labels:
+        return f"{metric_prefix}{name}"
+    formatted_labels = ",".join(f'{key}="{escape_label_value(value)}"' for key, value in labels)
+    return f"{metric_prefix}{name}{{{formatted_labels}}}"
+
+
+class MetricsRegistry:
+    def __init__(self, buckets: tuple = default_buckets):
+        self.buckets = buckets
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, labels: dict):
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def increment(self, name: str, value: float = 1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name: str, seconds: float, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = {"buckets": [0] * len(self.buckets), "count": 0, "sum": 0.0}
+            histogram["count"] += 1
+            histogram["sum"] += seconds
+            for index, upper_bound in enumerate(self.buckets):
+                if seconds <= upper_bound:
+                    histogram["buckets"][index] += 1
+                    break
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": {format_series(*key): value for key, value in self._counters.items()},
+                "gauges": {format_series(*key): value for key, value in self._gauges.items()},
+                "timers": {format_series(*key): {"count": histogram["count"], "sum": histogram["sum"]}
+                           for key, histogram in self._histograms.items()},
+            }
+
+    def to_prometheus_text(self):
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted((key, dict(histogram, buckets=list(histogram["buckets"])))
+                                for key, histogram in self._histograms.items())
+
+        lines = []
+        declared_names = set()
+
+        def declare(name: str, metric_type: str):
+            if name not in declared_names:
+                declared_names.add(name)
+                lines.append(f"# TYPE {metric_prefix}{name} {metric_type}")
+
+        for (name, labels), value in counters:
+            declare(name, "counter")
+            lines.append(f"{format_series(name, labels)} {value}")
+        for (name, labels), value in gauges:
+            declare(name, "gauge")
+            lines.append(f"{format_series(name, labels)} {value}")
+        for (name, labels), histogram in histograms:
+            declare(name, "histogram")
+            cumulative_count = 0
+            for upper_bound, bucket_count in zip(self.buckets, histogram["buckets"]):
+                cumulative_count += bucket_count
+                lines.append(f"{format_series(f'{name}_bucket', labels + (('le', str(upper_bound)),))} "
+                             f"{cumulative_count}")
+            lines.append(f"{format_series(f'{name}_bucket', labels + (('le', '+Inf'),))} {histogram['count']}")
+            lines.append(f"{format_series(f'{name}_sum', labels)} {histogram['sum']}")
+            lines.append(f"{format_series(f'{name}_count', labels)} {histogram['count']}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = get_metrics_registry().to_prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(port: int):
+    server = ThreadingHTTPServer(("0.0.0.0", port), MetricsRequestHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    atexit.register(server.shutdown)
+    return server
+
+
+metrics_registry = None
+metrics_registry_lock = threading.Lock()
+
+
+def get_metrics_registry():
+    global metrics_registry
+    with metrics_registry_lock:
+        if metrics_registry is None:
+            metrics_registry = MetricsRegistry()
+            if metrics_port:
+                try:
+                    start_metrics_server(metrics_port)
+                except OSError as e:
+                    print(f"Could not serve the metrics on port {metrics_port}: {e}", file=sys.stderr)
+        return metrics_registry
+
+def increment(name: str, value: float = 1, **labels):
+    get_metrics_registry().increment(name, value, **labels)
+
+def observe(name: str, seconds: float, **labels):
+    get_metrics_registry().observe(name, seconds, **labels)
+
+def timer(name: str, **labels):
+    return get_metrics_registry().timer(name, **labels)
+
+def update_cache_gauges(registry: MetricsRegistry):
+    for cache_name, cache_stats in get_cache_stats().items():
+        for stat, value in cache_stats.items():
+            registry.set_gauge(f"cache_{stat}", value, cache=cache_name)
+
+def write_prometheus_file(registry: MetricsRegistry, flow_name: str, output_dir: str = metrics_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    output_file = os.path.join(output_dir, f"{flow_name}.prom")
+    temp_file = f"{output_file}.{os.getpid()}.tmp"
+    with open(temp_file, "w", encoding="utf-8") as prometheus_file:
+        prometheus_file.write(registry.to_prometheus_text())
+    os.replace(temp_file, output_file)
+    return output_file
+
+def diff_snapshots(before: dict, after: dict):
+    counters = {series: value - before["counters"].get(series, 0) for series, value in after["counters"].items()
+                if value != before["counters"].get(series, 0)}
+    timers = {}
+    for series, timer_values in after["timers"].items():
+        previous = before["timers"].get(series, {"count": 0, "sum": 0.0})
+        if timer_values["count"] != previous["count"]:
+            timers[series] = {"count": timer_values["count"] - previous["count"],
+                              "sum": round(timer_values["sum"] - previous["sum"], 6)}
+    return {"counters": counters, "gauges": after["gauges"], "timers": timers}
+
+def append_json_log(record: dict, log_path: str = metrics_log_path):
+    os.makedirs(os.path.dirname(os.path.abspath(log_path)), exist_ok=True)
+    with open(log_path, "a", encoding="utf-8") as log_file:
+        log_file.write(json.dumps(record, default=str) + "\n")
+
+def get_flow_run_labels(default_flow_name: str):
+    from prefect.runtime import flow_run
+
+    return flow_run.flow_name or default_flow_name, flow_run.name, flow_run.id
+
+@contextmanager
+def flow_run_instrumentation(flow_name: str):
+    registry = get_metrics_registry()
+    flow_name, flow_run_name, flow_run_id = get_flow_run_labels(flow_name)
+    before = registry.snapshot()
+    profiler = cProfile.Profile() if profile_flow_runs else None
+    started_at = datetime.now(timezone.utc)
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    succeeded = False
+    try:
+        yield
+        succeeded = True
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        duration_seconds = time.perf_counter() - start
+        registry.observe("flow_run_seconds", duration_seconds, flow=flow_name)
+        registry.increment("flow_runs_total", flow=flow_name, state="completed" if succeeded else "failed")
+        update_cache_gauges(registry)
+
+        if profiler is not None:
+            os.makedirs(profile_output_dir, exist_ok=True)
+            profiler.dump_stats(os.path.join(profile_output_dir,
+                                             f"{flow_name}-{started_at:%Y%m%dT%H%M%S}-{os.getpid()}.prof"))
+        if metrics_dir:
+            write_prometheus_file(registry, flow_name)
+        if metrics_log_path:
+            append_json_log({"timestamp": started_at.isoformat(), "event": "flow_run_metrics", "flow": flow_name,
+                             "flow_run": flow_run_name, "flow_run_id": flow_run_id,
+                             "state": "completed" if succeeded else "failed",
+                             "duration_seconds": round(duration_seconds, 6),
+                             **diff_snapshots(before, registry.snapshot())})
+
+def instrument_flow_run(function):
+    @functools.wraps(function)
+    def instrumented_function(*args, **kwargs):
+        with flow_run_instrumentation(function.__name__):
+            return function(*args, **kwargs)
+    return instrumented_function
@@ -0,0 +1,147 @@
+import datetime
+import functools
+import operator
+import os
+import uuid
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from instrumentation import increment, timer
+from pipeline_config import load_environment
+from pyarrow import fs
+from time_utils import local_to_utc
+
+load_environment()
+
+parquet_export_dir = os.getenv("PARQUET_EXPORT_DIR", "./data/parquet")
+
+partition_schema = pa.schema([("city_id", pa.int32()), ("date", pa.date32())])
+
+derived_columns = {"utc_timestamp"}
+
+parquet_table_schemas = {
+    "current_weather": pa.schema([
+        ("id", pa.int32()),
+        ("city_id", pa.int32()),
+        ("date", pa.date32()),
+        ("time", pa.time64("us")),
+        ("temp_c", pa.float64()),
+        ("feels_like_c", pa.float64()),
+        ("weather_condition_code", pa.int32()),
+        ("weather_condition_text", pa.string()),
+        ("weather_condition_icon", pa.string()),
+        ("wind_speed_kph", pa.float64()),
+        ("wind_speed_mps", pa.float64()),
+        ("wind_dir", pa.string()),
+        ("pressure_mb", pa.float64()),
+        ("precip_mm", pa.float64()),
+        ("humidity_perc", pa.int32()),
+        ("cloud_perc", pa.int32()),
+        ("uv_index", pa.float64()),
+        ("utc_timestamp", pa.timestamp("s", tz="UTC")),
+    ]),
+    "daily_weather_analyses": pa.schema([
+        ("id", pa.int32()),
+        ("city_id", pa.int32()),
+        ("date", pa.date32()),
+        ("max_temp_c", pa.float64()),
+        ("min_temp_c", pa.float64()),
+        ("avg_temp_c", pa.float64()),
+        ("max_wind_speed_kph", pa.float64()),
+        ("max_wind_speed_mps", pa.float64()),
+        ("avg_wind_speed_kph", pa.float64()),
+        ("avg_wind_speed_mps", pa.float64()),
+        ("total_precip_mm", pa.float64()),
+        ("avg_humidity_perc", pa.int32()),
+        ("sunrise", pa.time64("us")),
+        ("sunset", pa.time64("us")),
+        ("moonrise", pa.time64("us")),
+        ("moonset", pa.time64("us")),
+        ("moon_phase", pa.string()),
+    ]),
+}
+
+
+def get_file_schema(table_name: str):
+    schema = parquet_table_schemas[table_name]
+    return pa.schema([field for field in schema if field.name not in partition_schema.names])
+
+def get_table_columns(table_name: str):
+    return [name for name in get_file_schema(table_name).names if name not in derived_columns]
+
+def get_city_time_zones(cursor, city_ids):
+    cursor.execute("SELECT id, time_zone FROM city WHERE id = ANY(%(city_ids)s)", {"city_ids": list(city_ids)})
+    return dict(cursor.fetchall())
+
+def generate_partition_dir(table_name: str, city_id: int, partition_date: datetime.date,
+                           export_dir: str = parquet_export_dir):
+    return os.path.join(export_dir, table_name, f"city_id={city_id}", f"date={partition_date.isoformat()}")
+
+def write_partition(table_name: str, city_id: int, partition_date: datetime.date, rows: list,
+                    export_dir: str = parquet_export_dir, time_zone: str = None):
+    file_schema = get_file_schema(table_name)
+    columns = list(zip(*rows))
+    if "utc_timestamp" in file_schema.names:
+        times = columns[file_schema.names.index("time")]
+        columns.append(local_to_utc([partition_date] * len(times), times, time_zone))
+    table = pa.Table.from_arrays([pa.array(column, type=field.type) for column, field in zip(columns, file_schema)],
+                                 schema=file_schema)
+
+    partition_dir = generate_partition_dir(table_name, city_id, partition_date, export_dir)
+    os.makedirs(partition_dir, exist_ok=True)
+    output_file = os.path.join(partition_dir, "part-0.parquet")
+    temp_file = os.path.join(partition_dir, f".part-0.parquet.{uuid.uuid4().hex}")
+    try:
+        pq.write_table(table, temp_file)
+        os.replace(temp_file, output_file)
+    except Exception:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+    return output_file
+
+def export_partitions(cursor, table_name: str, ids: list, export_dir: str = parquet_export_dir):
+    cursor.execute(
+        f"""
+        SELECT city_id, date, {", ".join(get_table_columns(table_name))}
+        FROM {table_name}
+        WHERE (city_id, date) IN (SELECT DISTINCT city_id, date FROM {table_name} WHERE id = ANY(%(ids)s))
+        ORDER BY city_id, date, id
+        """, {"ids": list(ids)}
+    )
+
+    partitions = {}
+    for row in cursor.fetchall():
+        partitions.setdefault((row[0], row[1]), []).append(row[2:])
+    time_zones = {}
+    if partitions and "utc_timestamp" in get_file_schema(table_name).names:
+        time_zones = get_city_time_zones(cursor, {city_id for city_id, _ in partitions})
+    with timer("parquet_write_seconds", table=table_name):
+        output_files = [write_partition(table_name, city_id, partition_date, rows, export_dir, time_zones.get(city_id))
+                        for (city_id, partition_date), rows in partitions.items()]
+    increment("parquet_partitions_written_total", len(output_files), table=table_name)
+    return output_files
+
+def read_partitions(table_name: str, start_date: datetime.date = None, end_date: datetime.date = None,
+                    city_ids: list = None, columns: list = None, export_dir: str = parquet_export_dir):
+    import pandas as pd
+
+    table_dir = os.path.join(export_dir, table_name)
+    if not os.path.isdir(table_dir):
+        return pd.DataFrame(columns=columns or parquet_table_schemas[table_name].names)
+
+    dataset = ds.dataset(table_dir, schema=parquet_table_schemas[table_name], format="parquet",
+                         filesystem=fs.LocalFileSystem(use_mmap=True),
+                         partitioning=ds.partitioning(partition_schema, flavor="hive"))
+
+    conditions = []
+    if start_date is not None:
+        conditions.append(ds.field("date") >= start_date)
+    if end_date is not None:
+        conditions.append(ds.field("date") <= end_date)
+    if city_ids is not None:
+        conditions.append(ds.field("city_id").isin(list(city_ids)))
+    partition_filter = functools.reduce(operator.and_, conditions) if conditions else None
+
+    return dataset.to_table(columns=columns, filter=partition_filter).to_pandas()
@@ -0,0 +1,7 @@
+from dotenv import load_dotenv
+from functools import lru_cache
+
+
+@lru_cache(maxsize=None)
+def load_environment():
+    return load_dotenv()
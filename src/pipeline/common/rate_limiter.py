@@ -0,0 +1,91 @@
+import os
+import sqlite3
+import threading
+import time
+
+from pipeline_config import load_environment
+
+load_environment()
+
+rate_limit_per_second = float(os.getenv("WEATHER_API_RATE_LIMIT_PER_SECOND", "0"))
+rate_limit_burst = int(os.getenv("WEATHER_API_RATE_LIMIT_BURST", "10"))
+rate_limit_db_path = os.getenv("RATE_LIMIT_DB_PATH", os.getenv("CACHE_DB_PATH"))
+
+
+class TokenBucket:
+    def __init__(self, name: str, rate_per_second: float, burst: int):
+        self.name = name
+        self.interval_seconds = 1 / rate_per_second if rate_per_second > 0 else 0.0
+        self.burst = max(1, burst)
+        self._state = (0.0, 0.0)
+        self._lock = threading.Lock()
+
+    def _transact(self, update):
+        with self._lock:
+            self._state, result = update(*self._state)
+            return result
+
+    def reserve(self):
+        now = time.time()
+
+        def update(arrival_time: float, paused_until: float):
+            start = max(now, paused_until)
+            arrival_time = max(arrival_time, start) + self.interval_seconds
+            return (arrival_time, paused_until), max(start, arrival_time - self.burst * self.interval_seconds) - now
+        return self._transact(update)
+
+    def pause(self, seconds: float):
+        resume_at = time.time() + seconds
+
+        def update(arrival_time: float, paused_until: float):
+            paused_until = max(paused_until, resume_at)
+            return (max(arrival_time, paused_until + self.burst * self.interval_seconds), paused_until), paused_until
+        return self._transact(update)
+
+
+class SQLiteTokenBucket(TokenBucket):
+    def __init__(self, name: str, rate_per_second: float, burst: int, db_path: str):
+        super().__init__(name, rate_per_second, burst)
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS rate_limiter_buckets (name TEXT PRIMARY KEY, "
+                         "arrival_time REAL NOT NULL, paused_until REAL NOT NULL)")
+        self._db.execute("INSERT OR IGNORE INTO rate_limiter_buckets (name, arrival_time, paused_until) "
+                         "VALUES (?, 0, 0)", (name,))
+
+    def _transact(self, update):
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock up front, so two processes never hand out the same slot.
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                state = self._db.execute("SELECT arrival_time, paused_until FROM rate_limiter_buckets WHERE name=?",
+                                         (self.name,)).fetchone()
+                state, result = update(*state)
+                self._db.execute("UPDATE rate_limiter_buckets SET arrival_time=?, paused_until=? WHERE name=?",
+                                 (*state, self.name))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            return result
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+rate_limiter = None
+rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    global rate_limiter
+    with rate_limiter_lock:
+        if rate_limiter is None:
+            if rate_limit_db_path:
+                rate_limiter = SQLiteTokenBucket("weather_api", rate_limit_per_second, rate_limit_burst,
+                                                 rate_limit_db_path)
+            else:
+                rate_limiter = TokenBucket("weather_api", rate_limit_per_second, rate_limit_burst)
+        return rate_limiter
@@ -0,0 +1,40 @@
+import datetime
+
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+run_name_time_zone = "Europe/Sofia"
+run_name_format = "%Y-%m-%d-in-%H:%M:%S"
+
+
+@lru_cache(maxsize=None)
+def get_time_zone(time_zone: str):
+    return ZoneInfo(time_zone)
+
+def convert_local_datetime(local_datetime: datetime.datetime, from_time_zone: str, to_time_zone: str = "UTC"):
+    # Ambiguous local times, i.e. the repeated hour at the end of daylight saving time, resolve to the first one.
+    return local_datetime.replace(tzinfo=get_time_zone(from_time_zone)).astimezone(get_time_zone(to_time_zone))
+
+def format_run_name_datetime(local_datetime: datetime.datetime, time_zone: str):
+    return convert_local_datetime(local_datetime, time_zone, run_name_time_zone).strftime(run_name_format)
+
+def get_local_date(time_zone: str):
+    return datetime.datetime.now(get_time_zone(time_zone)).date()
+
+def local_to_utc(dates, times, time_zones):
+    import numpy as np
+
+    local_datetimes = (np.asarray(dates, dtype="datetime64[D]").astype("datetime64[s]")
+                       + np.fromiter((value.hour * 3600 + value.minute * 60 + value.second for value in times),
+                                     dtype=np.int64, count=len(times)).astype("timedelta64[s]"))
+    time_zones = np.broadcast_to(np.asarray(time_zones, dtype=object), local_datetimes.shape)
+
+    utc_datetimes = np.empty_like(local_datetimes)
+    for time_zone in set(time_zones.tolist()):
+        in_time_zone = time_zones == time_zone
+        unique_datetimes, inverse = np.unique(local_datetimes[in_time_zone], return_inverse=True)
+        zone = get_time_zone(time_zone)
+        offsets = np.array([zone.utcoffset(local_datetime).total_seconds()
+                            for local_datetime in unique_datetimes.astype(object)], dtype=np.int64)
+        utc_datetimes[in_time_zone] = unique_datetimes[inverse] - offsets[inverse].astype("timedelta64[s]")
+    return utc_datetimes
@@ -0,0 +1,117 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from collections import OrderedDict
+from pipeline_config import load_environment
+
+load_environment()
+
+cache_db_path = os.getenv("CACHE_DB_PATH")
+cache_max_entries = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+city_id_cache_ttl_seconds = float(os.getenv("CITY_ID_CACHE_TTL_SECONDS", str(24 * 3600)))
+astro_cache_ttl_seconds = float(os.getenv("ASTRO_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+
+
+class TTLCache:
+    def __init__(self, name: str, ttl_seconds: float, max_entries: int = cache_max_entries, db_path: str = None):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS cache_entries (cache_name TEXT NOT NULL, key TEXT NOT NULL, "
+                             "value TEXT NOT NULL, expires_at REAL NOT NULL, PRIMARY KEY (cache_name, key))")
+            self._db.execute("DELETE FROM cache_entries WHERE cache_name=? AND expires_at <= ?", (name, time.time()))
+
+    @staticmethod
+    def _serialize_key(key):
+        return json.dumps(key, default=str)
+
+    def _get_persisted(self, key):
+        row = self._db.execute("SELECT value, expires_at FROM cache_entries WHERE cache_name=? AND key=? "
+                               "AND expires_at > ?", (self.name, self._serialize_key(key), time.time())).fetchone()
+        return (row[1], json.loads(row[0])) if row else None
+
+    def _store(self, key, expires_at: float, value):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.time():
+                del self._entries[key]
+                entry = None
+            if entry is None and self._db is not None:
+                entry = self._get_persisted(key)
+                if entry is not None:
+                    self._store(key, *entry)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._store(key, expires_at, value)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO cache_entries (cache_name, key, value, expires_at) "
+                                 "VALUES (?, ?, ?, ?)", (self.name, self._serialize_key(key), json.dumps(value),
+                                                         expires_at))
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM cache_entries WHERE cache_name=? AND key=?",
+                                 (self.name, self._serialize_key(key)))
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "size": len(self._entries)}
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+caches = {}
+caches_lock = threading.Lock()
+
+
+def get_cache(name: str, ttl_seconds: float):
+    with caches_lock:
+        if name not in caches:
+            caches[name] = TTLCache(name, ttl_seconds, db_path=cache_db_path)
+        return caches[name]
+
+def get_city_id_cache():
+    return get_cache("city_ids", city_id_cache_ttl_seconds)
+
+def get_weather_history_cache():
+    return get_cache("weather_history", astro_cache_ttl_seconds)
+
+def get_cache_stats():
+    with caches_lock:
+        named_caches = list(caches.items())
+    return {name: cache.stats() for name, cache in named_caches}
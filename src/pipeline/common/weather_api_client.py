@@ -0,0 +1,174 @@
+import asyncio
+import atexit
+import httpx
+import importlib.util
+import os
+import random
+import threading
+
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from instrumentation import increment, observe, timer
+from pipeline_config import load_environment
+from rate_limiter import get_rate_limiter
+from urllib.parse import parse_qs, urlsplit
+
+load_environment()
+
+max_connections = int(os.getenv("WEATHER_API_MAX_CONNECTIONS", "50"))
+max_keepalive_connections = int(os.getenv("WEATHER_API_MAX_KEEPALIVE_CONNECTIONS", "20"))
+max_in_flight_per_host = int(os.getenv("WEATHER_API_MAX_IN_FLIGHT_PER_HOST", "10"))
+keepalive_expiry_seconds = float(os.getenv("WEATHER_API_KEEPALIVE_EXPIRY_SECONDS", "30"))
+request_timeout_seconds = float(os.getenv("WEATHER_API_TIMEOUT_SECONDS", "15"))
+max_retries = int(os.getenv("WEATHER_API_MAX_RETRIES", "4"))
+backoff_base_seconds = float(os.getenv("WEATHER_API_BACKOFF_BASE_SECONDS", "1"))
+backoff_max_seconds = float(os.getenv("WEATHER_API_BACKOFF_MAX_SECONDS", "60"))
+max_retry_after_seconds = float(os.getenv("WEATHER_API_MAX_RETRY_AFTER_SECONDS", "3600"))
+
+retriable_status_codes = {429, 500, 502, 503, 504}
+
+http2_available = importlib.util.find_spec("h2") is not None
+
+
+def get_coalescing_key(url: str):
+    split_url = urlsplit(url)
+    query = {key: values[0] for key, values in parse_qs(split_url.query).items()}
+    return split_url.path, query.get("q", "").strip().lower(), query.get("dt")
+
+def parse_retry_after(value: str):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def get_backoff_seconds(attempt: int):
+    return random.uniform(0, min(backoff_max_seconds, backoff_base_seconds * 2 ** attempt))
+
+
+class WeatherApiClient:
+    def __init__(self, max_in_flight: int = max_in_flight_per_host):
+        self.max_in_flight = max_in_flight
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="weather-api-client", daemon=True)
+        self._thread.start()
+        self._client = None
+        self._host_semaphores = {}
+        self._in_flight = {}
+
+    def _get_client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=http2_available,
+                timeout=request_timeout_seconds,
+                limits=httpx.Limits(max_connections=max_connections,
+                                    max_keepalive_connections=max_keepalive_connections,
+                                    keepalive_expiry=keepalive_expiry_seconds))
+        return self._client
+
+    def _get_host_semaphore(self, url: str):
+        host = urlsplit(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.max_in_flight)
+        return self._host_semaphores[host]
+
+    async def fetch_json_once(self, url: str, endpoint: str, json_body: dict = None):
+        async with self._get_host_semaphore(url):
+            try:
+                with timer("weather_api_request_seconds", endpoint=endpoint):
+                    if json_body is None:
+                        response = await self._get_client().get(url)
+                    else:
+                        response = await self._get_client().post(url, json=json_body)
+            except httpx.HTTPError:
+                increment("weather_api_requests_total", endpoint=endpoint, status="error")
+                raise
+        increment("weather_api_requests_total", endpoint=endpoint, status=response.status_code)
+        increment("weather_api_response_bytes_total", len(response.content), endpoint=endpoint)
+        response.raise_for_status()
+        return response.json()
+
+    async def fetch_json_with_retries(self, url: str, json_body: dict = None):
+        endpoint = urlsplit(url).path
+        rate_limiter = get_rate_limiter()
+        loop = asyncio.get_running_loop()
+        for attempt in range(max_retries + 1):
+            wait_seconds = await loop.run_in_executor(None, rate_limiter.reserve)
+            if wait_seconds > 0:
+                observe("weather_api_rate_limit_wait_seconds", wait_seconds, endpoint=endpoint)
+                await asyncio.sleep(wait_seconds)
+            try:
+                return await self.fetch_json_once(url, endpoint, json_body)
+            except (httpx.HTTPStatusError, httpx.TransportError) as e:
+                status_code = e.response.status_code if isinstance(e, httpx.HTTPStatusError) else None
+                if attempt == max_retries or (status_code is not None and status_code not in retriable_status_codes):
+                    raise
+                retry_after = parse_retry_after(e.response.headers.get("Retry-After")) if status_code else None
+                if retry_after is not None and retry_after > max_retry_after_seconds:
+                    raise
+                increment("weather_api_retries_total", endpoint=endpoint, reason=status_code or type(e).__name__)
+                if status_code == 429:
+                    await loop.run_in_executor(None, rate_limiter.pause,
+                                               retry_after if retry_after is not None
+                                               else min(backoff_max_seconds, backoff_base_seconds * 2 ** attempt))
+                    await asyncio.sleep(random.uniform(0, backoff_base_seconds))
+                else:
+                    await asyncio.sleep(retry_after if retry_after is not None else get_backoff_seconds(attempt))
+
+    async def fetch_json(self, url: str):
+        key = get_coalescing_key(url)
+        in_flight = self._in_flight.get(key)
+        if in_flight is None:
+            in_flight = self._in_flight[key] = asyncio.ensure_future(self.fetch_json_with_retries(url))
+            in_flight.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            increment("weather_api_requests_coalesced_total", endpoint=key[0])
+        # Shielded, so a cancelled caller does not cancel the request for the others waiting on it.
+        return await asyncio.shield(in_flight)
+
+    async def fetch_all_json(self, urls: list):
+        return await asyncio.gather(*(self.fetch_json(url) for url in urls), return_exceptions=True)
+
+    async def fetch_all_posted_json(self, url: str, json_bodies: list):
+        return await asyncio.gather(*(self.fetch_json_with_retries(url, json_body) for json_body in json_bodies),
+                                    return_exceptions=True)
+
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def get_json(self, url: str):
+        return self.run(self.fetch_json(url))
+
+    def get_all_json(self, urls: list):
+        return self.run(self.fetch_all_json(urls))
+
+    def post_all_json(self, url: str, json_bodies: list):
+        return self.run(self.fetch_all_posted_json(url, json_bodies))
+
+    def close(self):
+        if self._loop.is_closed():
+            return
+        if self._client is not None:
+            self.run(self._client.aclose())
+            self._client = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+weather_api_client = None
+weather_api_client_lock = threading.Lock()
+
+
+def get_weather_api_client():
+    global weather_api_client
+    with weather_api_client_lock:
+        if weather_api_client is None:
+            weather_api_client = WeatherApiClient()
+            atexit.register(weather_api_client.close)
+        return weather_api_client
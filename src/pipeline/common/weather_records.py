@@ -0,0 +1,143 @@
+from dataclasses import dataclass
+from datetime import date, datetime, time
+
+city_columns = ['name', 'region', 'country', 'time_zone', 'latitude', 'longitude']
+
+current_weather_columns = ['city_id', 'date', 'time', 'temp_c', 'feels_like_c', 'weather_condition_code',
+                           'weather_condition_text', 'weather_condition_icon', 'wind_speed_kph', 'wind_speed_mps',
+                           'wind_dir', 'pressure_mb', 'precip_mm', 'humidity_perc', 'cloud_perc', 'uv_index']
+
+daily_weather_analysis_columns = ['city_id', 'date', 'max_temp_c', 'min_temp_c', 'avg_temp_c', 'max_wind_speed_kph',
+                                  'max_wind_speed_mps', 'avg_wind_speed_kph', 'avg_wind_speed_mps', 'total_precip_mm',
+                                  'avg_humidity_perc', 'sunrise', 'sunset', 'moonrise', 'moonset', 'moon_phase']
+
+
+@dataclass(slots=True, frozen=True)
+class City:
+    name: str
+    region: str
+    country: str
+    time_zone: str
+    latitude: float
+    longitude: float
+
+    @classmethod
+    def from_api_location(cls, location: dict):
+        return cls(location['name'], location['region'], location['country'], location['tz_id'],
+                   float(location['lat']), float(location['lon']))
+
+    @classmethod
+    def from_db_row(cls, row: tuple):
+        return cls(*row[1:])
+
+    @property
+    def natural_key(self):
+        return self.name, self.region, self.country, self.time_zone, self.latitude, self.longitude
+
+    def to_db_params(self):
+        return {column: getattr(self, column) for column in city_columns}
+
+
+@dataclass(slots=True, kw_only=True)
+class CurrentWeather:
+    id: int | None = None
+    city_id: int | None = None
+    date: date
+    time: time
+    temp_c: float
+    feels_like_c: float
+    weather_condition_code: int
+    weather_condition_text: str
+    weather_condition_icon: str
+    wind_speed_kph: float
+    wind_speed_mps: float
+    wind_dir: str
+    pressure_mb: float
+    precip_mm: float
+    humidity_perc: int
+    cloud_perc: int
+    uv_index: float
+
+    @classmethod
+    def from_api_current(cls, current: dict, wind_speed_mps: float = None, wind_dir: str = None):
+        last_updated = datetime.strptime(current['last_updated'], "%Y-%m-%d %H:%M")
+        if wind_speed_mps is None:
+            wind_speed_mps = current['wind_kph'] / 3.6
+        if wind_dir is None:
+            from compass import degree_to_compass_dir
+
+            wind_dir = degree_to_compass_dir(current['wind_degree'])
+        return cls(date=last_updated.date(), time=last_updated.time(), temp_c=float(current['temp_c']),
+                   feels_like_c=float(current['feelslike_c']),
+                   weather_condition_code=int(current['condition']['code']),
+                   weather_condition_text=current['condition']['text'],
+                   weather_condition_icon=current['condition']['icon'], wind_speed_kph=float(current['wind_kph']),
+                   wind_speed_mps=float(wind_speed_mps), wind_dir=wind_dir,
+                   pressure_mb=float(current['pressure_mb']), precip_mm=float(current['precip_mm']),
+                   humidity_perc=int(current['humidity']), cloud_perc=int(current['cloud']),
+                   uv_index=float(current['uv']))
+
+    @classmethod
+    def from_db_row(cls, row: tuple):
+        return cls(**dict(zip(['id'] + current_weather_columns, row)))
+
+    def to_db_row(self):
+        return tuple(getattr(self, column) for column in current_weather_columns)
+
+    def to_db_params(self):
+        return {column: getattr(self, column) for column in current_weather_columns}
+
+
+@dataclass(slots=True, kw_only=True)
+class DailyWeatherAnalysis:
+    id: int | None = None
+    city_id: int
+    date: date
+    max_temp_c: float
+    min_temp_c: float
+    avg_temp_c: float
+    max_wind_speed_kph: float
+    max_wind_speed_mps: float
+    avg_wind_speed_kph: float
+    avg_wind_speed_mps: float
+    total_precip_mm: float
+    avg_humidity_perc: int
+    sunrise: time
+    sunset: time
+    moonrise: time
+    moonset: time
+    moon_phase: str
+
+    @classmethod
+    def from_dict(cls, daily_weather_analysis: dict):
+        return cls(
+            city_id=int(daily_weather_analysis['city_id']), date=daily_weather_analysis['date'],
+            max_temp_c=float(daily_weather_analysis['max_temp_c']),
+            min_temp_c=float(daily_weather_analysis['min_temp_c']),
+            avg_temp_c=float(daily_weather_analysis['avg_temp_c']),
+            max_wind_speed_kph=float(daily_weather_analysis['max_wind_speed_kph']),
+            max_wind_speed_mps=float(daily_weather_analysis['max_wind_speed_mps']),
+            avg_wind_speed_kph=float(daily_weather_analysis['avg_wind_speed_kph']),
+            avg_wind_speed_mps=float(daily_weather_analysis['avg_wind_speed_mps']),
+            total_precip_mm=float(daily_weather_analysis['total_precip_mm']),
+            avg_humidity_perc=int(daily_weather_analysis['avg_humidity_perc']),
+            sunrise=parse_time(daily_weather_analysis['sunrise']), sunset=parse_time(daily_weather_analysis['sunset']),
+            moonrise=parse_time(daily_weather_analysis['moonrise']),
+            moonset=parse_time(daily_weather_analysis['moonset']),
+            moon_phase=daily_weather_analysis['moon_phase'])
+
+    @classmethod
+    def from_db_row(cls, row: tuple):
+        return cls(**dict(zip(['id'] + daily_weather_analysis_columns, row)))
+
+    def to_db_row(self):
+        return tuple(getattr(self, column) for column in daily_weather_analysis_columns)
+
+    def to_db_params(self):
+        return {column: getattr(self, column) for column in daily_weather_analysis_columns}
+
+
+def parse_time(value):
+    if isinstance(value, time):
+        return value
+    return time.fromisoformat(value)
@@ -0,0 +1,69 @@
+import argparse
+import datetime
+import os
+import sys
+
+from prefect import flow, serve
+from prefect.runtime import flow_run
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+
+from deployment_registry import (add_registry_arguments, get_registered_cities, plan_hourly_deployments,
+                                 select_worker_deployments, validate_registry_arguments)
+from extract_weather_data import (bulk_request_size, task_extract_tracked_cities, task_generate_urls,
+                                  task_extract_current_weather_data_batch, task_extract_current_weather_data_bulk)
+from transform_weather_data import task_transform_weather_data_batch
+from load_weather_data import task_load_weather_data_batch, task_export_current_weather_to_parquet
+from instrumentation import instrument_flow_run
+
+
+def generate_current_weather_batch_flow_run_name():
+    flow_name = flow_run.flow_name
+    cities = flow_run.parameters.get('cities')
+    current_datetime = datetime.datetime.now()
+    formatted_date = current_datetime.strftime("%Y-%m-%d-in-%H:%M:%S")
+    cities_label = f"{len(cities)}-cities" if cities else "tracked-cities"
+    return f"{flow_name}-for-{cities_label}-on-{formatted_date}"
+
+@flow(flow_run_name=generate_current_weather_batch_flow_run_name, log_prints=True)
+@instrument_flow_run
+def current_weather_data_batch_pipeline(cities: list | None = None, bulk_request_size: int = bulk_request_size):
+    if not cities:
+        cities = task_extract_tracked_cities()
+    if not cities:
+        print("There are no cities to extract current weather data for")
+        return []
+
+    if bulk_request_size > 0:
+        weather_data_list = task_extract_current_weather_data_bulk(cities, bulk_request_size)
+    else:
+        urls = task_generate_urls(cities)
+        weather_data_list = task_extract_current_weather_data_batch(urls)
+    city_data_list, weather_data_to_insert_list = task_transform_weather_data_batch(weather_data_list)
+    weather_data_ids = task_load_weather_data_batch(city_data_list, weather_data_to_insert_list)
+    task_export_current_weather_to_parquet(weather_data_ids)
+    return weather_data_ids
+
+def serve_hourly_deployments(args: argparse.Namespace):
+    cities = get_registered_cities(args.city_registry_source, args.city_registry_path)
+    deployments = select_worker_deployments(plan_hourly_deployments(cities, args.max_cities_per_deployment),
+                                            args.worker_index, args.worker_count)
+    served_cities = sum(len(deployment["parameters"]["cities"]) for deployment in deployments)
+    print(f"Serving {len(deployments)} hourly deployments for {served_cities} of the {len(cities)} registered cities")
+    serve(*(current_weather_data_batch_pipeline.to_deployment(**deployment) for deployment in deployments))
+
+def parse_hourly_arguments():
+    parser = argparse.ArgumentParser(description="Serve the hourly current weather deployments of the registered "
+                                                 "cities. Run several processes with --worker-index and "
+                                                 "--worker-count to share the deployments between them.")
+    add_registry_arguments(parser)
+    args = parser.parse_args()
+    validate_registry_arguments(parser, args)
+    return args
+
+def main():
+    serve_hourly_deployments(parse_hourly_arguments())
+
+
+if __name__ == "__main__":
+    main()
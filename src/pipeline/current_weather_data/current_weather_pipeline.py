@@ -1,14 +1,20 @@
 import datetime
-import pytz
+import os
+import sys
 
-from prefect import flow, serve
+from prefect import flow
 from prefect.runtime import flow_run
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+
+from current_weather_batch_pipeline import parse_hourly_arguments, serve_hourly_deployments
 from extract_weather_data import task_generate_url, task_extract_current_weather_data
-from transform_weather_data import (task_fill_direct_city_fields, task_fill_direct_weather_fields,
-                                    task_transform_date_time_fields, task_transform_wind_speed_mps,
-                                    task_transform_wind_dir)
-from load_weather_data import task_load_city_data_if_necessary, task_load_weather_data_if_necessary
+from transform_weather_data import task_transform_weather_data_batch
+from load_weather_data import (task_load_city_data_if_necessary, task_load_weather_data_if_necessary,
+                               task_export_current_weather_to_parquet)
+from instrumentation import instrument_flow_run
+from time_utils import format_run_name_datetime
+from weather_records import City, CurrentWeather
 
 
 def generate_current_weather_flow_run_name():
@@ -30,31 +36,17 @@ def generate_transform_weather_data_flow_run_name():
     last_updated_time = weather_data['current']['last_updated']
     input_timezone = weather_data['location']['tz_id']
 
-    naive_datetime = datetime.datetime.strptime(last_updated_time, "%Y-%m-%d %H:%M")
-    input_tz = pytz.timezone(input_timezone)
-    localized_datetime = input_tz.localize(naive_datetime)
-
-    output_tz = pytz.timezone('Europe/Sofia')
-    converted_datetime = localized_datetime.astimezone(output_tz)
-    return (f"{flow_name}-for-{weather_data['location']['name'].replace(' ', '-')}"
-            f"-last-updated-{str(converted_datetime.strftime('%Y-%m-%d-in-%H:%M:%S')).replace(' ', '-')}")
+    last_updated = format_run_name_datetime(datetime.datetime.fromisoformat(last_updated_time), input_timezone)
+    return f"{flow_name}-for-{weather_data['location']['name'].replace(' ', '-')}-last-updated-{last_updated}"
 
 def generate_load_weather_data_flow_run_name():
     flow_name = flow_run.flow_name
     city_data_to_insert = flow_run.parameters['city_data_to_insert']
     weather_data_to_insert = flow_run.parameters['weather_data_to_insert']
 
-    last_updated_time = f"{weather_data_to_insert['date']} {weather_data_to_insert['time']}"
-    input_timezone = city_data_to_insert['time_zone']
-
-    naive_datetime = datetime.datetime.strptime(last_updated_time, "%Y-%m-%d %H:%M")
-    input_tz = pytz.timezone(input_timezone)
-    localized_datetime = input_tz.localize(naive_datetime)
-
-    output_tz = pytz.timezone('Europe/Sofia')
-    converted_datetime = localized_datetime.astimezone(output_tz)
-    return (f"{flow_name}-for-{city_data_to_insert['name'].replace(' ', '-')}"
-            f"-last-updated-{str(converted_datetime.strftime('%Y-%m-%d-in-%H:%M:%S')).replace(' ', '-')}")
+    naive_datetime = datetime.datetime.combine(weather_data_to_insert.date, weather_data_to_insert.time)
+    last_updated = format_run_name_datetime(naive_datetime, city_data_to_insert.time_zone)
+    return f"{flow_name}-for-{city_data_to_insert.name.replace(' ', '-')}-last-updated-{last_updated}"
 
 @flow(flow_run_name=generate_extract_weather_flow_run_name, log_prints=True)
 def flow_extract_weather_data(city: str):
@@ -63,55 +55,25 @@ def flow_extract_weather_data(city: str):
 
 @flow(flow_run_name=generate_transform_weather_data_flow_run_name, log_prints=True)
 def flow_transform_weather_data(weather_data: dict):
-    city_data_to_insert = {}
-    task_fill_direct_city_fields(weather_data, city_data_to_insert)
-
-    weather_data_to_insert = {}
-    task_fill_direct_weather_fields(weather_data, weather_data_to_insert)
-    task_transform_date_time_fields(weather_data, weather_data_to_insert)
-    task_transform_wind_speed_mps(weather_data, weather_data_to_insert)
-    task_transform_wind_dir(weather_data, weather_data_to_insert)
-
-    return city_data_to_insert, weather_data_to_insert
+    city_data_list, weather_data_to_insert_list = task_transform_weather_data_batch([weather_data])
+    return city_data_list[0], weather_data_to_insert_list[0]
 
 @flow(flow_run_name=generate_load_weather_data_flow_run_name, log_prints=True)
-def flow_load_weather_data(city_data_to_insert: dict, weather_data_to_insert: dict):
+def flow_load_weather_data(city_data_to_insert: City, weather_data_to_insert: CurrentWeather):
     city_id = task_load_city_data_if_necessary(city_data_to_insert)
-    task_load_weather_data_if_necessary(weather_data_to_insert, city_id)
+    weather_data_id = task_load_weather_data_if_necessary(weather_data_to_insert, city_id)
+    task_export_current_weather_to_parquet([weather_data_id])
 
 @flow(flow_run_name=generate_current_weather_flow_run_name, log_prints=True)
+@instrument_flow_run
 def current_weather_data_pipeline(city: str = "Sofia"):
     weather_data = flow_extract_weather_data(city)
     city_data_to_insert, weather_data_to_insert = flow_transform_weather_data(weather_data)
     flow_load_weather_data(city_data_to_insert, weather_data_to_insert)
 
 def main():
-    weather_data_sofia_deploy = current_weather_data_pipeline.to_deployment(
-        name="weather-data-sofia-hourly-flow-deployment",
-        cron="9 * * * *",
-        parameters={"city": "Sofia"},
-    )
-
-    weather_data_rome_deploy = current_weather_data_pipeline.to_deployment(
-        name="weather-data-rome-hourly-flow-deployment",
-        cron="10 * * * *",
-        parameters={"city": "Rome"},
-    )
-
-    weather_data_london_deploy = current_weather_data_pipeline.to_deployment(
-        name="weather-data-london-hourly-flow-deployment",
-        cron="11 * * * *",
-        parameters={"city": "London"},
-    )
-
-    weather_data_new_york_deploy = current_weather_data_pipeline.to_deployment(
-        name="weather-data-new-york-hourly-flow-deployment",
-        cron="12 * * * *",
-        parameters={"city": "New York"},
-    )
-
-    serve(weather_data_sofia_deploy, weather_data_rome_deploy,
-          weather_data_london_deploy, weather_data_new_york_deploy)
+    # A deployment per city does not scale, so the registered cities are served as sharded batch deployments.
+    serve_hourly_deployments(parse_hourly_arguments())
 
 
 if __name__ == "__main__":
@@ -1,31 +1,103 @@
-import httpx
 import os
 
-from dotenv import load_dotenv
+from db_connection_pool import get_db_connection
+from instrumentation import increment
+from pipeline_config import load_environment
 from prefect import get_run_logger
 from prefect import task
+from weather_api_client import get_weather_api_client
 
-load_dotenv()
+load_environment()
 
 api_key = os.getenv("WEATHER_API_KEY")
 
-base_url = "https://api.weatherapi.com"
+base_url = os.getenv("WEATHER_API_BASE_URL", "https://api.weatherapi.com")
 path_url_realtime_api = "/v1/current.json"
 path_url_history_api = "/v1/history.json"
+bulk_request_size = int(os.getenv("WEATHER_API_BULK_REQUEST_SIZE", "0"))
 
 
 @task(retries=2, retry_delay_seconds=3, timeout_seconds=10, log_prints=True)
 def task_generate_url(city: str):
     return f"{base_url}{path_url_realtime_api}?key={api_key}&q={city}"
 
-@task(retries=2, retry_delay_seconds=10, timeout_seconds=20, log_prints=True)
+@task(timeout_seconds=120, log_prints=True)
 def task_extract_current_weather_data(url: str):
     logger = get_run_logger()
-    response = httpx.get(url)
     try:
-        response.raise_for_status()
+        return get_weather_api_client().get_json(url)
     except Exception as e:
         logger.exception(f"Could not retrieve current weather data with url: {url}")
         raise e
 
-    return response.json()
\ No newline at end of file
+@task(retries=2, retry_delay_seconds=10, timeout_seconds=60)
+def task_extract_tracked_cities():
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            # Queried by coordinates, so that cities of the same name in different regions or countries stay apart.
+            cursor.execute("SELECT latitude, longitude FROM city ORDER BY name, region, country, id")
+            return [f"{latitude},{longitude}" for latitude, longitude in cursor.fetchall()]
+
+@task(retries=2, retry_delay_seconds=3, timeout_seconds=10, log_prints=True)
+def task_generate_urls(cities: list):
+    return [f"{base_url}{path_url_realtime_api}?key={api_key}&q={city}" for city in cities]
+
+@task(timeout_seconds=300, log_prints=True)
+def task_extract_current_weather_data_batch(urls: list):
+    logger = get_run_logger()
+    weather_data_list = []
+    for url, weather_data in zip(urls, get_weather_api_client().get_all_json(urls)):
+        if isinstance(weather_data, Exception):
+            logger.error(f"Could not retrieve current weather data with url: {url}: {weather_data!r}")
+        else:
+            weather_data_list.append(weather_data)
+
+    if urls and not weather_data_list:
+        raise RuntimeError(f"Could not retrieve current weather data for any of the {len(urls)} cities")
+
+    return weather_data_list
+
+def generate_bulk_request_bodies(cities: list, request_size: int):
+    # The custom_id of a location is the index of its city, so the responses can be matched back to the cities.
+    return [{"locations": [{"q": city, "custom_id": str(index)}
+                           for index, city in enumerate(cities[start:start + request_size], start)]}
+            for start in range(0, len(cities), request_size)]
+
+def split_bulk_response(bulk_response: dict):
+    weather_data_by_index = {}
+    for bulk_item in bulk_response.get("bulk", []):
+        query = bulk_item.get("query", {})
+        if "error" in query or "location" not in query or "current" not in query:
+            continue
+        weather_data_by_index[int(query["custom_id"])] = {"location": query["location"], "current": query["current"]}
+    return weather_data_by_index
+
+@task(timeout_seconds=300, log_prints=True)
+def task_extract_current_weather_data_bulk(cities: list, request_size: int = bulk_request_size):
+    logger = get_run_logger()
+    client = get_weather_api_client()
+    bulk_url = f"{base_url}{path_url_realtime_api}?key={api_key}&q=bulk"
+    weather_data_by_index = {}
+    bulk_request_bodies = generate_bulk_request_bodies(cities, request_size)
+    for request_body, bulk_response in zip(bulk_request_bodies, client.post_all_json(bulk_url, bulk_request_bodies)):
+        if isinstance(bulk_response, Exception):
+            logger.warning(f"Bulk request for {len(request_body['locations'])} cities failed: {bulk_response!r}")
+            continue
+        weather_data_by_index.update(split_bulk_response(bulk_response))
+
+    missing_indexes = [index for index in range(len(cities)) if index not in weather_data_by_index]
+    if missing_indexes:
+        increment("weather_api_bulk_fallbacks_total", len(missing_indexes))
+        urls = task_generate_urls.fn([cities[index] for index in missing_indexes])
+        for index, url, weather_data in zip(missing_indexes, urls, client.get_all_json(urls)):
+            if isinstance(weather_data, Exception):
+                logger.error(f"Could not retrieve current weather data with url: {url}: {weather_data!r}")
+            else:
+                weather_data_by_index[index] = weather_data
+
+    if cities and not weather_data_by_index:
+        raise RuntimeError(f"Could not retrieve current weather data for any of the {len(cities)} cities")
+
+    print(f"Extracted the current weather of {len(weather_data_by_index)} of {len(cities)} cities with "
+          f"{len(bulk_request_bodies)} bulk requests and {len(missing_indexes)} single requests")
+    return [weather_data_by_index[index] for index in sorted(weather_data_by_index)]
@@ -1,28 +1,57 @@
-import psycopg2
-import os
+import csv
+import io
 
-from dotenv import load_dotenv
+from db_connection_pool import get_db_connection
+from instrumentation import increment
 from prefect import task
+from psycopg2.extras import execute_values
 from prefect.runtime import task_run
+from ttl_cache import get_city_id_cache
+from weather_records import City, CurrentWeather, current_weather_columns
 
-load_dotenv()
-
-db_user = os.getenv("DB_USER")
-db_password = os.getenv("DB_PASSWORD")
-db_name = os.getenv("DB_NAME")
-db_host = os.getenv("DB_HOST")
+running_aggregates_upsert = """
+    INSERT INTO daily_weather_running_aggregates AS running (
+        city_id,
+        date,
+        readings_count,
+        max_temp_c,
+        min_temp_c,
+        sum_temp_c,
+        max_wind_speed_kph,
+        sum_wind_speed_kph,
+        total_precip_mm,
+        sum_humidity_perc
+    )
+    SELECT city_id, date, COUNT(*), MAX(temp_c), MIN(temp_c), SUM(temp_c), MAX(wind_speed_kph), SUM(wind_speed_kph),
+    SUM(precip_mm), SUM(humidity_perc)
+    FROM inserted
+    GROUP BY city_id, date
+    ON CONFLICT (city_id, date)
+    DO UPDATE SET readings_count=running.readings_count + EXCLUDED.readings_count,
+    max_temp_c=GREATEST(running.max_temp_c, EXCLUDED.max_temp_c),
+    min_temp_c=LEAST(running.min_temp_c, EXCLUDED.min_temp_c),
+    sum_temp_c=running.sum_temp_c + EXCLUDED.sum_temp_c,
+    max_wind_speed_kph=GREATEST(running.max_wind_speed_kph, EXCLUDED.max_wind_speed_kph),
+    sum_wind_speed_kph=running.sum_wind_speed_kph + EXCLUDED.sum_wind_speed_kph,
+    total_precip_mm=running.total_precip_mm + EXCLUDED.total_precip_mm,
+    sum_humidity_perc=running.sum_humidity_perc + EXCLUDED.sum_humidity_perc
+"""
 
 
 def generate_city_task_run_name():
     flow_name = task_run.task_name
     city_data_to_insert = task_run.parameters['city_data_to_insert']
-    return (f"{flow_name}-for-{city_data_to_insert['name'].replace(' ', '-')}-"
-            f"{city_data_to_insert['country'].replace(' ', '-')}")
+    return (f"{flow_name}-for-{city_data_to_insert.name.replace(' ', '-')}-"
+            f"{city_data_to_insert.country.replace(' ', '-')}")
 
 @task(task_run_name=generate_city_task_run_name, retries=2, retry_delay_seconds=10, timeout_seconds=60, log_prints=True)
-def task_load_city_data_if_necessary(city_data_to_insert: dict):
-    with psycopg2.connect(user=db_user, password=db_password,
-                          host=db_host, dbname=db_name) as conn:
+def task_load_city_data_if_necessary(city_data_to_insert: City):
+    city_id_cache = get_city_id_cache()
+    city_id = city_id_cache.get(city_data_to_insert.natural_key)
+    if city_id is not None:
+        return city_id
+
+    with get_db_connection() as conn:
         with conn.cursor() as cursor:
             cursor.execute(
                 """
@@ -34,53 +63,184 @@ def task_load_city_data_if_necessary(city_data_to_insert: dict):
                     latitude,
                     longitude
                 )
-                VALUES(%(name)s, %(region)s, %(country)s, %(time_zone)s, 
-                CAST(%(latitude)s AS FLOAT), CAST(%(longitude)s AS FLOAT))
+                VALUES(%(name)s, %(region)s, %(country)s, %(time_zone)s, %(latitude)s, %(longitude)s)
                 ON CONFLICT ON CONSTRAINT city_unique_constraint
                 DO UPDATE SET name=EXCLUDED.name
                 RETURNING id
-                """, city_data_to_insert
+                """, city_data_to_insert.to_db_params()
             )
-            result_index = cursor.fetchone()[0]
-            cursor.execute("SELECT setval('city_id_seq', (SELECT MAX(id) FROM city))")
-            return result_index
+            city_id = cursor.fetchone()[0]
+
+    increment("db_rows_upserted_total", table="city")
+    # Only cached once the transaction is committed, so a rolled back insert never leaves an unknown id behind.
+    city_id_cache.set(city_data_to_insert.natural_key, city_id)
+    return city_id
 
 @task(retries=2, retry_delay_seconds=10, timeout_seconds=60, log_prints=True)
-def task_load_weather_data_if_necessary(weather_data_to_insert: dict, city_id: str):
-    weather_data_to_insert['city_id'] = city_id
-    with psycopg2.connect(user=db_user, password=db_password,
-                          host=db_host, dbname=db_name) as conn:
+def task_load_weather_data_if_necessary(weather_data_to_insert: CurrentWeather, city_id: int):
+    weather_data_to_insert.city_id = city_id
+    with get_db_connection() as conn:
         with conn.cursor() as cursor:
+            cursor.execute(
+                f"""
+                WITH inserted AS (
+                    INSERT INTO current_weather (
+                        city_id,
+                        date,
+                        time,
+                        temp_c,
+                        feels_like_c,
+                        weather_condition_code,
+                        weather_condition_text,
+                        weather_condition_icon,
+                        wind_speed_kph,
+                        wind_speed_mps,
+                        wind_dir,
+                        pressure_mb,
+                        precip_mm,
+                        humidity_perc,
+                        cloud_perc,
+                        uv_index
+                    )
+                    VALUES(%(city_id)s, %(date)s, %(time)s, %(temp_c)s, %(feels_like_c)s, %(weather_condition_code)s,
+                    %(weather_condition_text)s, %(weather_condition_icon)s, %(wind_speed_kph)s, %(wind_speed_mps)s,
+                    %(wind_dir)s, %(pressure_mb)s, %(precip_mm)s, %(humidity_perc)s, %(cloud_perc)s, %(uv_index)s)
+                    ON CONFLICT ON CONSTRAINT weather_unique_constraint
+                    DO NOTHING
+                    RETURNING id, city_id, date, temp_c, wind_speed_kph, precip_mm, humidity_perc
+                ), running_aggregates AS ({running_aggregates_upsert})
+                SELECT id FROM inserted
+                """, weather_data_to_insert.to_db_params()
+            )
+            result_index = cursor.fetchone()
+            if result_index is not None:
+                increment("db_rows_upserted_total", table="current_weather", result="inserted")
+                return result_index[0]
+
+            increment("db_rows_upserted_total", table="current_weather", result="already_present")
             cursor.execute(
                 """
-                INSERT INTO current_weather (
-                    city_id,
-                    date,
-                    time,
-                    temp_c,
-                    feels_like_c,
-                    weather_condition_code,
-                    weather_condition_text,
-                    weather_condition_icon,
-                    wind_speed_kph,
-                    wind_speed_mps,
-                    wind_dir,
-                    pressure_mb,
-                    precip_mm,
-                    humidity_perc,
-                    cloud_perc,
-                    uv_index
-                )
-                VALUES(CAST(%(city_id)s AS INT), CAST(%(date)s AS DATE), CAST(%(time)s AS TIME), CAST(%(temp_c)s AS FLOAT), 
-                CAST(%(feels_like_c)s AS FLOAT), CAST(%(weather_condition_code)s AS INT), %(weather_condition_text)s,
-                %(weather_condition_icon)s, CAST(%(wind_speed_kph)s AS FLOAT), CAST(%(wind_speed_mps)s AS FLOAT),
-                %(wind_dir)s, CAST(%(pressure_mb)s AS FLOAT), CAST(%(precip_mm)s AS FLOAT),
-                CAST(%(humidity_perc)s AS INT), CAST(%(cloud_perc)s AS INT), CAST(%(uv_index)s AS FLOAT))
-                ON CONFLICT ON CONSTRAINT weather_unique_constraint
-                DO UPDATE SET date=EXCLUDED.date
-                RETURNING id
-                """, weather_data_to_insert
+                SELECT id
+                FROM current_weather
+                WHERE city_id=%(city_id)s AND date=%(date)s AND time=%(time)s
+                """, weather_data_to_insert.to_db_params()
             )
-            result_index = cursor.fetchone()[0]
-            cursor.execute("SELECT setval('current_weather_id_seq', (SELECT MAX(id) FROM current_weather))")
-            return result_index
\ No newline at end of file
+            return cursor.fetchone()[0]
+
+def bulk_upsert_current_weather(cursor, weather_rows: list):
+    columns = ", ".join(current_weather_columns)
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(weather_rows)
+    buffer.seek(0)
+
+    cursor.execute(
+        f"""
+        CREATE TEMP TABLE IF NOT EXISTS current_weather_staging ON COMMIT DROP AS
+        SELECT {columns} FROM current_weather WITH NO DATA
+        """
+    )
+    cursor.execute("TRUNCATE current_weather_staging")
+    cursor.copy_expert(f"COPY current_weather_staging ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+    cursor.execute(
+        f"""
+        WITH inserted AS (
+            INSERT INTO current_weather ({columns})
+            SELECT DISTINCT ON (city_id, date, time) {columns}
+            FROM current_weather_staging
+            ORDER BY city_id, date, time, ctid DESC
+            ON CONFLICT ON CONSTRAINT weather_unique_constraint
+            DO NOTHING
+            RETURNING id, city_id, date, temp_c, wind_speed_kph, precip_mm, humidity_perc
+        ), running_aggregates AS ({running_aggregates_upsert})
+        SELECT COUNT(*) FROM inserted
+        """
+    )
+    inserted = cursor.fetchone()[0]
+    cursor.execute(
+        """
+        SELECT cw.id
+        FROM current_weather cw
+        JOIN (SELECT DISTINCT city_id, date, time FROM current_weather_staging) staging
+        ON staging.city_id=cw.city_id AND staging.date=cw.date AND staging.time=cw.time
+        ORDER BY cw.city_id, cw.date, cw.time
+        """
+    )
+    result_indexes = [result_index[0] for result_index in cursor.fetchall()]
+    increment("db_rows_upserted_total", inserted, table="current_weather", result="inserted")
+    increment("db_rows_upserted_total", len(result_indexes) - inserted, table="current_weather",
+              result="already_present")
+    return {'ids': result_indexes, 'inserted': inserted, 'already_present': len(result_indexes) - inserted}
+
+def generate_batch_task_run_name():
+    task_name = task_run.task_name
+    city_data_list = task_run.parameters['city_data_list']
+    return f"{task_name}-for-{len(city_data_list)}-cities"
+
+@task(task_run_name=generate_batch_task_run_name, retries=2, retry_delay_seconds=10, timeout_seconds=120,
+      log_prints=True)
+def task_load_weather_data_batch(city_data_list: list, weather_data_list: list):
+    city_keys = [city_data.natural_key for city_data in city_data_list]
+    city_id_cache = get_city_id_cache()
+    city_ids = {city_key: city_id_cache.get(city_key) for city_key in dict.fromkeys(city_keys)}
+    uncached_city_keys = [city_key for city_key, city_id in city_ids.items() if city_id is None]
+
+    city_rows = []
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            if uncached_city_keys:
+                city_rows = execute_values(
+                    cursor,
+                    """
+                    INSERT INTO city (
+                        name,
+                        region,
+                        country,
+                        time_zone,
+                        latitude,
+                        longitude
+                    )
+                    VALUES %s
+                    ON CONFLICT ON CONSTRAINT city_unique_constraint
+                    DO UPDATE SET name=EXCLUDED.name
+                    RETURNING id, name, region, country, time_zone, latitude, longitude
+                    """, uncached_city_keys, fetch=True
+                )
+                city_ids.update((tuple(city_row[1:]), city_row[0]) for city_row in city_rows)
+                increment("db_rows_upserted_total", len(city_rows), table="city")
+
+            for city_key, weather_data in zip(city_keys, weather_data_list):
+                weather_data.city_id = city_ids[city_key]
+            weather_rows = [weather_data.to_db_row() for weather_data in weather_data_list]
+            load_result = bulk_upsert_current_weather(cursor, weather_rows)
+
+    for city_row in city_rows:
+        city_id_cache.set(tuple(city_row[1:]), city_row[0])
+    print(f"Loaded {len(weather_rows)} current weather rows: {load_result['inserted']} inserted, "
+          f"{load_result['already_present']} already present. Resolved {len(city_ids) - len(uncached_city_keys)} of "
+          f"{len(city_ids)} city ids from the cache")
+    return load_result['ids']
+
+@task(retries=2, retry_delay_seconds=10, timeout_seconds=300, log_prints=True)
+def task_bulk_load_weather_data(weather_data_list: list):
+    weather_rows = [weather_data.to_db_row() for weather_data in weather_data_list]
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            load_result = bulk_upsert_current_weather(cursor, weather_rows)
+
+    print(f"Loaded {len(weather_rows)} current weather rows: {load_result['inserted']} inserted, "
+          f"{load_result['already_present']} already present")
+    return load_result
+
+@task(retries=2, retry_delay_seconds=10, timeout_seconds=120, log_prints=True)
+def task_export_current_weather_to_parquet(weather_data_ids: list):
+    if not weather_data_ids:
+        return []
+    # pyarrow is only imported by the export, so the extract, transform and load stages start without it.
+    from parquet_store import export_partitions
+
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            output_files = export_partitions(cursor, "current_weather", weather_data_ids)
+
+    print(f"Exported {len(output_files)} current weather partitions to Parquet")
+    return output_files
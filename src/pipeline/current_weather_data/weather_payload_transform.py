@@ -0,0 +1,25 @@
+from weather_records import City, CurrentWeather
+
+
+def kph_to_mps(wind_speeds_kph):
+    import numpy as np
+
+    return np.asarray(wind_speeds_kph, dtype=np.float64) / 3.6
+
+def transform_weather_payloads(weather_data_list: list):
+    import numpy as np
+    from compass import degrees_to_compass_dirs
+
+    locations = [weather_data['location'] for weather_data in weather_data_list]
+    currents = [weather_data['current'] for weather_data in weather_data_list]
+    wind_speeds_kph = np.fromiter((current['wind_kph'] for current in currents), dtype=np.float64,
+                                  count=len(currents))
+    wind_degrees = np.fromiter((current['wind_degree'] for current in currents), dtype=np.float64,
+                               count=len(currents))
+    wind_speeds_mps = kph_to_mps(wind_speeds_kph).tolist()
+    wind_dirs = degrees_to_compass_dirs(wind_degrees).tolist()
+
+    city_data_list = [City.from_api_location(location) for location in locations]
+    weather_data_to_insert_list = [CurrentWeather.from_api_current(current, wind_speed_mps, wind_dir)
+                                   for current, wind_speed_mps, wind_dir in zip(currents, wind_speeds_mps, wind_dirs)]
+    return city_data_list, weather_data_to_insert_list
@@ -1,41 +1,55 @@
-import httpx
-import psycopg2
 import os
+import uuid
 
-from datetime import datetime, timedelta
-from dotenv import load_dotenv
+from datetime import date
+from db_connection_pool import get_db_connection
+from instrumentation import increment
+from pipeline_config import load_environment
 from prefect import get_run_logger
 from prefect import task
-from zoneinfo import ZoneInfo
+from time_utils import get_local_date
+from ttl_cache import get_weather_history_cache
+from weather_api_client import get_weather_api_client
+from weather_records import CurrentWeather, current_weather_columns
 
-load_dotenv()
+load_environment()
 
-base_url = "https://api.weatherapi.com"
+base_url = os.getenv("WEATHER_API_BASE_URL", "https://api.weatherapi.com")
 path_url_realtime_api = "/v1/current.json"
 path_url_history_api = "/v1/history.json"
 api_key = os.getenv("WEATHER_API_KEY")
+weather_records_chunk_size = int(os.getenv("WEATHER_RECORDS_CHUNK_SIZE", "10000"))
 
-db_user = os.getenv("DB_USER")
-db_password = os.getenv("DB_PASSWORD")
-db_name = os.getenv("DB_NAME")
-db_host = os.getenv("DB_HOST")
+weather_analysis_columns = ["city_id", "date", "temp_c", "wind_speed_kph", "precip_mm", "humidity_perc"]
 
 
 @task(retries=2, retry_delay_seconds=3, timeout_seconds=10, log_prints=True)
-def task_generate_historical_data_url(city: str, previous_date: str):
-    return f"{base_url}{path_url_history_api}?key={api_key}&q={city}&dt={previous_date}"
+def task_generate_historical_data_url(location: str, previous_date: str):
+    return f"{base_url}{path_url_history_api}?key={api_key}&q={location}&dt={previous_date}"
 
-@task(retries=2, retry_delay_seconds=10, timeout_seconds=20, log_prints=True)
+@task(timeout_seconds=120, log_prints=True)
 def task_extract_weather_historical_data(url: str):
     logger = get_run_logger()
-    response = httpx.get(url)
     try:
-        response.raise_for_status()
+        return get_weather_api_client().get_json(url)
     except Exception as e:
         logger.exception(f"Could not retrieve weather historical data with url: {url}")
         raise e
 
-    return response.json()
+def summarize_weather_history(weather_data: dict):
+    return {'location': {key: weather_data['location'][key] for key in ('name', 'region', 'country')},
+            'astro': weather_data['forecast']['forecastday'][0]['astro']}
+
+@task(timeout_seconds=120, log_prints=True)
+def task_extract_weather_history_summary(city_id: int, location: str, previous_date: date):
+    weather_history_cache = get_weather_history_cache()
+    cache_key = (city_id, str(previous_date))
+    weather_history_summary = weather_history_cache.get(cache_key)
+    if weather_history_summary is None:
+        url = task_generate_historical_data_url.fn(location, previous_date)
+        weather_history_summary = summarize_weather_history(task_extract_weather_historical_data.fn(url))
+        weather_history_cache.set(cache_key, weather_history_summary)
+    return weather_history_summary
 
 @task(retries=2, retry_delay_seconds=2, timeout_seconds=10, log_prints=True)
 def task_extract_astro_data(astro_data: dict):
@@ -43,35 +57,168 @@ def task_extract_astro_data(astro_data: dict):
                   'moonset': astro_data['moonset'], 'moon_phase': astro_data['moon_phase']}
 
 @task(retries=2, retry_delay_seconds=10, timeout_seconds=60)
-def task_extract_city_id(location_data: dict):
-    with psycopg2.connect(user=db_user, password=db_password,
-                          host=db_host, dbname=db_name) as conn:
+def task_extract_city_location(city: str, time_zone: str):
+    with get_db_connection() as conn:
         with conn.cursor() as cursor:
             cursor.execute(
                 """
-                SELECT id 
-                FROM city 
-                WHERE name=%(name)s AND region=%(region)s AND country=%(country)s
-                """, {"name": location_data['name'], "region": location_data['region'],
-                      "country": location_data['country']}
+                SELECT id, latitude, longitude
+                FROM city
+                WHERE name=%(name)s AND time_zone=%(time_zone)s
+                ORDER BY id
+                """, {"name": city, "time_zone": time_zone}
             )
             result = cursor.fetchone()
-            return result[0] if result else None
+    if result is None:
+        return None
+
+    city_id, latitude, longitude = result
+    return city_id, f"{latitude},{longitude}"
 
 @task(retries=2, retry_delay_seconds=2, timeout_seconds=10)
 def task_extract_date(time_zone: str):
-    return datetime.now(ZoneInfo(time_zone)).date()
+    return get_local_date(time_zone)
 
 @task(retries=2, retry_delay_seconds=10, timeout_seconds=60)
-def task_extract_weather_record(city_id: str, previous_date: str):
-    with psycopg2.connect(user=db_user, password=db_password,
-                          host=db_host, dbname=db_name) as conn:
+def task_extract_weather_record(city_id: int, previous_date: str):
+    with get_db_connection() as conn:
         with conn.cursor() as cursor:
             cursor.execute(
-                """
-                SELECT * 
+                f"""
+                SELECT id, {", ".join(current_weather_columns)}
                 FROM current_weather 
                 WHERE city_id=%(city_id)s AND date=%(date)s
                 """, {"city_id": city_id, "date": previous_date}
             )
-            return cursor.fetchall()
\ No newline at end of file
+            weather_records = [CurrentWeather.from_db_row(row) for row in cursor.fetchall()]
+    increment("db_rows_fetched_total", len(weather_records), table="current_weather")
+    return weather_records
+
+@task(retries=2, retry_delay_seconds=10, timeout_seconds=60)
+def task_extract_cities_with_weather_records(analysis_date: date, cities: list = None, time_zone: str = None):
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT c.id, c.name, c.latitude, c.longitude
+                FROM city c
+                WHERE EXISTS (SELECT 1 FROM daily_weather_running_aggregates running
+                              WHERE running.city_id=c.id AND running.date=%(date)s)
+                AND (%(cities)s IS NULL OR c.name = ANY(%(cities)s))
+                AND (%(time_zone)s IS NULL OR c.time_zone = %(time_zone)s)
+                ORDER BY c.id
+                """, {"date": analysis_date, "cities": cities or None, "time_zone": time_zone}
+            )
+            return [(city_id, city, f"{latitude},{longitude}")
+                    for city_id, city, latitude, longitude in cursor.fetchall()]
+
+@task(retries=2, retry_delay_seconds=10, timeout_seconds=60)
+def task_extract_city_countries(city_ids: list):
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT id, country FROM city WHERE id = ANY(%(city_ids)s)", {"city_ids": city_ids})
+            return dict(cursor.fetchall())
+
+@task(retries=2, retry_delay_seconds=10, timeout_seconds=60)
+def task_extract_intraday_weather_stats(city_id: int, stats_date: date):
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT readings_count, max_temp_c, min_temp_c, sum_temp_c / readings_count, max_wind_speed_kph,
+                sum_wind_speed_kph / readings_count, total_precip_mm, TRUNC(sum_humidity_perc::NUMERIC / readings_count)
+                FROM daily_weather_running_aggregates
+                WHERE city_id=%(city_id)s AND date=%(date)s
+                """, {"city_id": city_id, "date": stats_date}
+            )
+            result = cursor.fetchone()
+    if result is None:
+        return None
+    return dict(zip(['readings_count', 'max_temp_c', 'min_temp_c', 'avg_temp_c', 'max_wind_speed_kph',
+                     'avg_wind_speed_kph', 'total_precip_mm', 'avg_humidity_perc'], result[:-1] + (int(result[-1]),)))
+
+@task(timeout_seconds=300, log_prints=True)
+def task_extract_astro_data_batch(cities: list, analysis_date: date):
+    logger = get_run_logger()
+    weather_history_cache = get_weather_history_cache()
+    weather_history_summaries = {city_id: weather_history_cache.get((city_id, str(analysis_date)))
+                                 for city_id, _, _ in cities}
+    uncached_cities = [(city_id, city, location) for city_id, city, location in cities
+                       if weather_history_summaries[city_id] is None]
+    urls = [f"{base_url}{path_url_history_api}?key={api_key}&q={location}&dt={analysis_date}"
+            for _, _, location in uncached_cities]
+
+    weather_data_list = get_weather_api_client().get_all_json(urls)
+    for (city_id, city, _), url, weather_data in zip(uncached_cities, urls, weather_data_list):
+        if isinstance(weather_data, Exception):
+            logger.error(f"Could not retrieve weather historical data for {city} with url: {url}: {weather_data!r}")
+            continue
+        weather_history_summaries[city_id] = summarize_weather_history(weather_data)
+        weather_history_cache.set((city_id, str(analysis_date)), weather_history_summaries[city_id])
+
+    print(f"Fetched the weather history of {len(uncached_cities)} cities, {len(cities) - len(uncached_cities)} were "
+          f"cached")
+    return {city_id: task_extract_astro_data.fn(weather_history_summary['astro'])
+            for city_id, weather_history_summary in weather_history_summaries.items()
+            if weather_history_summary is not None}
+
+@task(retries=2, retry_delay_seconds=10, timeout_seconds=60)
+def task_extract_city_ids(cities: list = None, time_zone: str = None):
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT id
+                FROM city
+                WHERE (%(cities)s IS NULL OR name = ANY(%(cities)s))
+                AND (%(time_zone)s IS NULL OR time_zone = %(time_zone)s)
+                ORDER BY id
+                """, {"cities": cities or None, "time_zone": time_zone}
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+@task(retries=2, retry_delay_seconds=10, timeout_seconds=120)
+def task_plan_backfill_units(start_date: date, end_date: date, cities: list = None, time_zone: str = None):
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                SELECT running.city_id, c.name, c.latitude, c.longitude, running.date
+                FROM daily_weather_running_aggregates running
+                JOIN city c ON c.id=running.city_id
+                WHERE running.date BETWEEN %(start_date)s AND %(end_date)s
+                AND (%(cities)s IS NULL OR c.name = ANY(%(cities)s))
+                AND (%(time_zone)s IS NULL OR c.time_zone = %(time_zone)s)
+                AND NOT EXISTS (SELECT 1 FROM daily_weather_analyses dwa
+                                WHERE dwa.city_id=running.city_id AND dwa.date=running.date)
+                ORDER BY running.date, running.city_id
+                """, {"start_date": start_date, "end_date": end_date, "cities": cities or None,
+                      "time_zone": time_zone}
+            )
+            return [(city_id, city, f"{latitude},{longitude}", analysis_date)
+                    for city_id, city, latitude, longitude, analysis_date in cursor.fetchall()]
+
+def stream_weather_record_chunks(start_date: date, end_date: date, city_ids: list = None, columns: list = None,
+                                 chunk_size: int = weather_records_chunk_size):
+    import numpy as np
+
+    columns = columns or weather_analysis_columns
+    unknown_columns = set(columns) - set(['id'] + current_weather_columns)
+    if unknown_columns:
+        raise ValueError(f"Unknown current weather columns: {sorted(unknown_columns)}")
+
+    with get_db_connection() as conn:
+        with conn.cursor(name=f"weather_records_{uuid.uuid4().hex}") as cursor:
+            cursor.itersize = chunk_size
+            cursor.execute(
+                f"""
+                SELECT {", ".join(columns)}
+                FROM current_weather
+                WHERE date BETWEEN %(start_date)s AND %(end_date)s
+                AND (%(city_ids)s::INT[] IS NULL OR city_id = ANY(%(city_ids)s::INT[]))
+                """, {"start_date": start_date, "end_date": end_date,
+                      "city_ids": None if city_ids is None else list(city_ids)}
+            )
+            while rows := cursor.fetchmany(chunk_size):
+                increment("db_rows_fetched_total", len(rows), table="current_weather")
+                yield {column: np.array(values) for column, values in zip(columns, zip(*rows))}
@@ -1,23 +1,14 @@
-import psycopg2
-import os
-
-from dotenv import load_dotenv
+from datetime import date
+from db_connection_pool import get_db_connection
+from instrumentation import increment
 from prefect import task
-
-load_dotenv()
-
-db_user = os.getenv("DB_USER")
-db_password = os.getenv("DB_PASSWORD")
-db_name = os.getenv("DB_NAME")
-db_host = os.getenv("DB_HOST")
+from psycopg2.extras import execute_values
+from weather_records import DailyWeatherAnalysis
 
 
 @task(retries=2, retry_delay_seconds=10, timeout_seconds=60, log_prints=True)
-def task_load_daily_weather_analysis_if_necessary(daily_weather_analysis_to_insert: dict):
-    stringified_daily_weather_analysis_to_insert = {key: str(value) for key, value in
-                                                    daily_weather_analysis_to_insert.items()}
-    with psycopg2.connect(user=db_user, password=db_password,
-                          host=db_host, dbname=db_name) as conn:
+def task_load_daily_weather_analysis_if_necessary(daily_weather_analysis_to_insert: DailyWeatherAnalysis):
+    with get_db_connection() as conn:
         with conn.cursor() as cursor:
             cursor.execute(
                 """
@@ -39,19 +30,118 @@ def task_load_daily_weather_analysis_if_necessary(daily_weather_analysis_to_inse
                     moonset,
                     moon_phase
                 )
-                VALUES(CAST(%(city_id)s AS INT), CAST(%(date)s AS DATE), CAST(%(max_temp_c)s AS FLOAT), 
-                CAST(%(min_temp_c)s AS FLOAT), CAST(%(avg_temp_c)s AS FLOAT), CAST(%(max_wind_speed_kph)s AS FLOAT),
-                CAST(%(max_wind_speed_mps)s AS FLOAT), CAST(%(avg_wind_speed_kph)s AS FLOAT),
-                CAST(%(avg_wind_speed_mps)s AS FLOAT), CAST(%(total_precip_mm)s AS FLOAT),
-                CAST(%(avg_humidity_perc)s AS INT), CAST(%(sunrise)s AS TIME), CAST(%(sunset)s AS TIME),
-                CAST(%(moonrise)s AS TIME), CAST(%(moonset)s AS TIME), %(moon_phase)s)
+                VALUES(%(city_id)s, %(date)s, %(max_temp_c)s, %(min_temp_c)s, %(avg_temp_c)s, %(max_wind_speed_kph)s,
+                %(max_wind_speed_mps)s, %(avg_wind_speed_kph)s, %(avg_wind_speed_mps)s, %(total_precip_mm)s,
+                %(avg_humidity_perc)s, %(sunrise)s, %(sunset)s, %(moonrise)s, %(moonset)s, %(moon_phase)s)
                 ON CONFLICT ON CONSTRAINT daily_weather_unique_constraint
                 DO UPDATE SET date=EXCLUDED.date
                 RETURNING id
-                """, stringified_daily_weather_analysis_to_insert
+                """, daily_weather_analysis_to_insert.to_db_params()
             )
             result_index = cursor.fetchone()
-            if result_index is None:
-                return None
-            cursor.execute("SELECT setval('daily_weather_analyses_id_seq', (SELECT MAX(id) FROM daily_weather_analyses))")
-            return result_index[0]
\ No newline at end of file
+            increment("db_rows_upserted_total", table="daily_weather_analyses")
+            return result_index[0] if result_index else None
+
+@task(retries=2, retry_delay_seconds=10, timeout_seconds=120, log_prints=True)
+def task_load_daily_weather_analyses_aggregated(analysis_date: date, astro_by_city_id: dict):
+    city_ids = list(astro_by_city_id)
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO daily_weather_analyses (
+                    city_id,
+                    date,
+                    max_temp_c,
+                    min_temp_c,
+                    avg_temp_c,
+                    max_wind_speed_kph,
+                    max_wind_speed_mps,
+                    avg_wind_speed_kph,
+                    avg_wind_speed_mps,
+                    total_precip_mm,
+                    avg_humidity_perc,
+                    sunrise,
+                    sunset,
+                    moonrise,
+                    moonset,
+                    moon_phase
+                )
+                SELECT running.city_id, running.date, running.max_temp_c, running.min_temp_c,
+                running.sum_temp_c / running.readings_count, running.max_wind_speed_kph,
+                running.max_wind_speed_kph / 3.6, running.sum_wind_speed_kph / running.readings_count,
+                running.sum_wind_speed_kph / running.readings_count / 3.6, running.total_precip_mm,
+                TRUNC(running.sum_humidity_perc::NUMERIC / running.readings_count), astro.sunrise, astro.sunset,
+                astro.moonrise, astro.moonset, astro.moon_phase
+                FROM daily_weather_running_aggregates running
+                JOIN UNNEST(%(city_ids)s::INT[], %(sunrises)s::TIME[], %(sunsets)s::TIME[], %(moonrises)s::TIME[],
+                            %(moonsets)s::TIME[], %(moon_phases)s::VARCHAR[])
+                     AS astro (city_id, sunrise, sunset, moonrise, moonset, moon_phase)
+                     ON astro.city_id=running.city_id
+                WHERE running.date=%(date)s
+                ON CONFLICT ON CONSTRAINT daily_weather_unique_constraint
+                DO UPDATE SET max_temp_c=EXCLUDED.max_temp_c, min_temp_c=EXCLUDED.min_temp_c,
+                avg_temp_c=EXCLUDED.avg_temp_c, max_wind_speed_kph=EXCLUDED.max_wind_speed_kph,
+                max_wind_speed_mps=EXCLUDED.max_wind_speed_mps, avg_wind_speed_kph=EXCLUDED.avg_wind_speed_kph,
+                avg_wind_speed_mps=EXCLUDED.avg_wind_speed_mps, total_precip_mm=EXCLUDED.total_precip_mm,
+                avg_humidity_perc=EXCLUDED.avg_humidity_perc, sunrise=EXCLUDED.sunrise, sunset=EXCLUDED.sunset,
+                moonrise=EXCLUDED.moonrise, moonset=EXCLUDED.moonset, moon_phase=EXCLUDED.moon_phase
+                RETURNING id
+                """, {"date": analysis_date, "city_ids": city_ids,
+                      "sunrises": [astro_by_city_id[city_id]['sunrise'] for city_id in city_ids],
+                      "sunsets": [astro_by_city_id[city_id]['sunset'] for city_id in city_ids],
+                      "moonrises": [astro_by_city_id[city_id]['moonrise'] for city_id in city_ids],
+                      "moonsets": [astro_by_city_id[city_id]['moonset'] for city_id in city_ids],
+                      "moon_phases": [astro_by_city_id[city_id]['moon_phase'] for city_id in city_ids]}
+            )
+            result_indexes = [result_index[0] for result_index in cursor.fetchall()]
+
+    increment("db_rows_upserted_total", len(result_indexes), table="daily_weather_analyses")
+    print(f"Stored daily weather analyses for {len(result_indexes)} cities on {analysis_date}")
+    return result_indexes
+
+@task(retries=2, retry_delay_seconds=10, timeout_seconds=300, log_prints=True)
+def task_load_missing_running_aggregates(daily_weather_aggregates: list):
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            inserted_rows = execute_values(
+                cursor,
+                """
+                INSERT INTO daily_weather_running_aggregates (
+                    city_id,
+                    date,
+                    readings_count,
+                    max_temp_c,
+                    min_temp_c,
+                    sum_temp_c,
+                    max_wind_speed_kph,
+                    sum_wind_speed_kph,
+                    total_precip_mm,
+                    sum_humidity_perc
+                )
+                VALUES %s
+                ON CONFLICT (city_id, date)
+                DO NOTHING
+                RETURNING city_id
+                """, [(aggregate['city_id'], aggregate['date'], aggregate['readings_count'], aggregate['max_temp_c'],
+                       aggregate['min_temp_c'], aggregate['sum_temp_c'], aggregate['max_wind_speed_kph'],
+                       aggregate['sum_wind_speed_kph'], aggregate['total_precip_mm'], aggregate['sum_humidity_perc'])
+                      for aggregate in daily_weather_aggregates], fetch=True
+            )
+
+    increment("db_rows_upserted_total", len(inserted_rows), table="daily_weather_running_aggregates")
+    print(f"Rebuilt the running aggregates of {len(inserted_rows)} of {len(daily_weather_aggregates)} city days")
+    return len(inserted_rows)
+
+@task(retries=2, retry_delay_seconds=10, timeout_seconds=120, log_prints=True)
+def task_export_daily_weather_analyses_to_parquet(daily_weather_analysis_ids: list):
+    if not daily_weather_analysis_ids:
+        return []
+    from parquet_store import export_partitions
+
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            output_files = export_partitions(cursor, "daily_weather_analyses", daily_weather_analysis_ids)
+
+    print(f"Exported {len(output_files)} daily weather analysis partitions to Parquet")
+    return output_files
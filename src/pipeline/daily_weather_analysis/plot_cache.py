@@ -0,0 +1,121 @@
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+
+from contextlib import contextmanager
+from pipeline_config import load_environment
+
+load_environment()
+
+plot_cache_max_age_days = float(os.getenv("PLOT_CACHE_MAX_AGE_DAYS", "0"))
+plot_cache_max_size_mb = float(os.getenv("PLOT_CACHE_MAX_SIZE_MB", "0"))
+plot_cache_manifest_name = "plot_cache_manifest.json"
+# Bump to re-render the charts after their look changes.
+plot_cache_version = "1"
+
+
+def generate_plot_key(content_hash: str, plot_name: str, city: str, country: str, dpi: int):
+    plot_key = json.dumps([plot_cache_version, content_hash, plot_name, city, country, dpi])
+    return hashlib.sha256(plot_key.encode("utf-8")).hexdigest()
+
+
+class PlotCache:
+    def __init__(self, plots_dir: str, max_age_days: float = plot_cache_max_age_days,
+                 max_size_mb: float = plot_cache_max_size_mb):
+        self.plots_dir = plots_dir
+        self.manifest_path = os.path.join(plots_dir, plot_cache_manifest_name)
+        self.manifest_lock_path = f"{self.manifest_path}.lock"
+        self.max_age_seconds = max_age_days * 24 * 60 * 60
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+        self._lock = threading.Lock()
+        self._entries = self._read_manifest()
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, encoding="utf-8") as manifest_file:
+                return json.load(manifest_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    @contextmanager
+    def _lock_manifest(self):
+        os.makedirs(self.plots_dir, exist_ok=True)
+        with open(self.manifest_lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _merge_manifest(self):
+        entries = self._read_manifest()
+        for output_file, entry in self._entries.items():
+            stored_entry = entries.get(output_file)
+            if stored_entry is None or entry['created'] > stored_entry['created']:
+                entries[output_file] = entry
+            elif entry['key'] == stored_entry['key']:
+                stored_entry['last_used'] = max(stored_entry['last_used'], entry['last_used'])
+        self._entries = {output_file: entry for output_file, entry in entries.items() if os.path.exists(output_file)}
+
+    def _write_manifest(self):
+        temporary_path = f"{self.manifest_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as manifest_file:
+            json.dump(self._entries, manifest_file, indent=2, sort_keys=True)
+        os.replace(temporary_path, self.manifest_path)
+
+    def is_fresh(self, output_file: str, plot_key: str):
+        with self._lock:
+            entry = self._entries.get(output_file)
+            if entry is None or entry['key'] != plot_key or not os.path.exists(output_file):
+                return False
+            entry['last_used'] = time.time()
+            return True
+
+    def record(self, output_file: str, plot_key: str):
+        with self._lock:
+            self._entries[output_file] = {"key": plot_key, "size": os.path.getsize(output_file),
+                                          "created": time.time(), "last_used": time.time()}
+
+    def evict(self, keep_files: list = ()):
+        with self._lock, self._lock_manifest():
+            self._merge_manifest()
+            now = time.time()
+            evicted_files = set()
+            kept_files = set(keep_files)
+            if self.max_age_seconds > 0:
+                evicted_files.update(output_file for output_file, entry in self._entries.items()
+                                     if now - entry['last_used'] > self.max_age_seconds
+                                     and output_file not in kept_files)
+            if self.max_size_bytes > 0:
+                entries_by_last_use = sorted((entry['last_used'], output_file, entry['size'])
+                                             for output_file, entry in self._entries.items()
+                                             if output_file not in evicted_files)
+                total_size = sum(size for _, _, size in entries_by_last_use)
+                for _, output_file, size in entries_by_last_use:
+                    if total_size <= self.max_size_bytes:
+                        break
+                    if output_file in kept_files:
+                        continue
+                    evicted_files.add(output_file)
+                    total_size -= size
+
+            for output_file in evicted_files:
+                del self._entries[output_file]
+                if os.path.exists(output_file):
+                    os.remove(output_file)
+            self._write_manifest()
+            return sorted(evicted_files)
+
+
+_plot_caches = {}
+_plot_caches_lock = threading.Lock()
+
+
+def get_plot_cache(plots_dir: str):
+    with _plot_caches_lock:
+        if plots_dir not in _plot_caches:
+            _plot_caches[plots_dir] = PlotCache(plots_dir)
+        return _plot_caches[plots_dir]
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import hashlib
+
+from dataclasses import dataclass
+from datetime import date
+from typing import TYPE_CHECKING
+from weather_records import parse_time
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+
+@dataclass(slots=True, frozen=True)
+class PlotFrame:
+    plot_date: date
+    time_labels: np.ndarray
+    temp_c: np.ndarray
+    wind_speed_kph: np.ndarray
+    wind_speed_mps: np.ndarray
+    wind_dir_codes: np.ndarray
+    precip_mm: np.ndarray
+    wind_speed_bins: np.ndarray
+    wind_rose_histogram: np.ndarray
+
+    @property
+    def series(self):
+        return (self.time_labels, self.temp_c, self.wind_speed_kph, self.wind_speed_mps, self.wind_dir_codes,
+                self.precip_mm, self.wind_speed_bins, self.wind_rose_histogram)
+
+    def content_hash(self):
+        content_hash = hashlib.sha256(str(self.plot_date).encode("utf-8"))
+        for values in self.series:
+            content_hash.update(str(values.dtype).encode("utf-8"))
+            content_hash.update(values.tobytes())
+        return content_hash.hexdigest()
+
+
+def read_only(values):
+    import numpy as np
+
+    values = np.ascontiguousarray(values)
+    values.setflags(write=False)
+    return values
+
+def prepare_plot_frame(weather_data_df: pd.DataFrame):
+    import numpy as np
+    from compass import compass_dirs_to_codes, default_speed_bins, wind_rose_histogram
+
+    times = [parse_time(value) for value in weather_data_df['time']]
+    seconds = np.fromiter((value.hour * 3600 + value.minute * 60 + value.second for value in times), dtype=np.int64,
+                          count=len(times))
+    order = np.argsort(seconds, kind='stable')
+
+    wind_speeds_mps = weather_data_df['wind_speed_mps'].to_numpy(dtype=np.float64)
+    wind_dir_codes = compass_dirs_to_codes(weather_data_df['wind_dir'].to_numpy())
+    wind_speed_bins = default_speed_bins(wind_speeds_mps)
+
+    return PlotFrame(
+        plot_date=weather_data_df['date'].iloc[0],
+        time_labels=read_only(np.array([value.strftime('%H:%M') for value in times], dtype='U5')[order]),
+        temp_c=read_only(weather_data_df['temp_c'].to_numpy(dtype=np.float64)[order]),
+        wind_speed_kph=read_only(weather_data_df['wind_speed_kph'].to_numpy(dtype=np.float64)[order].round(2)),
+        wind_speed_mps=read_only(wind_speeds_mps[order]),
+        wind_dir_codes=read_only(wind_dir_codes[order]),
+        precip_mm=read_only(weather_data_df['precip_mm'].to_numpy(dtype=np.float64)[order]),
+        wind_speed_bins=read_only(wind_speed_bins),
+        wind_rose_histogram=read_only(wind_rose_histogram(wind_dir_codes, wind_speeds_mps, wind_speed_bins)))
@@ -0,0 +1,175 @@
+import atexit
+import multiprocessing
+import os
+import threading
+import numpy as np
+
+from compass import wind_rose_frequency_table
+from concurrent.futures import ProcessPoolExecutor
+from instrumentation import increment, timer
+from matplotlib import colormaps, rcParams
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.patches import Rectangle
+from pipeline_config import load_environment
+from plot_cache import generate_plot_key, get_plot_cache
+from plot_frame import PlotFrame
+from windrose import WindroseAxes
+from windrose.windrose import ZBASE
+
+load_environment()
+
+plot_rendering_max_workers = int(os.getenv("PLOT_RENDERING_MAX_WORKERS", str(min(os.cpu_count() or 1, 8))))
+plot_dpi = 300
+plots_dir = "./plots"
+
+
+class BinnedWindroseAxes(WindroseAxes):
+    def bar_from_table(self, frequency_table, speed_bins, opening: float = 0.8, edgecolor: str = None):
+        number_of_bins, number_of_sectors = frequency_table.shape
+        colors = self._colors(colormaps[rcParams['image.cmap']], number_of_bins)
+        angles = np.arange(0, -2 * np.pi, -2 * np.pi / number_of_sectors) + np.pi / 2
+        sector_opening = 2 * np.pi / number_of_sectors * opening
+        origins = np.cumsum(frequency_table, axis=0) - frequency_table
+
+        self._info['dir'] = (np.arange(number_of_sectors) * 360 / number_of_sectors).tolist()
+        self._info['bins'] = np.asarray(speed_bins).tolist() + [np.inf]
+        self._info['table'] = frequency_table
+        for sector in range(number_of_sectors):
+            for speed_bin in range(number_of_bins):
+                patch = Rectangle((angles[sector] - sector_opening / 2, origins[speed_bin, sector]), sector_opening,
+                                  frequency_table[speed_bin, sector], facecolor=colors[speed_bin], edgecolor=edgecolor,
+                                  zorder=ZBASE + number_of_bins - speed_bin)
+                patch.get_path()._interpolation_steps = 100
+                self.add_patch(patch)
+                if sector == 0:
+                    self.patches_list.append(patch)
+        self._update()
+
+
+def generate_output_file(plot_name: str, plot_date, city: str, country: str):
+    output_dir = f"{plots_dir}/{plot_date}"
+    os.makedirs(output_dir, exist_ok=True)
+    return os.path.join(output_dir, f"{plot_name}_{city.replace(' ', '_')}_{country.replace(' ', '_')}.png")
+
+def save_figure(figure: Figure, output_file: str, tight_layout: bool = True):
+    FigureCanvasAgg(figure)
+    if tight_layout:
+        figure.tight_layout()
+    figure.savefig(output_file, dpi=plot_dpi)
+    return output_file
+
+def style_line_axes(ax, y_label: str, title: str):
+    ax.set_xlabel('Time of Day', fontsize=12, fontweight='bold')
+    ax.set_ylabel(y_label, fontsize=12, fontweight='bold')
+    ax.set_title(title, fontsize=14, fontweight='bold')
+    ax.tick_params(axis='x', labelrotation=45, labelsize=10)
+    ax.tick_params(axis='y', labelsize=10)
+
+def render_temp_changes_plot(plot_frame: PlotFrame, city: str, country: str):
+    figure = Figure(figsize=(12, 6))
+    ax = figure.add_subplot()
+    ax.plot(plot_frame.time_labels, plot_frame.temp_c, marker='o', label='Temperature (°C)', color='goldenrod',
+            linewidth=2)
+    style_line_axes(ax, 'Temperature (°C)',
+                    f"Temperature Changes Throughout the Day for {city}, {country}\n(Date: {plot_frame.plot_date})")
+    ax.grid(color='gray', linestyle='--', linewidth=0.5, alpha=0.7)
+    ax.legend(fontsize=10)
+
+    for time, temp in zip(plot_frame.time_labels, plot_frame.temp_c):
+        ax.annotate(f'{temp}°C', xy=(time, temp), xytext=(0, 5), textcoords='offset points',
+                    ha='center', fontsize=10, color='black')
+
+    return save_figure(figure, generate_output_file("temperature_changes", plot_frame.plot_date, city, country))
+
+def render_wind_speed_changes_plot(plot_frame: PlotFrame, city: str, country: str):
+    figure = Figure(figsize=(12, 6))
+    ax = figure.add_subplot()
+    ax.plot(plot_frame.time_labels, plot_frame.wind_speed_kph, marker='o', label='Wind Speed (km/h)',
+            color='darkblue', linewidth=2)
+    style_line_axes(ax, 'Wind Speed (km/h)',
+                    f"Wind Speed Changes Throughout the Day for {city}, {country}\n(Date: {plot_frame.plot_date})")
+    ax.grid(color='gray', linestyle='--', linewidth=0.5, alpha=0.7)
+    ax.legend(fontsize=10)
+
+    return save_figure(figure, generate_output_file("wind_speed_changes", plot_frame.plot_date, city, country))
+
+def render_precipitation_changes_plot(plot_frame: PlotFrame, city: str, country: str):
+    figure = Figure(figsize=(12, 6))
+    ax = figure.add_subplot()
+    ax.bar(plot_frame.time_labels, plot_frame.precip_mm, color='skyblue')
+    style_line_axes(ax, 'Precipitation (mm)',
+                    f"Precipitation Changes Throughout the Day for {city}, {country}\n(Date: {plot_frame.plot_date})")
+
+    return save_figure(figure, generate_output_file("precipitation_changes", plot_frame.plot_date, city, country))
+
+def render_temperature_distribution_plot(plot_frame: PlotFrame, city: str, country: str):
+    figure = Figure(figsize=(8, 6))
+    ax = figure.add_subplot()
+    ax.boxplot(plot_frame.temp_c)
+    ax.set_ylabel('Temperature (°C)', fontsize=12, fontweight='bold')
+    ax.set_title(f"Daily Temperature Distribution for {city}, {country}\n(Date: {plot_frame.plot_date})",
+                 fontsize=14, fontweight='bold')
+
+    return save_figure(figure, generate_output_file("temperature_distribution", plot_frame.plot_date, city, country),
+                       tight_layout=False)
+
+def render_wind_rose_plot(plot_frame: PlotFrame, city: str, country: str):
+    figure = Figure(figsize=(8, 8), facecolor='w', edgecolor='w')
+    ax = BinnedWindroseAxes(figure, [0.1, 0.1, 0.8, 0.8])
+    figure.add_axes(ax)
+    ax.bar_from_table(wind_rose_frequency_table(plot_frame.wind_rose_histogram), plot_frame.wind_speed_bins,
+                      opening=0.8, edgecolor='white')
+    ax.set_title(f"Daily Wind Rose for {city}, {country}\n(Date: {plot_frame.plot_date})", fontsize=14,
+                 fontweight="bold")
+    ax.set_legend(title='Wind Speed (m/s)')
+
+    return save_figure(figure, generate_output_file("wind_rose", plot_frame.plot_date, city, country),
+                       tight_layout=False)
+
+def select_daily_plot_renderers(plot_frame: PlotFrame):
+    renderers = [("temperature_changes", render_temp_changes_plot),
+                 ("wind_speed_changes", render_wind_speed_changes_plot)]
+    if plot_frame.precip_mm.sum() > 0:
+        renderers.append(("precipitation_changes", render_precipitation_changes_plot))
+    renderers.extend([("temperature_distribution", render_temperature_distribution_plot),
+                      ("wind_rose", render_wind_rose_plot)])
+    return renderers
+
+
+_plot_rendering_pool = None
+_plot_rendering_pool_lock = threading.Lock()
+
+
+def get_plot_rendering_pool():
+    global _plot_rendering_pool
+    with _plot_rendering_pool_lock:
+        if _plot_rendering_pool is None:
+            _plot_rendering_pool = ProcessPoolExecutor(max_workers=plot_rendering_max_workers,
+                                                       mp_context=multiprocessing.get_context("spawn"))
+            atexit.register(_plot_rendering_pool.shutdown)
+        return _plot_rendering_pool
+
+def render_daily_plots(plot_frame: PlotFrame, city: str, country: str):
+    plot_cache = get_plot_cache(plots_dir)
+    pool = get_plot_rendering_pool()
+    content_hash = plot_frame.content_hash()
+
+    output_files = []
+    futures = []
+    with timer("plot_render_seconds"):
+        for plot_name, renderer in select_daily_plot_renderers(plot_frame):
+            output_file = generate_output_file(plot_name, plot_frame.plot_date, city, country)
+            plot_key = generate_plot_key(content_hash, plot_name, city, country, plot_dpi)
+            if not plot_cache.is_fresh(output_file, plot_key):
+                futures.append((plot_key, pool.submit(renderer, plot_frame, city, country)))
+            output_files.append(output_file)
+
+        for plot_key, future in futures:
+            plot_cache.record(future.result(), plot_key)
+    plot_cache.evict(keep_files=output_files)
+    increment("plots_rendered_total", len(futures))
+    increment("plots_reused_total", len(output_files) - len(futures))
+    print(f"Rendered {len(futures)} plots and reused {len(output_files) - len(futures)} unchanged plots for {city}, "
+          f"{country} on {plot_frame.plot_date}")
+    return output_files
@@ -1,19 +1,26 @@
-import os
-import pandas as pd
-import matplotlib.pyplot as plt
+from __future__ import annotations
 
-from datetime import datetime
+import operator
+
+from datetime import date, datetime
+from extract_weather_historical_data import stream_weather_record_chunks
+from instrumentation import timer
+from plot_frame import PlotFrame, prepare_plot_frame
 from prefect import task
-from windrose import WindroseAxes
+from typing import TYPE_CHECKING
+from weather_records import current_weather_columns
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 @task(retries=2, retry_delay_seconds=3, timeout_seconds=20, log_prints=True)
 def task_transform_to_pd_df(weather_data_list: list):
-    return pd.DataFrame(weather_data_list, columns=['id', 'city_id', 'date', 'time', 'temp_c', 'feels_like_c',
-                                                    'weather_condition_code', 'weather_condition_text',
-                                                    'weather_condition_icon', 'wind_speed_kph', 'wind_speed_mps',
-                                                    'wind_dir', 'pressure_mb', 'precip_mm', 'humidity_perc',
-                                                    'cloud_perc', 'uv_index'])
+    import pandas as pd
+
+    with timer("dataframe_build_seconds", source="weather_records"):
+        return pd.DataFrame([(weather_data.id,) + weather_data.to_db_row() for weather_data in weather_data_list],
+                            columns=['id'] + current_weather_columns)
 
 @task(retries=2, retry_delay_seconds=2, timeout_seconds=6)
 def task_fill_direct_weather_analysis_fields(weather_data_df: pd.DataFrame, daily_weather_analysis_to_insert: dict):
@@ -54,146 +61,84 @@ def task_transform_astro_fields(astro_dict: dict, daily_weather_analysis_to_inse
     daily_weather_analysis_to_insert['moonset'] = datetime.strptime(astro_dict['moonset'], "%I:%M %p").strftime("%H:%M")
     daily_weather_analysis_to_insert['moon_phase'] = astro_dict['moon_phase']
 
-@task(retries=2, retry_delay_seconds=10, timeout_seconds=60, log_prints=True)
-def task_generate_temp_changes_plot(weather_data_df: pd.DataFrame, city: str, country: str):
-    plot_date = weather_data_df['date'].iloc[0]
-    weather_data_df['time'] = pd.to_datetime(weather_data_df['time'], format='%H:%M:%S')
-
-    df = weather_data_df.sort_values(by='time')
-
-    output_dir = f"./plots/{plot_date}"
-    os.makedirs(output_dir, exist_ok=True)
-
-    plt.figure(figsize=(12, 6))
-    plt.plot(df['time'].dt.strftime('%H:%M'), df['temp_c'], marker='o', label='Temperature (°C)',
-             color='goldenrod', linewidth=2)
-
-    plt.xlabel('Time of Day', fontsize=12, fontweight='bold')
-    plt.ylabel('Temperature (°C)', fontsize=12, fontweight='bold')
-    plt.title(f"Temperature Changes Throughout the Day for {city}, {country}\n(Date: {plot_date})",
-              fontsize=14, fontweight='bold')
-    plt.grid(color='gray', linestyle='--', linewidth=0.5, alpha=0.7)
-    plt.xticks(rotation=45, fontsize=10)
-    plt.yticks(fontsize=10)
-    plt.legend(fontsize=10)
-
-    for i, (time, temp) in enumerate(zip(df['time'].dt.strftime('%H:%M'), df['temp_c'])):
-        plt.annotate(f'{temp}°C', xy=(time, temp), xytext=(0, 5), textcoords='offset points',
-                     ha='center', fontsize=10, color='black')
-
-    output_file = os.path.join(output_dir, f"temperature_changes_{city.replace(' ', '_')}_"
-                                           f"{country.replace(' ', '_')}.png")
-    plt.tight_layout()
-    plt.savefig(output_file, dpi=300)
-    plt.close()
-
-@task(retries=2, retry_delay_seconds=10, timeout_seconds=60, log_prints=True)
-def task_generate_wind_speed_changes_plot(weather_data_df: pd.DataFrame, city: str, country: str):
-    plot_date = weather_data_df['date'].iloc[0]
-    weather_data_df['time'] = pd.to_datetime(weather_data_df['time'], format='%H:%M:%S')
-
-    df = weather_data_df.sort_values(by='time')
-
-    output_dir = f"./plots/{plot_date}"
-    os.makedirs(output_dir, exist_ok=True)
-
-    plt.figure(figsize=(12, 6))
-    plt.plot(df['time'].dt.strftime('%H:%M'), df['wind_speed_kph'].apply(lambda x: float('{:,.2f}'.format(x))),
-             marker='o', label='Wind Speed (km/h)', color='darkblue', linewidth=2)
-
-    plt.xlabel('Time of Day', fontsize=12, fontweight='bold')
-    plt.ylabel('Wind Speed (km/h)', fontsize=12, fontweight='bold')
-    plt.title(f"Wind Speed Changes Throughout the Day for {city}, {country}\n(Date: {plot_date})",
-              fontsize=14, fontweight='bold')
-    plt.grid(color='gray', linestyle='--', linewidth=0.5, alpha=0.7)
-    plt.xticks(rotation=45, fontsize=10)
-    plt.yticks(fontsize=10)
-    plt.legend(fontsize=10)
-
-    output_file = os.path.join(output_dir, f"wind_speed_changes_{city.replace(' ', '_')}_"
-                                           f"{country.replace(' ', '_')}.png")
-    plt.tight_layout()
-    plt.savefig(output_file, dpi=300)
-    plt.close()
-
-@task(retries=2, retry_delay_seconds=10, timeout_seconds=60, log_prints=True)
-def task_generate_precipitation_changes_plot(weather_data_df: pd.DataFrame, city: str, country: str):
-    plot_date = weather_data_df['date'].iloc[0]
-    weather_data_df['time'] = pd.to_datetime(weather_data_df['time'], format='%H:%M:%S')
-
-    df = weather_data_df.sort_values(by='time')
-
-    output_dir = f"./plots/{plot_date}"
-    os.makedirs(output_dir, exist_ok=True)
-
-    plt.figure(figsize=(12, 6))
-    plt.bar(df['time'].dt.strftime('%H:%M'), df['precip_mm'], color='skyblue')
-
-    plt.xlabel('Time of Day', fontsize=12, fontweight='bold')
-    plt.ylabel('Precipitation (mm)', fontsize=12, fontweight='bold')
-    plt.title(f"Precipitation Changes Throughout the Day for {city}, {country}\n(Date: {plot_date})",
-              fontsize=14, fontweight='bold')
-    plt.xticks(rotation=45, fontsize=10)
-    plt.yticks(fontsize=10)
-
-    output_file = os.path.join(output_dir, f"precipitation_changes_{city.replace(' ', '_')}_"
-                                           f"{country.replace(' ', '_')}.png")
-    plt.tight_layout()
-    plt.savefig(output_file, dpi=300)
-    plt.close()
-
-@task(retries=2, retry_delay_seconds=10, timeout_seconds=60, log_prints=True)
-def task_plot_temperature_distribution(weather_data_df: pd.DataFrame, city: str, country: str):
-    plot_date = weather_data_df['date'].iloc[0]
-
-    output_dir = f"./plots/{plot_date}"
-    os.makedirs(output_dir, exist_ok=True)
-
-    plt.figure(figsize=(8, 6))
-    plt.boxplot(weather_data_df['temp_c'])
-    plt.ylabel('Temperature (°C)', fontsize=12, fontweight='bold')
-    plt.title(f"Daily Temperature Distribution for {city}, {country}\n(Date: {plot_date})",
-              fontsize=14, fontweight='bold')
-
-    output_file = os.path.join(output_dir, f"temperature_distribution_{city.replace(' ', '_')}_"
-                                           f"{country.replace(' ', '_')}.png")
-    plt.savefig(output_file, dpi=300)
-    plt.close()
-
-@task(retries=2, retry_delay_seconds=10, timeout_seconds=60, log_prints=True)
-def task_plot_wind_rose(weather_data_df: pd.DataFrame, city: str, country: str):
-    plot_date = weather_data_df['date'].iloc[0]
-    output_dir = f"./plots/{plot_date}"
-    os.makedirs(output_dir, exist_ok=True)
-
-    direction_to_angle = {
-        "N": 0,
-        "NNE": 22.5,
-        "NE": 45,
-        "ENE": 67.5,
-        "E": 90,
-        "ESE": 112.5,
-        "SE": 135,
-        "SSE": 157.5,
-        "S": 180,
-        "SSW": 202.5,
-        "SW": 225,
-        "WSW": 247.5,
-        "W": 270,
-        "WNW": 292.5,
-        "NW": 315,
-        "NNW": 337.5
-    }
-
-    directions = weather_data_df['wind_dir']
-    angles = [direction_to_angle[direct] for direct in directions]
-
-    ax = WindroseAxes.from_ax()
-    ax.bar(angles, weather_data_df['wind_speed_mps'], normed=True, opening=0.8, edgecolor='white')
-    ax.set_title(f"Daily Wind Rose for {city}, {country}\n(Date: {plot_date})", fontsize=14, fontweight="bold")
-    ax.set_legend(title = 'Wind Speed (m/s)')
-
-    output_file = os.path.join(output_dir, f"wind_rose_{city.replace(' ', '_')}_"
-                                           f"{country.replace(' ', '_')}.png")
-    plt.savefig(output_file, dpi=300)
-    plt.close()
\ No newline at end of file
+def convert_astro_times(astro_dict: dict):
+    return {'sunrise': datetime.strptime(astro_dict['sunrise'], "%I:%M %p").time(),
+            'sunset': datetime.strptime(astro_dict['sunset'], "%I:%M %p").time(),
+            'moonrise': datetime.strptime(astro_dict['moonrise'], "%I:%M %p").time(),
+            'moonset': datetime.strptime(astro_dict['moonset'], "%I:%M %p").time(),
+            'moon_phase': astro_dict['moon_phase']}
+
+@task(retries=2, retry_delay_seconds=2, timeout_seconds=20)
+def task_transform_astro_data_batch(astro_by_city_id: dict):
+    return {city_id: convert_astro_times(astro_dict) for city_id, astro_dict in astro_by_city_id.items()}
+
+daily_weather_aggregations = {
+    'count': ('temp_c', 'size', operator.add),
+    'max_temp_c': ('temp_c', 'max', max),
+    'min_temp_c': ('temp_c', 'min', min),
+    'sum_temp_c': ('temp_c', 'sum', operator.add),
+    'max_wind_speed_kph': ('wind_speed_kph', 'max', max),
+    'sum_wind_speed_kph': ('wind_speed_kph', 'sum', operator.add),
+    'total_precip_mm': ('precip_mm', 'sum', operator.add),
+    'sum_humidity_perc': ('humidity_perc', 'sum', operator.add),
+}
+
+
+class DailyWeatherAggregator:
+    def __init__(self):
+        self._groups = {}
+
+    def add(self, chunk: dict):
+        import pandas as pd
+
+        with timer("dataframe_build_seconds", source="weather_record_chunk"):
+            grouped = pd.DataFrame(chunk).groupby(['city_id', 'date'], sort=False).agg(
+                **{name: (column, function) for name, (column, function, _) in daily_weather_aggregations.items()})
+        merge_functions = [merge for _, _, merge in daily_weather_aggregations.values()]
+
+        for key, *values in zip(grouped.index, *(grouped[name].tolist() for name in daily_weather_aggregations)):
+            group = self._groups.get(key)
+            self._groups[key] = values if group is None else [merge(previous, value) for merge, previous, value
+                                                              in zip(merge_functions, group, values)]
+
+    def results(self):
+        daily_weather_aggregates = []
+        for (city_id, analysis_date), group in sorted(self._groups.items()):
+            values = dict(zip(daily_weather_aggregations, group))
+            count = values['count']
+            daily_weather_aggregates.append({
+                'city_id': city_id, 'date': analysis_date, 'max_temp_c': values['max_temp_c'],
+                'min_temp_c': values['min_temp_c'], 'avg_temp_c': values['sum_temp_c'] / count,
+                'max_wind_speed_kph': values['max_wind_speed_kph'],
+                'max_wind_speed_mps': values['max_wind_speed_kph'] / 3.6,
+                'avg_wind_speed_kph': values['sum_wind_speed_kph'] / count,
+                'avg_wind_speed_mps': values['sum_wind_speed_kph'] / count / 3.6,
+                'total_precip_mm': values['total_precip_mm'],
+                'avg_humidity_perc': int(values['sum_humidity_perc'] / count), 'readings_count': count,
+                'sum_temp_c': values['sum_temp_c'], 'sum_wind_speed_kph': values['sum_wind_speed_kph'],
+                'sum_humidity_perc': values['sum_humidity_perc']})
+        return daily_weather_aggregates
+
+@task(retries=2, retry_delay_seconds=10, timeout_seconds=600, log_prints=True)
+def task_aggregate_weather_records_streaming(start_date: date, end_date: date, city_ids: list = None):
+    aggregator = DailyWeatherAggregator()
+    number_of_readings = 0
+    for chunk in stream_weather_record_chunks(start_date, end_date, city_ids):
+        aggregator.add(chunk)
+        number_of_readings += len(chunk['city_id'])
+
+    daily_weather_aggregates = aggregator.results()
+    print(f"Aggregated {number_of_readings} current weather readings into {len(daily_weather_aggregates)} daily "
+          f"weather aggregates between {start_date} and {end_date}")
+    return daily_weather_aggregates
+
+@task(retries=2, retry_delay_seconds=2, timeout_seconds=20)
+def task_prepare_plot_frame(weather_data_df: pd.DataFrame):
+    with timer("plot_frame_build_seconds"):
+        return prepare_plot_frame(weather_data_df)
+
+@task(retries=2, retry_delay_seconds=10, timeout_seconds=120, log_prints=True)
+def task_render_daily_plots(plot_frame: PlotFrame, city: str, country: str):
+    from plot_rendering import render_daily_plots
+
+    return render_daily_plots(plot_frame, city, country)
@@ -0,0 +1,112 @@
+import argparse
+import datetime
+import os
+import sys
+
+from collections import defaultdict
+from prefect import flow, task
+from prefect.futures import as_completed
+from prefect.runtime import flow_run, task_run
+from prefect.task_runners import ThreadPoolTaskRunner
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+
+from extract_weather_historical_data import (task_extract_city_ids, task_plan_backfill_units,
+                                             task_extract_astro_data_batch)
+from transform_weather_historical_data import task_aggregate_weather_records_streaming, task_transform_astro_data_batch
+from load_weather_historical_data import (task_load_daily_weather_analyses_aggregated,
+                                          task_export_daily_weather_analyses_to_parquet,
+                                          task_load_missing_running_aggregates)
+from instrumentation import instrument_flow_run
+from pipeline_config import load_environment
+
+load_environment()
+
+backfill_max_workers = int(os.getenv("BACKFILL_MAX_WORKERS", "4"))
+
+
+def generate_backfill_task_run_name():
+    task_name = task_run.task_name
+    analysis_date = task_run.parameters['analysis_date']
+    units = task_run.parameters['units']
+    return f"{task_name}-on-{analysis_date}-for-{len(units)}-cities"
+
+def generate_weather_analysis_backfill_flow_run_name():
+    flow_name = flow_run.flow_name
+    start_date = flow_run.parameters['start_date']
+    end_date = flow_run.parameters['end_date']
+    return f"{flow_name}-from-{start_date}-to-{end_date}"
+
+@task(task_run_name=generate_backfill_task_run_name, retries=2, retry_delay_seconds=10, timeout_seconds=300,
+      log_prints=True)
+def task_backfill_daily_weather_analyses(analysis_date: datetime.date, units: list):
+    astro_by_city_id = task_extract_astro_data_batch.fn([unit[:3] for unit in units], analysis_date)
+    astro_by_city_id = task_transform_astro_data_batch.fn(astro_by_city_id)
+    if astro_by_city_id:
+        daily_weather_analysis_ids = task_load_daily_weather_analyses_aggregated.fn(analysis_date, astro_by_city_id)
+        task_export_daily_weather_analyses_to_parquet.fn(daily_weather_analysis_ids)
+    return set(astro_by_city_id)
+
+@flow(flow_run_name=generate_weather_analysis_backfill_flow_run_name, log_prints=True,
+      task_runner=ThreadPoolTaskRunner(max_workers=backfill_max_workers))
+@instrument_flow_run
+def weather_analysis_backfill_pipeline(start_date: datetime.date, end_date: datetime.date,
+                                       cities: list | None = None, rebuild_running_aggregates: bool = False,
+                                       time_zone: str | None = None):
+    if rebuild_running_aggregates:
+        city_ids = task_extract_city_ids(cities, time_zone) if cities or time_zone else None
+        task_load_missing_running_aggregates(task_aggregate_weather_records_streaming(start_date, end_date, city_ids))
+
+    units_by_date = defaultdict(list)
+    for unit in task_plan_backfill_units(start_date, end_date, cities, time_zone):
+        units_by_date[unit[-1]].append(unit)
+
+    number_of_units = sum(len(units) for units in units_by_date.values())
+    print(f"Planned {number_of_units} missing daily weather analyses on {len(units_by_date)} days "
+          f"between {start_date} and {end_date}")
+
+    futures = {}
+    for analysis_date, units in sorted(units_by_date.items()):
+        future = task_backfill_daily_weather_analyses.submit(analysis_date, units)
+        futures[future] = (analysis_date, units)
+
+    failed_units = []
+    for future in as_completed(list(futures)):
+        analysis_date, units = futures[future]
+        try:
+            completed_city_ids = future.result()
+        except Exception as e:
+            print(f"Could not backfill the daily weather analyses on {analysis_date}: {e!r}")
+            failed_units.extend(units)
+            continue
+
+        failed_units.extend(unit for unit in units if unit[0] not in completed_city_ids)
+
+    print(f"Backfilled {number_of_units - len(failed_units)} daily weather analyses, {len(failed_units)} failed")
+    return failed_units
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill the missing daily weather analyses between two dates. "
+                                                 "Rerun the same command to resume after a failure.")
+    parser.add_argument("start_date", type=datetime.date.fromisoformat)
+    parser.add_argument("end_date", type=datetime.date.fromisoformat)
+    parser.add_argument("--cities", nargs="+", help="City names to backfill (default: all cities)")
+    parser.add_argument("--time-zone", help="Only backfill the cities of this time zone, e.g. to tell apart the cities "
+                                            "of the same name")
+    parser.add_argument("--max-workers", type=int, default=backfill_max_workers,
+                        help="Number of days processed in parallel")
+    parser.add_argument("--rebuild-running-aggregates", action="store_true",
+                        help="First rebuild the missing running aggregates from the stored readings of the range")
+    args = parser.parse_args()
+    if args.end_date < args.start_date:
+        parser.error("end_date is before start_date")
+
+    backfill_pipeline = weather_analysis_backfill_pipeline.with_options(
+        task_runner=ThreadPoolTaskRunner(max_workers=args.max_workers))
+    failed_units = backfill_pipeline(args.start_date, args.end_date, args.cities, args.rebuild_running_aggregates,
+                                     args.time_zone)
+    sys.exit(1 if failed_units else 0)
+
+
+if __name__ == "__main__":
+    main()
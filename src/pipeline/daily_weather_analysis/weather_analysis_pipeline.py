@@ -1,19 +1,31 @@
+import argparse
 import datetime
+import os
+import sys
 
 from prefect import flow, serve
 from prefect.client.schemas.schedules import CronSchedule
 from prefect.runtime import flow_run
 
-from extract_weather_historical_data import (task_extract_date, task_extract_city_id,
-                                             task_extract_weather_record, task_generate_historical_data_url,
-                                             task_extract_astro_data, task_extract_weather_historical_data)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+
+from deployment_registry import (add_registry_arguments, get_registered_cities, plan_daily_deployments,
+                                 select_worker_deployments, validate_registry_arguments)
+from extract_weather_historical_data import (task_extract_date, task_extract_city_location,
+                                             task_extract_weather_record, task_extract_weather_history_summary,
+                                             task_extract_astro_data,
+                                             task_extract_cities_with_weather_records, task_extract_astro_data_batch,
+                                             task_extract_city_countries, task_extract_intraday_weather_stats)
 from transform_weather_historical_data import (task_transform_to_pd_df, task_fill_direct_weather_analysis_fields,
                                                task_find_temp_c, task_find_max_wind_speed, task_find_avg_wind_speed,
                                                task_find_total_precip_mm, task_find_avg_humidity_perc,
-                                               task_transform_astro_fields, task_generate_precipitation_changes_plot,
-                                               task_generate_wind_speed_changes_plot, task_generate_temp_changes_plot,
-                                               task_plot_temperature_distribution, task_plot_wind_rose)
-from load_weather_historical_data import task_load_daily_weather_analysis_if_necessary
+                                               task_transform_astro_fields, task_prepare_plot_frame,
+                                               task_render_daily_plots, task_transform_astro_data_batch)
+from load_weather_historical_data import (task_load_daily_weather_analysis_if_necessary,
+                                          task_load_daily_weather_analyses_aggregated,
+                                          task_export_daily_weather_analyses_to_parquet)
+from instrumentation import instrument_flow_run
+from weather_records import DailyWeatherAnalysis
 
 
 def generate_historical_weather_flow_run_name():
@@ -33,27 +45,39 @@ def generate_transform_weather_historical_data_flow_run_name():
     weather_data_list = flow_run.parameters['weather_data_list']
     city = flow_run.parameters['city']
 
-    return f"{flow_name}-for-{city.replace(' ', '-')}-on-{weather_data_list[0][2]}"
+    return f"{flow_name}-for-{city.replace(' ', '-')}-on-{weather_data_list[0].date}"
 
 def generate_load_weather_historical_data_flow_run_name():
     flow_name = flow_run.flow_name
     city = flow_run.parameters['city']
     daily_weather_analysis_to_insert = flow_run.parameters['daily_weather_analysis_to_insert']
 
-    return f"{flow_name}-for-{city.replace(' ', '-')}-on-{daily_weather_analysis_to_insert['date']}"
+    return f"{flow_name}-for-{city.replace(' ', '-')}-on-{daily_weather_analysis_to_insert.date}"
+
+def generate_weather_analysis_aggregation_flow_run_name():
+    flow_name = flow_run.flow_name
+    time_zone = flow_run.parameters['time_zone']
+    analysis_date = flow_run.parameters.get('analysis_date') or (
+        "yesterday" if flow_run.parameters.get('previous_day') else "today")
+    return f"{flow_name}-for-{time_zone.replace('/', '-')}-on-{analysis_date}"
+
+def generate_intraday_weather_stats_flow_run_name():
+    flow_name = flow_run.flow_name
+    city_id = flow_run.parameters['city_id']
+    return f"{flow_name}-for-city-{city_id}"
 
 @flow(flow_run_name=generate_extract_weather_historical_data_flow_run_name, log_prints=True)
 def flow_extract_weather_historical_data(city: str, time_zone: str):
     previous_date = task_extract_date(time_zone)
-    url = task_generate_historical_data_url(city, previous_date)
-    weather_data = task_extract_weather_historical_data(url)
-    astro_dict = task_extract_astro_data(weather_data["forecast"]["forecastday"][0]["astro"])
-    city_id = task_extract_city_id(weather_data["location"])
-    if city_id is None:
-        return None, None
+    city_location = task_extract_city_location(city, time_zone)
+    if city_location is None:
+        return None, None, None
 
+    city_id, location = city_location
+    weather_history_summary = task_extract_weather_history_summary(city_id, location, previous_date)
+    astro_dict = task_extract_astro_data(weather_history_summary["astro"])
     weather_data_list = task_extract_weather_record(city_id, previous_date)
-    return weather_data_list, astro_dict, weather_data["location"]["country"]
+    return weather_data_list, astro_dict, weather_history_summary["location"]["country"]
 
 @flow(flow_run_name=generate_transform_weather_historical_data_flow_run_name, log_prints=True)
 def flow_transform_weather_historical_data(weather_data_list: list, astro_dict: dict, city: str, country: str):
@@ -67,72 +91,85 @@ def flow_transform_weather_historical_data(weather_data_list: list, astro_dict:
     task_find_avg_humidity_perc(weather_data_df, daily_weather_analysis_to_insert)
     task_transform_astro_fields(astro_dict, daily_weather_analysis_to_insert)
 
-    task_generate_temp_changes_plot(weather_data_df.copy(), city, country)
-    task_generate_wind_speed_changes_plot(weather_data_df.copy(), city, country)
-    if weather_data_df['precip_mm'].sum() > 0:
-        task_generate_precipitation_changes_plot(weather_data_df.copy(), city, country)
-    task_plot_temperature_distribution(weather_data_df.copy(), city, country)
-    task_plot_wind_rose(weather_data_df.copy(), city, country)
-    return daily_weather_analysis_to_insert
+    plot_frame = task_prepare_plot_frame(weather_data_df)
+    task_render_daily_plots(plot_frame, city, country)
+    return DailyWeatherAnalysis.from_dict(daily_weather_analysis_to_insert)
 
 @flow(flow_run_name=generate_load_weather_historical_data_flow_run_name, log_prints=True)
-def flow_load_weather_historical_data(daily_weather_analysis_to_insert: dict, city: str):
-    return task_load_daily_weather_analysis_if_necessary(daily_weather_analysis_to_insert)
+def flow_load_weather_historical_data(daily_weather_analysis_to_insert: DailyWeatherAnalysis, city: str):
+    daily_weather_analysis_id = task_load_daily_weather_analysis_if_necessary(daily_weather_analysis_to_insert)
+    if daily_weather_analysis_id is not None:
+        task_export_daily_weather_analyses_to_parquet([daily_weather_analysis_id])
+    return daily_weather_analysis_id
 
 @flow(flow_run_name=generate_historical_weather_flow_run_name, log_prints=True)
+@instrument_flow_run
 def weather_analysis_pipeline(city: str, time_zone: str):
     weather_data_list, astro_dict, country = flow_extract_weather_historical_data(city, time_zone)
-    if weather_data_list is not None:
+    if weather_data_list:
         daily_weather_analysis_to_insert = flow_transform_weather_historical_data(weather_data_list, astro_dict, city, country)
         flow_load_weather_historical_data(daily_weather_analysis_to_insert, city)
 
+@flow(flow_run_name=generate_weather_analysis_aggregation_flow_run_name, log_prints=True)
+@instrument_flow_run
+def weather_analysis_aggregation_pipeline(time_zone: str = "UTC", analysis_date: datetime.date | None = None,
+                                          cities: list | None = None, render_plots: bool = True,
+                                          previous_day: bool = False):
+    if analysis_date is None:
+        analysis_date = task_extract_date(time_zone)
+        if previous_day:
+            analysis_date -= datetime.timedelta(days=1)
+
+    cities_with_weather_records = task_extract_cities_with_weather_records(analysis_date, cities,
+                                                                           time_zone if cities else None)
+    if not cities_with_weather_records:
+        print(f"There are no current weather records to aggregate on {analysis_date}")
+        return []
+
+    astro_by_city_id = task_extract_astro_data_batch(cities_with_weather_records, analysis_date)
+    astro_by_city_id = task_transform_astro_data_batch(astro_by_city_id)
+    daily_weather_analysis_ids = task_load_daily_weather_analyses_aggregated(analysis_date, astro_by_city_id)
+    task_export_daily_weather_analyses_to_parquet(daily_weather_analysis_ids)
+
+    if render_plots:
+        countries = task_extract_city_countries([city_id for city_id, _, _ in cities_with_weather_records])
+        plot_futures = []
+        for city_id, city, _ in cities_with_weather_records:
+            weather_data_df = task_transform_to_pd_df(task_extract_weather_record(city_id, analysis_date))
+            plot_futures.append(task_render_daily_plots.submit(task_prepare_plot_frame(weather_data_df), city,
+                                                               countries[city_id]))
+        for plot_future in plot_futures:
+            plot_future.result()
+    return daily_weather_analysis_ids
+
+@flow(flow_run_name=generate_intraday_weather_stats_flow_run_name, log_prints=True)
+@instrument_flow_run
+def intraday_weather_stats_pipeline(city_id: int, time_zone: str = "UTC"):
+    stats_date = task_extract_date(time_zone)
+    intraday_weather_stats = task_extract_intraday_weather_stats(city_id, stats_date)
+    if intraday_weather_stats is None:
+        print(f"There are no current weather readings for city {city_id} on {stats_date} yet")
+    else:
+        print(f"Weather so far on {stats_date} for city {city_id}: {intraday_weather_stats}")
+    return intraday_weather_stats
+
 def main():
-    weather_analysis_sofia_deploy = weather_analysis_pipeline.to_deployment(
-        name="weather-analysis-sofia-daily-flow-deployment",
-        parameters={"city": "Sofia", "time_zone": "Europe/Sofia"},
-        schedules=[
-            CronSchedule(
-                cron="20 23 * * *",
-                timezone="Europe/Sofia"
-            )
-        ]
-    )
-
-    weather_analysis_rome_deploy = weather_analysis_pipeline.to_deployment(
-        name="weather-analysis-rome-daily-flow-deployment",
-        parameters={"city": "Rome", "time_zone": "Europe/Rome"},
-        schedules=[
-            CronSchedule(
-                cron="23 23 * * *",
-                timezone="Europe/Rome"
-            )
-        ]
-    )
-
-    weather_analysis_london_deploy = weather_analysis_pipeline.to_deployment(
-        name="weather-analysis-london-daily-flow-deployment",
-        parameters={"city": "London", "time_zone": "Europe/London"},
-        schedules=[
-            CronSchedule(
-                cron="22 23 * * *",
-                timezone="Europe/London"
-            )
-        ]
-    )
-
-    weather_analysis_new_york_deploy = weather_analysis_pipeline.to_deployment(
-        name="weather-analysis-new-york-daily-flow-deployment",
-        parameters={"city": "New York", "time_zone": "America/New_York"},
-        schedules=[
-            CronSchedule(
-                cron="28 23 * * *",
-                timezone="America/New_York"
-            )
-        ]
-    )
-
-    serve(weather_analysis_sofia_deploy, weather_analysis_rome_deploy,
-          weather_analysis_london_deploy, weather_analysis_new_york_deploy)
+    parser = argparse.ArgumentParser(description="Serve the nightly weather analysis deployments, one per time zone of "
+                                                 "the registered cities. Run several processes with --worker-index "
+                                                 "and --worker-count to share the deployments between them.")
+    add_registry_arguments(parser)
+    args = parser.parse_args()
+    validate_registry_arguments(parser, args)
+
+    cities = get_registered_cities(args.city_registry_source, args.city_registry_path)
+    deployments = select_worker_deployments(plan_daily_deployments(cities), args.worker_index, args.worker_count)
+    served_cities = sum(len(deployment["parameters"]["cities"]) for deployment in deployments)
+    print(f"Serving {len(deployments)} daily deployments for {served_cities} of the {len(cities)} registered cities")
+    serve(*(weather_analysis_aggregation_pipeline.to_deployment(
+        name=deployment["name"],
+        parameters=deployment["parameters"],
+        schedules=[CronSchedule(cron=deployment["cron"], timezone=deployment["time_zone"])]
+    ) for deployment in deployments))
 
 
 if __name__ == "__main__":
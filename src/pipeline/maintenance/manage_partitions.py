@@ -0,0 +1,79 @@
+import argparse
+import datetime
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+
+from db_connection_pool import get_db_connection
+
+default_months_ahead = 3
+
+
+def parse_month(value: str):
+    return datetime.datetime.strptime(value, "%Y-%m").date()
+
+def list_partitions(cursor):
+    cursor.execute(
+        """
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class child ON child.oid=pg_inherits.inhrelid
+        WHERE pg_inherits.inhparent='current_weather'::REGCLASS
+        ORDER BY child.relname
+        """
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+def create_partitions(months_ahead: int):
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            existing_partitions = set(list_partitions(cursor))
+            cursor.execute(
+                """
+                SELECT create_current_weather_partition(partition_month)
+                FROM (
+                    SELECT DISTINCT date_trunc('month', date)::DATE AS partition_month FROM current_weather_default
+                    UNION
+                    SELECT generate_series(date_trunc('month', CURRENT_DATE),
+                                           date_trunc('month', CURRENT_DATE) + %(months_ahead)s * INTERVAL '1 month',
+                                           INTERVAL '1 month')::DATE
+                ) AS partition_months
+                ORDER BY partition_month
+                """, {"months_ahead": months_ahead}
+            )
+            return [row[0] for row in cursor.fetchall() if row[0] not in existing_partitions]
+
+def detach_partitions(before_month: datetime.date):
+    # Detached partitions stay in the database as standalone tables, so they can be archived or dropped by hand.
+    detached_partitions = []
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            for partition in list_partitions(cursor):
+                if partition == "current_weather_default":
+                    continue
+                if parse_month(partition.removeprefix("current_weather_").replace("_", "-")) < before_month:
+                    cursor.execute(f"ALTER TABLE current_weather DETACH PARTITION {partition}")
+                    detached_partitions.append(partition)
+    return detached_partitions
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the monthly partitions of current_weather. Run it at least "
+                                                 "once a month, e.g. from cron.")
+    parser.add_argument("--months-ahead", type=int, default=default_months_ahead,
+                        help="Number of months after the current one to create partitions for")
+    parser.add_argument("--detach-before", type=parse_month, metavar="YYYY-MM",
+                        help="Detach the partitions of the months before this one")
+    args = parser.parse_args()
+    if args.months_ahead < 0:
+        parser.error("--months-ahead must not be negative")
+
+    for partition in create_partitions(args.months_ahead):
+        print(f"Created {partition}")
+    if args.detach_before is not None:
+        for partition in detach_partitions(args.detach_before):
+            print(f"Detached {partition}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import datetime
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+
+from db_connection_pool import get_db_connection
+
+
+def rebuild_running_aggregates(start_date: datetime.date = None, end_date: datetime.date = None):
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            # The lock makes concurrent loads wait, so none of their readings is counted twice or left out.
+            cursor.execute("LOCK TABLE daily_weather_running_aggregates IN EXCLUSIVE MODE")
+            date_range = {"start_date": start_date or datetime.date.min, "end_date": end_date or datetime.date.max}
+            cursor.execute(
+                """
+                DELETE FROM daily_weather_running_aggregates
+                WHERE date BETWEEN %(start_date)s AND %(end_date)s
+                """, date_range
+            )
+            cursor.execute(
+                """
+                INSERT INTO daily_weather_running_aggregates (
+                    city_id,
+                    date,
+                    readings_count,
+                    max_temp_c,
+                    min_temp_c,
+                    sum_temp_c,
+                    max_wind_speed_kph,
+                    sum_wind_speed_kph,
+                    total_precip_mm,
+                    sum_humidity_perc
+                )
+                SELECT city_id, date, COUNT(*), MAX(temp_c), MIN(temp_c), SUM(temp_c), MAX(wind_speed_kph),
+                SUM(wind_speed_kph), SUM(precip_mm), SUM(humidity_perc)
+                FROM current_weather
+                WHERE date BETWEEN %(start_date)s AND %(end_date)s
+                GROUP BY city_id, date
+                """, date_range
+            )
+            return cursor.rowcount
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute the running daily aggregates from current_weather. Run it "
+                                                 "after importing readings without the pipeline, e.g. the sample CSV "
+                                                 "files.")
+    parser.add_argument("--start-date", type=datetime.date.fromisoformat)
+    parser.add_argument("--end-date", type=datetime.date.fromisoformat)
+    args = parser.parse_args()
+    if args.start_date and args.end_date and args.end_date < args.start_date:
+        parser.error("--end-date is before --start-date")
+
+    print(f"Rebuilt the running aggregates of {rebuild_running_aggregates(args.start_date, args.end_date)} "
+          f"(city, date) pairs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+
+from db_connection_pool import get_db_connection
+
+tables_with_serial_ids = ["city", "current_weather", "daily_weather_analyses"]
+
+
+def resync_sequences(tables: list):
+    resynced_sequences = {}
+    with get_db_connection() as conn:
+        with conn.cursor() as cursor:
+            for table in tables:
+                cursor.execute("SELECT pg_get_serial_sequence(%(table)s, 'id')", {"table": table})
+                sequence = cursor.fetchone()[0]
+                if sequence is None:
+                    raise ValueError(f"Table {table} has no serial id column")
+
+                cursor.execute(f"LOCK TABLE {table} IN EXCLUSIVE MODE")
+                cursor.execute(
+                    f"SELECT setval(%(sequence)s, COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) FROM {table}",
+                    {"sequence": sequence}
+                )
+                resynced_sequences[sequence] = cursor.fetchone()[0]
+    return resynced_sequences
+
+def main():
+    parser = argparse.ArgumentParser(description="Move the id sequences past the largest stored id. Run it once after "
+                                                 "importing rows with explicit ids, e.g. the sample CSV files.")
+    parser.add_argument("tables", nargs="*", help=f"Tables whose sequences to resync (default: all of "
+                                                  f"{', '.join(tables_with_serial_ids)})")
+    args = parser.parse_args()
+    unknown_tables = set(args.tables) - set(tables_with_serial_ids)
+    if unknown_tables:
+        parser.error(f"unknown tables: {', '.join(sorted(unknown_tables))}")
+
+    for sequence, value in resync_sequences(args.tables or tables_with_serial_ids).items():
+        print(f"{sequence} -> {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import argparse
+import datetime
+import os
+import signal
+import sys
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from croniter import croniter
+from dataclasses import dataclass, field
+
+pipeline_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.extend(os.path.join(pipeline_dir, package) for package in ("common", "current_weather_data",
+                                                                    "daily_weather_analysis"))
+
+from deployment_registry import (add_registry_arguments, get_registered_cities, plan_daily_deployments,
+                                 plan_hourly_deployments, select_worker_deployments, validate_registry_arguments)
+from pipeline_config import load_environment
+from time_utils import get_time_zone
+
+load_environment()
+
+worker_max_concurrent_runs = int(os.getenv("WORKER_MAX_CONCURRENT_RUNS", "4"))
+worker_max_sleep_seconds = 60
+
+pipelines = ["current_weather", "weather_analysis"]
+
+
+@dataclass
+class ScheduledFlow:
+    name: str
+    flow: object
+    cron: str
+    time_zone: str = "UTC"
+    parameters: dict = field(default_factory=dict)
+
+    def next_run_after(self, moment: datetime.datetime):
+        local_moment = moment.astimezone(get_time_zone(self.time_zone))
+        return croniter(self.cron, local_moment).get_next(datetime.datetime).astimezone(datetime.timezone.utc)
+
+
+def get_scheduled_flows(selected_pipelines: list, args: argparse.Namespace):
+    # Only the selected pipelines are imported, so an hourly-only worker never loads the analysis modules.
+    cities = get_registered_cities(args.city_registry_source, args.city_registry_path)
+    scheduled_flows = []
+    if "current_weather" in selected_pipelines:
+        from current_weather_batch_pipeline import current_weather_data_batch_pipeline
+        hourly_deployments = plan_hourly_deployments(cities, args.max_cities_per_deployment)
+        scheduled_flows += [ScheduledFlow(deployment["name"], current_weather_data_batch_pipeline, deployment["cron"],
+                                          parameters=deployment["parameters"])
+                            for deployment in select_worker_deployments(hourly_deployments, args.worker_index,
+                                                                        args.worker_count)]
+    if "weather_analysis" in selected_pipelines:
+        from weather_analysis_pipeline import weather_analysis_aggregation_pipeline
+        daily_deployments = plan_daily_deployments(cities)
+        scheduled_flows += [ScheduledFlow(deployment["name"], weather_analysis_aggregation_pipeline, deployment["cron"],
+                                          deployment["time_zone"], deployment["parameters"])
+                            for deployment in select_worker_deployments(daily_deployments, args.worker_index,
+                                                                        args.worker_count)]
+    return scheduled_flows
+
+def warm_up_clients():
+    from db_connection_pool import get_db_connection
+    from weather_api_client import get_weather_api_client
+
+    get_weather_api_client()
+    try:
+        with get_db_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+    except Exception as e:
+        print(f"Could not open a database connection yet, the first run will retry: {e!r}", file=sys.stderr)
+
+
+class PipelineWorker:
+    def __init__(self, scheduled_flows: list, max_concurrent_runs: int = worker_max_concurrent_runs):
+        self.scheduled_flows = scheduled_flows
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_runs, thread_name_prefix="pipeline-worker")
+        self._running = {}
+        self._stop_event = threading.Event()
+
+    @staticmethod
+    def run_flow(scheduled_flow: ScheduledFlow):
+        try:
+            scheduled_flow.flow(**scheduled_flow.parameters)
+        except Exception as e:
+            print(f"The scheduled run of {scheduled_flow.name} failed: {e!r}", file=sys.stderr)
+
+    def submit(self, scheduled_flow: ScheduledFlow):
+        running = self._running.get(scheduled_flow.name)
+        if running is not None and not running.done():
+            print(f"Skipping the scheduled run of {scheduled_flow.name}, its previous run is still in progress")
+            return
+        self._running[scheduled_flow.name] = self._executor.submit(self.run_flow, scheduled_flow)
+
+    def run(self, run_now: bool = False):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        next_runs = {scheduled_flow.name: now if run_now else scheduled_flow.next_run_after(now)
+                     for scheduled_flow in self.scheduled_flows}
+        print(f"Worker started with {len(self.scheduled_flows)} scheduled flows")
+        while not self._stop_event.is_set() and self.scheduled_flows:
+            now = datetime.datetime.now(datetime.timezone.utc)
+            for scheduled_flow in self.scheduled_flows:
+                if next_runs[scheduled_flow.name] <= now:
+                    self.submit(scheduled_flow)
+                    next_runs[scheduled_flow.name] = scheduled_flow.next_run_after(now)
+            sleep_seconds = (min(next_runs.values()) - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+            self._stop_event.wait(min(max(sleep_seconds, 0), worker_max_sleep_seconds))
+
+        print("Worker stopping, waiting for the runs in progress")
+        self._executor.shutdown(wait=True)
+
+    def stop(self, *_):
+        self._stop_event.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-running worker that runs the scheduled pipeline flows in one "
+                                                 "warm process instead of a new process per flow run")
+    parser.add_argument("--pipelines", nargs="+", choices=pipelines, default=pipelines)
+    parser.add_argument("--max-concurrent-runs", type=int, default=worker_max_concurrent_runs)
+    parser.add_argument("--run-now", action="store_true", help="Run every scheduled flow once at start-up")
+    add_registry_arguments(parser)
+    args = parser.parse_args()
+    validate_registry_arguments(parser, args)
+
+    worker = PipelineWorker(get_scheduled_flows(args.pipelines, args), args.max_concurrent_runs)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    warm_up_clients()
+    worker.run(args.run_now)
+
+
+if __name__ == "__main__":
+    main()